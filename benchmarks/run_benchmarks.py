@@ -0,0 +1,173 @@
+"""Offline benchmarks of the data loaders and feature pipeline on synthetic data.
+
+Writes synthetic data files (see :func:`subseasonal_data.synthetic.write_synthetic_data`)
+to a temporary directory, then times each stage with ``sync=False`` and
+reports its best wall time and the largest growth of the process's peak
+resident set size over --repeat runs. Unlike Python allocations, this
+includes the HDF5 and Arrow buffers used to decode the data files.
+Results can be saved with --output and compared with the saved results of
+another commit with --compare:
+
+    python benchmarks/run_benchmarks.py --output base.json
+    git checkout my-branch
+    python benchmarks/run_benchmarks.py --compare base.json
+"""
+import os
+import io
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import resource
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from subseasonal_data import data_loaders, utils, cache, storage, downloader  # noqa: E402
+from subseasonal_data.synthetic import write_synthetic_data  # noqa: E402
+
+# Globals
+GT_IDS = ["contest_tmp2m", "contest_precip"]
+FORECAST_ID = "subx_cfsv2-tmp2m"
+SHIFT = 15
+
+
+def get_stages(gt_file, mask_file):
+    """Return list of (name, run) stages, where run maps the shared state dict to
+    a result stored in the state under name.
+    """
+    return [
+        ("load_measurement", lambda state: utils.load_measurement(gt_file)),
+        ("shift_df", lambda state: utils.shift_df(state["load_measurement"], shift=SHIFT)),
+        ("subsetmask", lambda state: utils.subsetmask(state["load_measurement"],
+                                                      utils.createmaskdf(mask_file))),
+        ("get_ground_truth_anomalies", lambda state: data_loaders.get_ground_truth_anomalies(
+            GT_IDS[0], shift=SHIFT, sync=False)),
+        ("get_forecast", lambda state: data_loaders.get_forecast(FORECAST_ID, sync=False)),
+        ("get_lat_lon_date_features", lambda state: data_loaders.get_lat_lon_date_features(
+            gt_ids=GT_IDS, gt_shifts=SHIFT, forecast_ids=[FORECAST_ID], forecast_shifts=SHIFT,
+            anom_ids=GT_IDS[:1], anom_shifts=SHIFT, sync=False)),
+    ]
+
+
+def clear_caches():
+    """Drop all in-process caches and the on-disk artifacts derived from the data files."""
+    cache.clear_climatology_cache()
+    cache.clear_mask_cache()
+    cache.clear_derived_cache()
+    for file_name in glob.glob(os.path.join(downloader.get_subseasonal_data_path(), "dataframes", "*.h5")):
+        shutil.rmtree(storage.get_partitioned_path(file_name), ignore_errors=True)
+
+
+def reset_peak_rss():
+    """Reset the peak resident set size of the process to its current value.
+
+    Returns the current resident set size in bytes, or None if the peak
+    cannot be reset (only Linux supports this).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return read_rss()[0]
+    except OSError:
+        return None
+
+
+def read_rss():
+    """Return current and peak resident set size of the process in bytes."""
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return tuple(int(fields[name].split()[0]) * 1024 for name in ["VmRSS", "VmHWM"])
+
+
+def max_rss():
+    """Return the peak resident set size of the process in bytes as reported by getrusage."""
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def measure(run, state, repeat):
+    """Return result, best wall time in seconds and largest peak RSS growth in MB of repeat runs.
+
+    The peak RSS growth of a run is its peak resident set size minus the
+    resident set size at its start. Where the peak cannot be reset, it is
+    the growth of the process's peak, which misses runs that stay below an
+    earlier peak.
+    """
+    seconds, peak = float("inf"), 0
+    for _ in range(repeat):
+        # Start each run cold
+        clear_caches()
+        start_rss = reset_peak_rss()
+        start_max_rss = max_rss()
+        tic = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = run(state)
+        seconds = min(seconds, time.perf_counter() - tic)
+        growth = (max_rss() - start_max_rss if start_rss is None
+                  else read_rss()[1] - start_rss)
+        peak = max(peak, growth)
+    return result, seconds, peak / 1024**2
+
+
+def git_commit():
+    """Return current git commit of the repository or None if unavailable."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--n_lats", type=int, default=26)
+    parser.add_argument("--n_lons", type=int, default=59)
+    parser.add_argument("--n_dates", type=int, default=3650)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Save results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with results saved by --output")
+    args = parser.parse_args()
+
+    cache.disable_frame_cache()
+    cache.disable_derived_cache()
+    data_path = tempfile.mkdtemp()
+    os.environ["SUBSEASONALDATA_PATH"] = data_path
+    try:
+        file_paths = write_synthetic_data(data_path, gt_ids=GT_IDS, forecast_ids=[FORECAST_ID],
+                                          n_lats=args.n_lats, n_lons=args.n_lons,
+                                          n_dates=args.n_dates)
+        state, stages = {}, {}
+        for name, run in get_stages(file_paths[0], file_paths[-1]):
+            state[name], seconds, peak_rss_mb = measure(run, state, args.repeat)
+            stages[name] = {"seconds": seconds, "peak_rss_mb": peak_rss_mb}
+    finally:
+        shutil.rmtree(data_path)
+
+    results = {"commit": git_commit(), "config": vars(args), "stages": stages}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing commit {results['commit']} with {baseline['commit']}")
+    print(f"{'stage':<28}{'seconds':>10}{'peak RSS MB':>13}"
+          + (f"{'time ratio':>12}{'memory ratio':>14}" if baseline else ""))
+    for name, stage in stages.items():
+        line = f"{name:<28}{stage['seconds']:>10.3f}{stage['peak_rss_mb']:>13.1f}"
+        if baseline and name in baseline["stages"]:
+            base = baseline["stages"][name]
+            line += f"{stage['seconds'] / base['seconds']:>12.2f}"
+            # Results saved before peak RSS was measured have no memory to compare
+            if base.get("peak_rss_mb"):
+                line += f"{stage['peak_rss_mb'] / base['peak_rss_mb']:>14.2f}"
+        print(line)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import os
+import shutil
+import hashlib
+import importlib.util
+import threading
+from collections import OrderedDict
+import pandas as pd
+from .downloader import get_subseasonal_data_path
+
+# Globals
+DEFAULT_FRAME_CACHE_MAX_BYTES = 2 * 1024**3
+DERIVED_CACHE_SUBDIR = "derived_cache"
+# Maximum number of masks kept by memoize_mask
+MASK_CACHE_SIZE = 16
+# Maximum number of climatology lookup tables kept by memoize_climatology_lookup
+CLIMATOLOGY_LOOKUP_CACHE_SIZE = 8
+
+# Process-wide frame cache; None when caching is disabled
+_frame_cache = None
+# Directory of the persistent derived frame cache; None when disabled
+_derived_cache_dir = None
+# Masks read by memoize_mask, keyed by mask file fingerprint, in least recently used order
+_masks = OrderedDict()
+_masks_lock = threading.Lock()
+# Lookup tables built by memoize_climatology_lookup, in least recently used order
+_climatology_lookups = OrderedDict()
+_climatology_lookups_lock = threading.Lock()
+
+
+class FrameCache:
+    """Least-recently-used cache of dataframes under a memory budget.
+
+    Cached dataframes are never handed out directly: :meth:`get` returns a
+    copy-on-write copy so callers cannot modify the cached frame.
+
+    Parameters
+    ----------
+    max_bytes: int, optional (default=DEFAULT_FRAME_CACHE_MAX_BYTES)
+        Memory budget in bytes; least recently used frames are evicted
+        once the cached frames exceed this budget.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_FRAME_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a copy of the frame cached under key or None if absent."""
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+        return _cow_copy(entry[0])
+
+    def put(self, key, df):
+        """Cache a copy of df under key, evicting frames to respect max_bytes."""
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            # Frame cannot fit in the budget
+            return
+        df = _cow_copy(df)
+        with self._lock:
+            if key in self._frames:
+                self.nbytes -= self._frames.pop(key)[1]
+            self._frames[key] = (df, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._frames.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached frames and reset counters."""
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """Return dictionary of cache statistics."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "entries": len(self._frames),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+def enable_frame_cache(max_bytes=DEFAULT_FRAME_CACHE_MAX_BYTES):
+    """Enable in-process caching of frames loaded from data files.
+
+    Once enabled, :func:`~subseasonal_data.utils.load_measurement` and
+    :func:`~subseasonal_data.utils.load_forecast_from_file`, and therefore all
+    data loader getters, reuse frames loaded earlier from the same unmodified file with
+    the same mask and shift.
+
+    Parameters
+    ----------
+    max_bytes: int, optional (default=DEFAULT_FRAME_CACHE_MAX_BYTES)
+        Memory budget of the cache in bytes.
+
+    Returns
+    -------
+    frame_cache: FrameCache
+        The newly enabled cache.
+    """
+    global _frame_cache
+    _frame_cache = FrameCache(max_bytes=max_bytes)
+    return _frame_cache
+
+
+def disable_frame_cache():
+    """Disable in-process frame caching and release all cached frames, masks and climatology lookups."""
+    global _frame_cache
+    _frame_cache = None
+    clear_mask_cache()
+    clear_climatology_cache()
+
+
+def frame_cache_info():
+    """Return dictionary of frame cache statistics or None if caching is disabled."""
+    cache = _frame_cache
+    return None if cache is None else cache.info()
+
+
+def enable_derived_cache(cache_dir=None):
+    """Enable the persistent on-disk cache of derived frames.
+
+    Once enabled, masked and shifted measurements loaded by
+    :func:`~subseasonal_data.utils.load_measurement` and the frames returned by
+    :func:`~subseasonal_data.data_loaders.get_ground_truth_anomalies` are stored
+    as Feather files and read back by later calls, including calls from
+    other processes, with the same arguments.
+
+    Cached frames are keyed by the fingerprint (path, modification time and
+    size) of their source files and the derivation parameters, so re-syncing
+    a source file invalidates every frame derived from it.
+
+    Requires ``pyarrow``.
+
+    Parameters
+    ----------
+    cache_dir: string, optional (default=None)
+        Cache directory; if None, the subdirectory
+        :const:`DERIVED_CACHE_SUBDIR` of
+        :func:`~subseasonal_data.downloader.get_subseasonal_data_path` is used.
+
+    Returns
+    -------
+    cache_dir: string
+        The cache directory.
+    """
+    global _derived_cache_dir
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ImportError(
+            "The derived frame cache requires 'pyarrow'; install it with "
+            "'pip install subseasonal-data[arrow]'.")
+    if cache_dir is None:
+        cache_dir = os.path.join(get_subseasonal_data_path(), DERIVED_CACHE_SUBDIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    _derived_cache_dir = cache_dir
+    return cache_dir
+
+
+def disable_derived_cache():
+    """Disable the persistent derived frame cache, leaving its files on disk."""
+    global _derived_cache_dir
+    _derived_cache_dir = None
+
+
+def clear_derived_cache(cache_dir=None):
+    """Delete all files of the persistent derived frame cache.
+
+    Parameters
+    ----------
+    cache_dir: string, optional (default=None)
+        Cache directory; if None, the enabled or default cache directory is cleared.
+    """
+    if cache_dir is None:
+        cache_dir = _derived_cache_dir or os.path.join(
+            get_subseasonal_data_path(), DERIVED_CACHE_SUBDIR)
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    if cache_dir == _derived_cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+
+def file_fingerprint(file_name):
+    """Return (absolute path, modification time, size) identifying file_name contents."""
+    stat = os.stat(file_name)
+    return (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+
+def mask_fingerprint(mask_df):
+    """Return hash of the lat, lon pairs of mask_df or None if mask_df is None."""
+    if mask_df is None:
+        return None
+    hashes = pd.util.hash_pandas_object(mask_df, index=False).values
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def memoize_frame(file_name, load, mask_df=None, shift=None, persist=False, **params):
+    """Return load(), reusing a cached result if frame caching is enabled.
+
+    Parameters
+    ----------
+    file_name: string or list of string
+        Source file or files read by load.
+
+    load: callable
+        Function without arguments returning the dataframe.
+
+    mask_df: pd.DataFrame, optional (default=None)
+        Mask applied by load.
+
+    shift: int, optional (default=None)
+        Shift applied by load.
+
+    persist: bool, optional (default=False)
+        Whether to also store the result in the persistent derived frame
+        cache when it is enabled (see :func:`enable_derived_cache`).
+
+    params: keyword arguments
+        Any other hashable parameters affecting the result of load.
+    """
+    cache = _frame_cache
+    cache_dir = _derived_cache_dir if persist else None
+    if cache is None and cache_dir is None:
+        return load()
+    file_names = [file_name] if isinstance(file_name, str) else list(file_name)
+    key = (tuple(file_fingerprint(f) for f in file_names), mask_fingerprint(mask_df),
+           None if shift == 0 else shift, tuple(sorted(params.items())))
+    if cache is not None:
+        df = cache.get(key)
+        if df is not None:
+            return df
+    if cache_dir is not None:
+        df = _load_derived(cache_dir, key)
+        if df is None:
+            df = load()
+            _store_derived(cache_dir, key, df)
+    else:
+        df = load()
+    if cache is not None:
+        cache.put(key, df)
+    return df
+
+
+def memoize_mask(mask_file, load):
+    """Return load(), reusing the mask read earlier from the unmodified mask_file.
+
+    Masks are small and read on every masked load, so they are cached even
+    if frame caching is disabled; the MASK_CACHE_SIZE most recently used
+    masks are kept. Use :func:`clear_mask_cache` to drop them.
+
+    Parameters
+    ----------
+    mask_file: string
+        Mask file read by load.
+
+    load: callable
+        Function without arguments returning the mask dataframe.
+    """
+    key = file_fingerprint(mask_file)
+    with _masks_lock:
+        mask_df = _masks.get(key)
+        if mask_df is not None:
+            _masks.move_to_end(key)
+    if mask_df is None:
+        mask_df = load()
+        with _masks_lock:
+            _masks[key] = mask_df
+            while len(_masks) > MASK_CACHE_SIZE:
+                _masks.popitem(last=False)
+    return mask_df.copy()
+
+
+def clear_mask_cache():
+    """Drop all masks cached by :func:`memoize_mask`."""
+    with _masks_lock:
+        _masks.clear()
+
+
+def memoize_climatology_lookup(key, load):
+    """Return load(), reusing the climatology lookup table built earlier for key.
+
+    Like masks, lookup tables are cached even if frame caching is disabled;
+    the CLIMATOLOGY_LOOKUP_CACHE_SIZE most recently used tables are kept.
+    Use :func:`clear_climatology_cache` to drop them.
+
+    Parameters
+    ----------
+    key: tuple
+        Hashable key identifying the climatology file, mask and column.
+
+    load: callable
+        Function without arguments returning the lookup table, or None if
+        the climatology does not form one.
+    """
+    with _climatology_lookups_lock:
+        if key in _climatology_lookups:
+            _climatology_lookups.move_to_end(key)
+            return _climatology_lookups[key]
+    lookup = load()
+    with _climatology_lookups_lock:
+        _climatology_lookups[key] = lookup
+        while len(_climatology_lookups) > CLIMATOLOGY_LOOKUP_CACHE_SIZE:
+            _climatology_lookups.popitem(last=False)
+    return lookup
+
+
+def clear_climatology_cache():
+    """Drop all climatology lookup tables cached by :func:`memoize_climatology_lookup`."""
+    with _climatology_lookups_lock:
+        _climatology_lookups.clear()
+
+
+def _derived_paths(cache_dir, key):
+    """Return directory of all frames derived from the sources of key and path of key's frame.
+
+    The directory depends only on the source paths; the file name combines the
+    source fingerprints with the derivation parameters.
+    """
+    fingerprints, params = key[0], key[1:]
+    source_hash = hashlib.sha1(
+        repr(tuple(f[0] for f in fingerprints)).encode()).hexdigest()[:16]
+    version_hash = hashlib.sha1(repr(fingerprints).encode()).hexdigest()[:16]
+    params_hash = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    source_dir = os.path.join(cache_dir, source_hash)
+    return source_dir, os.path.join(source_dir, f"{version_hash}-{params_hash}.feather")
+
+
+def _load_derived(cache_dir, key):
+    """Return frame stored for key in the derived frame cache or None if absent."""
+    _, path = _derived_paths(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    return pd.read_feather(path)
+
+
+def _store_derived(cache_dir, key, df):
+    """Store df for key in the derived frame cache and drop frames of stale source versions."""
+    if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1) \
+            or not all(isinstance(col, str) for col in df.columns):
+        # Feather only supports default indices and string column names
+        return
+    source_dir, path = _derived_paths(cache_dir, key)
+    os.makedirs(source_dir, exist_ok=True)
+    # Frames derived from earlier versions of the source files are stale
+    version_prefix = os.path.basename(path).split("-")[0]
+    for fname in os.listdir(source_dir):
+        if not fname.startswith(version_prefix):
+            try:
+                os.remove(os.path.join(source_dir, fname))
+            except OSError:
+                pass
+    # Write to a temporary file and rename so readers never see partial files
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _cow_copy(df):
+    """Return a copy of df whose modification leaves df untouched."""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        # Copy-on-write is always enabled
+        return df.copy(deep=False)
+    try:
+        copy_on_write = pd.get_option("mode.copy_on_write") is True
+    except KeyError:
+        # Option not available in this pandas version
+        copy_on_write = False
+    # Copy-on-write defers copying data until a copy is modified
+    return df.copy(deep=not copy_on_write)
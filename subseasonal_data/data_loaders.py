@@ -1,11 +1,26 @@
 import os
+import numpy as np
 import pandas as pd
 import itertools
 import sys
-from .utils import (printf, createmaskdf, load_measurement,
+import functools
+import importlib.util
+import warnings
+from collections import deque
+from concurrent.futures import (Executor, ThreadPoolExecutor, ProcessPoolExecutor, wait,
+                                FIRST_COMPLETED)
+from .utils import (createmaskdf, load_measurement,
                     get_measurement_variable, shift_df, load_forecast_from_file,
-                    get_combined_data_filename, print_missing_cols_func, year_slice, df_merge)
-from .downloader import get_subseasonal_data_path, download_file, get_local_file_path
+                    get_combined_data_filename, print_missing_cols_func, year_slice, df_merge,
+                    align_frames, pivot_to_wide, date_slice, day_of_year_slice, apply_dtype_policy,
+                    _lookback_year, _lookback_date, _to_timestamp, _first_date, _read_measurement,
+                    _read_forecast, _read_hdf_dates)
+from .downloader import get_subseasonal_data_path, download_file, get_local_file_path, prefetch
+from .cache import memoize_frame, memoize_climatology_lookup, file_fingerprint, mask_fingerprint
+from .storage import read_feather_filtered, convert_to_partitioned, is_partitioned_current
+from .grid import GridCube, DayOfYearLookup
+from .ensemble import EnsembleStatistics
+from .instrumentation import stage, log_message
 
 # Globals
 # Forecast id to file name
@@ -67,10 +82,16 @@ FORECASTID_TO_FILENAME = {
     "ecmwf-precip_p1-global1_5-forecast": "iri-ecmwf-precip-all-global1_5-p1-forecast",
     "ecmwf-precip_p3-global1_5-forecast": "iri-ecmwf-precip-all-global1_5-p3-forecast",
 }
+# Perturbed member numbers of the ECMWF ensemble forecasts
+ECMWF_ENSEMBLE_MEMBERS = list(range(1, 51))
 FORECASTID_TO_FILENAME.update({
     f"ecmwf-{gt}-us1_5-pf{ii}-forecast": f"iri-ecmwf-{gt}-all-us1_5-pf{ii}-forecast"
-    for gt in ["tmp2m", "precip"] for ii in range(1,51) 
+    for gt in ["tmp2m", "precip"] for ii in ECMWF_ENSEMBLE_MEMBERS
 })
+# Fraction of the available memory that concurrently loaded sources may use
+PARALLEL_MEMORY_FRACTION = 0.5
+# Estimated ratio of the memory used while loading a source to its file size
+SOURCE_MEMORY_FACTOR = 4
 
 def get_contest_mask(sync=True, allow_write=False):
     """Return forecast rodeo contest mask as a dataframe.
@@ -127,7 +148,8 @@ def get_us_mask(sync=True,  fname="us_mask.nc", allow_write=False):
     return createmaskdf(file_path)
 
 
-def get_climatology(gt_id, mask_df=None, sync=True, allow_write=False):
+def get_climatology(gt_id, mask_df=None, sync=True, allow_write=False, as_cube=False,
+                    dtype_policy=None, start_date=None, end_date=None):
     """Return climatology data as a dataframe.
 
     Parameters
@@ -150,18 +172,32 @@ def get_climatology(gt_id, mask_df=None, sync=True, allow_write=False):
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    as_cube: bool, optional (default=False)
+        Whether to return a :class:`~subseasonal_data.grid.GridCube` with dense
+        (date, lat, lon) arrays instead of a long-format dataframe.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
+    start_date, end_date: datetime-like, optional (default=None)
+        If both are not None, only return rows for the days of year of dates
+        in [start_date, end_date] (see :func:`~subseasonal_data.utils.day_of_year_slice`).
+
     Returns
     -------
-    clim_df: pd.DataFrame
+    clim_df: pd.DataFrame or GridCube
         Climatology dataframe.
     """
     # Load global climatology if US climatology requested
     file_path = get_local_file_path(
-        data_subdir="dataframes", fname="official_climatology-"+gt_id+".h5", sync=sync, allow_write=allow_write)
-    return load_measurement(file_path, mask_df)
+        data_subdir="dataframes", fname=_climatology_fname(gt_id), sync=sync, allow_write=allow_write)
+    clim = load_measurement(file_path, mask_df, dtype_policy=dtype_policy)
+    return _as_cube(day_of_year_slice(clim, start_date, end_date).reset_index(drop=True), as_cube)
 
 def get_tercile(gt_id, tercile=1, first_year=1981, last_year=2010,
-                mask_df=None, sync=True, allow_write=False):
+                mask_df=None, sync=True, allow_write=False, as_cube=False, dtype_policy=None,
+                start_date=None, end_date=None):
     """Return climatological tercile data as a dataframe.
 
     Parameters
@@ -193,19 +229,34 @@ def get_tercile(gt_id, tercile=1, first_year=1981, last_year=2010,
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    as_cube: bool, optional (default=False)
+        Whether to return a :class:`~subseasonal_data.grid.GridCube` with dense
+        (date, lat, lon) arrays instead of a long-format dataframe.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
+    start_date, end_date: datetime-like, optional (default=None)
+        If both are not None, only return rows for the days of year of dates
+        in [start_date, end_date] (see :func:`~subseasonal_data.utils.day_of_year_slice`).
+
     Returns
     -------
-    tercile_df: pd.DataFrame
+    tercile_df: pd.DataFrame or GridCube
         Tercile dataframe.
     """
     file_path = get_local_file_path(
         data_subdir="dataframes", 
         fname=f"tercile{tercile}_{first_year}_{last_year}-{gt_id}.h5", 
         sync=sync, allow_write=allow_write)
-    return load_measurement(file_path, mask_df)
+    clim = load_measurement(file_path, mask_df, dtype_policy=dtype_policy)
+    return _as_cube(day_of_year_slice(clim, start_date, end_date).reset_index(drop=True), as_cube)
 
 
-def get_ground_truth(gt_id, mask_df=None, shift=None, sync=True, allow_write=False):
+def get_ground_truth(gt_id, mask_df=None, shift=None, sync=True, allow_write=False,
+                     first_year=None, as_cube=False, start_date=None, end_date=None,
+                     dtype_policy=None):
     """Return ground truth data as a dataframe.
 
     Parameters
@@ -239,24 +290,42 @@ def get_ground_truth(gt_id, mask_df=None, shift=None, sync=True, allow_write=Fal
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    first_year: int, optional (default=None)
+        Only return rows with (shifted) start_date year >= first_year; if None,
+        do not prune rows by year. Only the needed years are read from files
+        with a partitioned layout (see :func:`~subseasonal_data.storage.convert_to_partitioned`).
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date >= start_date;
+        earlier unshifted dates are read as needed to fill the shifted rows.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date <= end_date.
+
+    as_cube: bool, optional (default=False)
+        Whether to return a :class:`~subseasonal_data.grid.GridCube` with dense
+        (date, lat, lon) arrays instead of a long-format dataframe.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
     Returns
     -------
-    gt_df: pd.DataFrame
+    gt_df: pd.DataFrame or GridCube
         Ground truth dataframe.
     """
     gt_file = get_local_file_path(
-        data_subdir="dataframes", fname="gt-"+gt_id+"-14d.h5", sync=sync, allow_write=allow_write)
-    if gt_id.endswith("mei"):
-        # MEI does not have an associated number of days
-        gt_file = gt_file.replace("-14d", "")
-    if gt_id.endswith("mjo"):
-        # MJO is not aggregated to a 14-day period
-        gt_file = gt_file.replace("14d", "1d")
-    printf(f"Loading {gt_file}")
-    return load_measurement(gt_file, mask_df, shift)
+        data_subdir="dataframes", fname=_ground_truth_fname(gt_id), sync=sync, allow_write=allow_write)
+    with stage("load", message=f"Loading {gt_file}", file=gt_file) as info:
+        gt = load_measurement(gt_file, mask_df, shift, first_year=first_year,
+                              start_date=start_date, end_date=end_date, dtype_policy=dtype_policy)
+        info["rows_out"] = len(gt)
+    return _as_cube(gt, as_cube)
 
 
-def get_ground_truth_anomalies(gt_id, mask_df=None, shift=None, sync=True, allow_write=False):
+def get_ground_truth_anomalies(gt_id, mask_df=None, shift=None, sync=True, allow_write=False,
+                               first_year=None, start_date=None, end_date=None, dtype_policy=None):
     """Return ground truth data, climatology, and ground truth anomalies
     as a dataframe.
 
@@ -282,51 +351,128 @@ def get_ground_truth_anomalies(gt_id, mask_df=None, shift=None, sync=True, allow
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    first_year: int, optional (default=None)
+        Only return rows with (shifted) start_date year >= first_year; if None,
+        do not prune rows by year. Only the needed years are read from files
+        with a partitioned layout (see :func:`~subseasonal_data.storage.convert_to_partitioned`).
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date >= start_date;
+        earlier unshifted dates are read as needed to fill the shifted rows.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
     Returns
     -------
     gt_anom: pd.DataFrame
         Dataframe containing ground truth, climatology and anomalies.
     """
+    gt_file = get_local_file_path(
+        data_subdir="dataframes", fname=_ground_truth_fname(gt_id), sync=sync, allow_write=allow_write)
+    clim_file = get_local_file_path(
+        data_subdir="dataframes", fname=_climatology_fname(gt_id), sync=sync, allow_write=allow_write)
+    return memoize_frame(
+        [gt_file, clim_file],
+        lambda: _compute_ground_truth_anomalies(gt_id, gt_file, clim_file, mask_df, shift, first_year,
+                                                start_date, end_date, dtype_policy),
+        mask_df=mask_df, shift=shift, persist=True, reader="anomalies", gt_id=gt_id,
+        first_year=first_year, start_date=_to_timestamp(start_date), end_date=_to_timestamp(end_date),
+        dtype_policy=dtype_policy)
+
+
+def _compute_ground_truth_anomalies(gt_id, gt_file, clim_file, mask_df=None, shift=None,
+                                    first_year=None, start_date=None, end_date=None,
+                                    dtype_policy=None):
+    """Return ground truth data, climatology, and ground truth anomalies loaded from
+    gt_file and clim_file (see :func:`get_ground_truth_anomalies`).
+    """
+    # Load unshifted ground truth data
+    start_date, end_date = _to_timestamp(start_date), _to_timestamp(end_date)
+    with stage("load", message=f"Loading {gt_file}", file=gt_file) as info:
+        gt = load_measurement(gt_file, mask_df, first_year=_lookback_year(first_year, shift),
+                              start_date=_lookback_date(start_date, shift),
+                              end_date=_lookback_date(end_date, shift), dtype_policy=dtype_policy)
+        info["rows_out"] = len(gt)
+    gt = _add_anomalies(gt, gt_id, clim_file, mask_df, shift, dtype_policy)
+    log_message("Shifting dataframe")
+    # Shift dataframe without renaming columns
+    gt = shift_df(gt, shift=shift, rename_cols=False)
+    gt = year_slice(gt, first_year=first_year)
+    return date_slice(gt, start_date, end_date).reset_index(drop=True)
+
+
+def _add_anomalies(gt, gt_id, clim_file, mask_df=None, shift=None, dtype_policy=None):
+    """Return unshifted ground truth gt with columns renamed for shift and
+    climatology and anomaly columns added (see :func:`get_ground_truth_anomalies`).
+    """
     date_col = "start_date"
     # Get shifted ground truth column names
     gt_col = get_measurement_variable(gt_id, shift=shift)
-    # Load unshifted ground truth data
-    gt = get_ground_truth(gt_id, mask_df=mask_df,
-                          sync=sync, allow_write=allow_write)
-    printf("Merging climatology and computing anomalies")
-    # Load associated climatology
-    climatology = get_climatology(
-        gt_id, mask_df=mask_df, sync=sync, allow_write=allow_write)
-    if shift is not None and shift != 0:
-        # Rename unshifted gt columns to reflect shifted data name
-        cols_to_shift = gt.columns.drop(
-            ['lat', 'lon', date_col], errors='ignore')
-        gt.rename(columns=dict(
-            list(zip(cols_to_shift, [col+"_shift"+str(shift) for col in cols_to_shift]))),
-            inplace=True)
+    with stage("climatology", message="Merging climatology and computing anomalies",
+               file=clim_file) as info:
+        info["rows_in"] = len(gt)
         unshifted_gt_col = get_measurement_variable(gt_id)
-        # Rename unshifted climatology column to reflect shifted data name
-        climatology.rename(columns={unshifted_gt_col: gt_col},
-                           inplace=True)
-    # Merge climatology into dataset
-    gt = pd.merge(gt, climatology[[gt_col]],
-                  left_on=['lat', 'lon', gt[date_col].dt.month,
-                           gt[date_col].dt.day],
-                  right_on=[climatology.lat, climatology.lon,
-                            climatology[date_col].dt.month,
-                            climatology[date_col].dt.day],
-                  how='left', suffixes=('', '_clim')).drop(['key_2', 'key_3'], axis=1)
-    clim_col = gt_col+"_clim"
-    # Compute ground-truth anomalies
-    anom_col = gt_col+"_anom"
-    gt[anom_col] = gt[gt_col] - gt[clim_col]
-    printf("Shifting dataframe")
-    # Shift dataframe without renaming columns
-    gt = shift_df(gt, shift=shift, rename_cols=False)
-    return gt
+        if shift is not None and shift != 0:
+            # Rename unshifted gt columns to reflect shifted data name
+            cols_to_shift = gt.columns.drop(
+                ['lat', 'lon', date_col], errors='ignore')
+            gt.rename(columns=dict(
+                list(zip(cols_to_shift, [col+"_shift"+str(shift) for col in cols_to_shift]))),
+                inplace=True)
+        clim_col = gt_col+"_clim"
+        lookup = _climatology_lookup(clim_file, mask_df, unshifted_gt_col)
+        if lookup is not None and clim_col not in gt.columns:
+            # Gather climatology by grid cell and day of year
+            gt[clim_col] = lookup.lookup(gt['lat'].to_numpy(), gt['lon'].to_numpy(), gt[date_col])
+        else:
+            # Merge associated climatology of the days of year of gt into dataset
+            climatology = load_measurement(clim_file, mask_df).rename(
+                columns={unshifted_gt_col: gt_col})
+            if len(gt):
+                climatology = day_of_year_slice(
+                    climatology, gt[date_col].min(), gt[date_col].max()).reset_index(drop=True)
+            # Merge on the coordinate values of compact ground truth
+            gt = gt.astype({col: climatology[col].dtype for col in ['lat', 'lon']
+                            if isinstance(gt[col].dtype, pd.CategoricalDtype)})
+            gt = pd.merge(gt, climatology[[gt_col]],
+                          left_on=['lat', 'lon', gt[date_col].dt.month,
+                                   gt[date_col].dt.day],
+                          right_on=[climatology.lat, climatology.lon,
+                                    climatology[date_col].dt.month,
+                                    climatology[date_col].dt.day],
+                          how='left', suffixes=('', '_clim')).drop(['key_2', 'key_3'], axis=1)
+        # Compute ground-truth anomalies
+        anom_col = gt_col+"_anom"
+        gt[anom_col] = gt[gt_col] - gt[clim_col]
+        info["rows_out"] = len(gt)
+    return apply_dtype_policy(gt, dtype_policy)
+
+
+def _climatology_lookup(clim_file, mask_df, col):
+    """Return (possibly cached) DayOfYearLookup of column col of the climatology in clim_file.
+
+    Returns None if the climatology does not form a lookup table, e.g., if it
+    has several rows for the same (lat, lon, month, day).
+    """
+    def load():
+        climatology = load_measurement(clim_file, mask_df)
+        try:
+            return DayOfYearLookup(climatology, col)
+        except ValueError:
+            return None
+
+    return memoize_climatology_lookup(
+        (file_fingerprint(clim_file), mask_fingerprint(mask_df), col), load)
 
 
-def get_forecast(forecast_id, mask_df=None, shift=None, sync=True, allow_write=False):
+def get_forecast(forecast_id, mask_df=None, shift=None, sync=True, allow_write=False,
+                 first_year=None, as_cube=False, start_date=None, end_date=None,
+                 dtype_policy=None, leads=None, partition=False):
     """Return CFSv2 forecast data as a dataframe.
 
     Forecast data from the following available models:
@@ -353,18 +499,199 @@ def get_forecast(forecast_id, mask_df=None, shift=None, sync=True, allow_write=F
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    first_year: int, optional (default=None)
+        Only return rows with (shifted) start_date year >= first_year; if None,
+        do not prune rows by year. Only the needed years are read from files
+        with a partitioned layout (see :func:`~subseasonal_data.storage.convert_to_partitioned`).
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date >= start_date;
+        earlier unshifted dates are read as needed to fill the shifted rows.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date <= end_date.
+
+    as_cube: bool, optional (default=False)
+        Whether to return a :class:`~subseasonal_data.grid.GridCube` with dense
+        (date, lat, lon) arrays instead of a long-format dataframe.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
+    leads: list of float, optional (default=None)
+        If not None, only return forecasts with these lead times in days
+        (see :func:`~subseasonal_data.utils.load_forecast_from_file`).
+        Other leads are not read from files with a partitioned layout.
+
+    partition: bool, optional (default=False)
+        Whether to convert the forecast file to the partitioned layout
+        (see :func:`~subseasonal_data.storage.convert_to_partitioned`) first,
+        so that this and later calls only read the requested dates, leads and
+        grid points. Requires ``pyarrow``; skipped with a warning if it is not
+        installed.
+
     Returns
     -------
-    forecast_df: pd.DataFrame
+    forecast_df: pd.DataFrame or GridCube
         Dataframe with forecasts for each available (start_date, lat, lon) triplet.
     """
     forecast_file = get_local_file_path(
-        data_subdir="dataframes", fname=FORECASTID_TO_FILENAME[forecast_id]+".h5", sync=sync)
-    printf(f"Loading {forecast_file}")
-    forecast = load_forecast_from_file(forecast_file, mask_df)
+        data_subdir="dataframes", fname=_forecast_fname(forecast_id), sync=sync, allow_write=allow_write)
+    if partition:
+        _convert_if_possible(forecast_file, "forecast")
+    # Read enough earlier dates to fill the first shifted dates
+    start_date, end_date = _to_timestamp(start_date), _to_timestamp(end_date)
+    with stage("load", message=f"Loading {forecast_file}", file=forecast_file) as info:
+        forecast = load_forecast_from_file(forecast_file, mask_df,
+                                           first_year=_lookback_year(first_year, shift),
+                                           start_date=_lookback_date(start_date, shift),
+                                           end_date=_lookback_date(end_date, shift),
+                                           dtype_policy=dtype_policy, leads=leads)
+        info["rows_out"] = len(forecast)
+
+    forecast = shift_df(forecast, shift=shift,
+                        groupby_cols=['lat', 'lon'])
+    if shift is not None and shift != 0:
+        forecast = year_slice(forecast, first_year=first_year)
+        forecast = date_slice(forecast, start_date, end_date).reset_index(drop=True)
+    return _as_cube(forecast, as_cube)
+
 
-    return shift_df(forecast, shift=shift,
-                    groupby_cols=['lat', 'lon'])
+def get_forecast_ensemble(var, members=None, stats=None, mask_df=None, quantiles=[0.1, 0.5, 0.9],
+                          thresholds=[0.0], sync=True, allow_write=False, first_year=None,
+                          start_date=None, end_date=None, n_jobs=1, executor=None):
+    """Return ECMWF perturbed ensemble forecasts or streaming ensemble statistics.
+
+    Members are read with :func:`get_forecast`, up to n_jobs at a time, and
+    either stacked into an ensemble :class:`~subseasonal_data.grid.GridCube`
+    or reduced as they arrive (see :class:`~subseasonal_data.ensemble.EnsembleStatistics`),
+    in which case only the statistics and the members being read are held in
+    memory. Forecast variables are matched across members by column position
+    and named after the columns of the first member.
+
+    Parameters
+    ----------
+    var: string, {'tmp2m', 'precip'}
+        Forecast variable.
+
+    members: list of int, optional (default=None)
+        Perturbed member numbers in ECMWF_ENSEMBLE_MEMBERS; if None, all members.
+
+    stats: list of string, optional (default=None)
+        Statistics to compute, a subset of
+        :const:`~subseasonal_data.ensemble.ENSEMBLE_STATS`
+        ('mean', 'spread', 'quantiles', 'exceedance'); if None, return the members.
+
+    mask_df: pd.DataFrame, optional (default=None)
+        Mask to use for filtering the data. Columns of dataframe should be lat, lon, and mask,
+        where mask is a {0,1} variable indicating whether the grid point should be included (1) or excluded (0).
+
+    quantiles: list of float, optional (default=[0.1, 0.5, 0.9])
+        Quantile levels of the 'quantiles' statistic. The q{q} columns are
+        exact for up to SKETCH_CENTROIDS_PER_QUANTILE * len(quantiles)
+        members (24 by default) and approximate beyond that (see
+        :class:`~subseasonal_data.ensemble.EnsembleStatistics`).
+
+    thresholds: list of float, optional (default=[0.0])
+        Thresholds of the 'exceedance' statistic.
+
+    sync: bool (default=True)
+        Whether to download/sync the source files.
+
+    allow_write: bool, (default=False)
+        Whether to give write permissions to all users when syncing files.
+        Recommended if working in shared directories. Users must be allowed
+        to set permissions.
+
+    first_year, start_date, end_date:
+        See :func:`get_forecast`.
+
+    n_jobs, executor:
+        Number of members read at the same time and pool reading them
+        (see :func:`get_lat_lon_date_features`).
+
+    Returns
+    -------
+    ensemble: GridCube or pd.DataFrame
+        If stats is None, cube with arrays of shape (member, date, lat, lon);
+        otherwise dataframe with columns lat, lon, start_date and, for each
+        forecast variable col, col+"_mean", col+"_spread", col+"_q{q}" and
+        col+"_exceed{t}" for the requested statistics, ordered by lat, lon
+        and start_date.
+    """
+    members = ECMWF_ENSEMBLE_MEMBERS if members is None else list(members)
+    forecast_ids = [f"ecmwf-{var}-us1_5-pf{member}-forecast" for member in members]
+    unknown = [forecast_id for forecast_id in forecast_ids if forecast_id not in FORECASTID_TO_FILENAME]
+    if unknown:
+        raise ValueError(f"Unrecognized ensemble forecasts {unknown}")
+    if stats is not None:
+        # Reject unknown statistics before reading any member
+        EnsembleStatistics(stats, quantiles, thresholds)
+    if sync:
+        _prefetch_sources([_forecast_fname(forecast_id) for forecast_id in forecast_ids],
+                          allow_write=allow_write)
+    tasks = [([_forecast_fname(forecast_id)], functools.partial(
+        _load_feature, f"\nGetting {forecast_id}", get_forecast, forecast_id, mask_df, sync=False,
+        first_year=first_year, start_date=start_date, end_date=end_date))
+        for forecast_id in forecast_ids]
+    keys = ['lat', 'lon', 'start_date']
+    cells = pd.MultiIndex.from_arrays([[], [], []], names=keys)
+    value_cols = None
+    accumulators = {}
+    stacked = []
+    for forecast in _iter_sources(tasks, n_jobs=n_jobs, executor=executor, bounded=True):
+        member_cols = [col for col in forecast.columns if col not in keys]
+        if value_cols is None:
+            value_cols = member_cols
+            accumulators = {col: EnsembleStatistics(stats, quantiles, thresholds)
+                            for col in value_cols} if stats is not None else {}
+        elif len(member_cols) != len(value_cols):
+            raise ValueError(f"Ensemble members have different forecast columns: "
+                             f"{value_cols} and {member_cols}")
+        # Index the cells of this member, appending cells not seen before
+        member_cells = pd.MultiIndex.from_frame(forecast[keys])
+        if member_cells.has_duplicates:
+            raise ValueError("Ensemble member has duplicated lat-lon-date combinations")
+        idx = cells.get_indexer(member_cells)
+        new = idx < 0
+        if new.any():
+            idx[new] = len(cells) + np.arange(new.sum())
+            cells = cells.append(member_cells[new])
+            for accumulator in accumulators.values():
+                accumulator.extend(new.sum())
+        if stats is None:
+            stacked.append((idx, {col: forecast[member_col].to_numpy()
+                                  for col, member_col in zip(value_cols, member_cols)}))
+        else:
+            for col, member_col in zip(value_cols, member_cols):
+                accumulators[col].update(idx, forecast[member_col].to_numpy())
+    if stats is None:
+        return _ensemble_cube(cells, stacked, members, value_cols or [])
+    df = cells.to_frame(index=False)
+    for col, accumulator in accumulators.items():
+        for name, values in accumulator.result().items():
+            df[f"{col}_{name}"] = values
+    return df.sort_values(keys, kind='mergesort').reset_index(drop=True)
+
+
+def _ensemble_cube(cells, stacked, members, value_cols):
+    """Return ensemble GridCube of the (cell indices, values by column) of each member."""
+    dates, date_idx = np.unique(cells.get_level_values('start_date').to_numpy(), return_inverse=True)
+    lats, lat_idx = np.unique(cells.get_level_values('lat').to_numpy(), return_inverse=True)
+    lons, lon_idx = np.unique(cells.get_level_values('lon').to_numpy(), return_inverse=True)
+    shape = (len(members), len(dates), len(lats), len(lons))
+    present = np.zeros(shape, dtype=bool)
+    data = {}
+    for member_idx, (idx, values) in enumerate(stacked):
+        position = (member_idx, date_idx.ravel()[idx], lat_idx.ravel()[idx], lon_idx.ravel()[idx])
+        present[position] = True
+        for col in value_cols:
+            if col not in data:
+                dtype = np.result_type(values[col].dtype, np.float32)
+                data[col] = np.full(shape, np.nan, dtype=dtype)
+            data[col][position] = values[col]
+    return GridCube(data, dates, lats, lons, present=present, members=members)
 
 
 def get_lat_lon_gt(gt_id, mask_df=None, sync=True, allow_write=False):
@@ -393,7 +720,7 @@ def get_lat_lon_gt(gt_id, mask_df=None, sync=True, allow_write=False):
         Lat_lon data dataframe.
     """
     gt_file = get_local_file_path(
-        data_subdir="dataframes", fname="gt-{}.h5".format(gt_id), sync=sync, allow_write=allow_write)
+        data_subdir="dataframes", fname=_lat_lon_gt_fname(gt_id), sync=sync, allow_write=allow_write)
     df = load_measurement(gt_file, mask_df)
     return df
 
@@ -402,9 +729,16 @@ def load_combined_data(file_id, gt_id,
                        target_horizon,
                        target_date_obj=None,
                        columns=None, sync=True,
-                       allow_write=False):
+                       allow_write=False, start_date=None,
+                       end_date=None, mask_df=None,
+                       memory_map=False, dtype_policy=None):
     """Load and return a previously saved combined data dataset.
 
+    If memory_map is True or any of start_date, end_date and mask_df is given,
+    the file is memory-mapped and scanned with
+    :func:`~subseasonal_data.storage.read_feather_filtered`, so only the
+    requested slice is materialized.
+
     Parameters
     ----------
     file_id: string
@@ -433,6 +767,23 @@ def load_combined_data(file_id, gt_id,
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    start_date: datetime-like, optional (default=None)
+        If not None, only load rows with start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only load rows with start_date <= end_date.
+
+    mask_df: pd.DataFrame, optional (default=None)
+        If not None, only load rows with (lat, lon) pairs in mask_df.
+
+    memory_map: bool, optional (default=False)
+        Whether to memory-map the file and filter it before conversion to pandas,
+        even if no filter is given.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
     Returns
     -------
     combined_data_df: pd.DataFrame
@@ -445,15 +796,22 @@ def load_combined_data(file_id, gt_id,
     # Read data_file from disk
     # ---------------
     col_arg = "all columns" if columns is None else columns
-    printf(f"Reading {col_arg} from file {data_file}")
-    data = pd.read_feather(data_file, columns=columns)
+    with stage("read", message=f"Reading {col_arg} from file {data_file}", file=data_file) as info:
+        if memory_map or start_date is not None or end_date is not None or mask_df is not None:
+            data = read_feather_filtered(data_file, columns=columns, start_date=start_date,
+                                         end_date=end_date, mask_df=mask_df)
+        else:
+            data = pd.read_feather(data_file, columns=columns)
+        info["rows_out"] = len(data)
+    data = apply_dtype_policy(data, dtype_policy)
     # Print any data columns missing on target date
     if target_date_obj is not None:
         print_missing_cols_func(data, target_date_obj, True)
     return data
 
 
-def get_date_features(gt_ids=[], gt_masks=None, gt_shifts=None, first_year=None, sync=True, allow_write=False):
+def get_date_features(gt_ids=[], gt_masks=None, gt_shifts=None, first_year=None, sync=True, allow_write=False,
+                      start_date=None, end_date=None, dtype_policy=None, n_jobs=1, executor=None):
     """Return dataframe of features associated with start_date values.
 
     If any of the input dataframes contains columns (lat, lon), it is converted
@@ -488,6 +846,28 @@ def get_date_features(gt_ids=[], gt_masks=None, gt_shifts=None, first_year=None,
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    start_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the returned data
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
+    n_jobs: int, optional (default=1)
+        Number of sources loaded at the same time; -1 uses all cores. Sources
+        are loaded, masked, year-sliced and shifted concurrently and merged
+        in order, so the result equals that of loading them one by one.
+        Fewer sources are loaded at once if their estimated memory exceeds
+        PARALLEL_MEMORY_FRACTION of the available memory.
+
+    executor: {None, 'thread', 'process'} or concurrent.futures.Executor, optional (default=None)
+        Pool loading the sources if n_jobs != 1 or an Executor is given;
+        None uses threads. HDF5 files are read one at a time within a process,
+        so use 'process' to also read them in parallel.
+
     Returns
     -------
     date_features_df: pd.DataFrame
@@ -499,40 +879,57 @@ def get_date_features(gt_ids=[], gt_masks=None, gt_shifts=None, first_year=None,
     if not isinstance(gt_shifts, list):
         gt_shifts = itertools.repeat(gt_shifts)
 
+    # Download or sync all source files at once
+    if sync:
+        _prefetch_sources([_ground_truth_fname(gt_id) for gt_id in gt_ids],
+                          allow_write=allow_write)
+
+    # Load each ground truth feature
+    features = _load_sources(
+        [([_ground_truth_fname(gt_id)], functools.partial(
+            _date_feature, gt_id, gt_mask, gt_shift, first_year=first_year,
+            start_date=start_date, end_date=end_date, dtype_policy=dtype_policy))
+         for gt_id, gt_mask, gt_shift in zip(gt_ids, gt_masks, gt_shifts)],
+        n_jobs=n_jobs, executor=executor)
+
     # Add each ground truth feature to dataframe
     df = None
-    for gt_id, gt_mask, gt_shift in zip(gt_ids, gt_masks, gt_shifts):
+    for gt in features:
+        # Use outer merge to include union of start_date values across all features
+        # combinations across all features
+        with stage("merge", message="Merging") as info:
+            df = df_merge(df, gt, on="start_date")
+            info["rows_out"] = len(df)
+
+    return df
+
+
+def _date_feature(gt_id, gt_mask, gt_shift, first_year=None, start_date=None, end_date=None,
+                  dtype_policy=None):
+    """Return ground truth feature of :func:`get_date_features` in wide format."""
+    with stage("feature", message="\nGetting {}_shift{}".format(gt_id, gt_shift)) as info:
         # Load ground truth data
-        printf("\nGetting {}_shift{}".format(gt_id, gt_shift))
-        gt = get_ground_truth(gt_id, gt_mask, gt_shift,
-                              sync=sync, allow_write=allow_write)
+        gt = get_ground_truth(gt_id, gt_mask, gt_shift, sync=False, first_year=first_year,
+                              start_date=start_date, end_date=end_date, dtype_policy=dtype_policy)
         # Discard years prior to first_year
-        printf(f"Discarding years prior to {first_year}")
+        log_message(f"Discarding years prior to {first_year}")
         gt = year_slice(gt, first_year=first_year)
         # If lat, lon columns exist, pivot to wide format
         if 'lat' in gt.columns and 'lon' in gt.columns:
-            if gt_shift is None:
-                measurement_variable = get_measurement_variable(gt_id)
-            else:
-                measurement_variable = get_measurement_variable(
-                    gt_id)+'_shift'+str(gt_shift)
-            printf("Transforming to wide format")
-            gt = gt.set_index(['lat', 'lon', 'start_date']
-                              ).unstack(['lat', 'lon'])
-            gt = pd.DataFrame(gt.to_records())
-
-        # Use outer merge to include union of start_date values across all features
-        # combinations across all features
-        printf("Merging")
-        df = df_merge(df, gt, on="start_date")
-
-    return df
+            with stage("pivot", message="Transforming to wide format") as pivot_info:
+                pivot_info["rows_in"] = len(gt)
+                gt = pivot_to_wide(gt)
+                pivot_info["rows_out"] = len(gt)
+        info["rows_out"] = len(gt)
+    return gt
 
 
 def get_lat_lon_date_features(gt_ids=[], gt_masks=None, gt_shifts=None,
                               forecast_ids=[], forecast_masks=None, forecast_shifts=None,
                               anom_ids=[], anom_masks=None, anom_shifts=None,
-                              first_year=None, sync=True, allow_write=False):
+                              first_year=None, sync=True, allow_write=False,
+                              start_date=None, end_date=None, dtype_policy=None, n_jobs=1,
+                              executor=None):
     """Return dataframe of features associated with (lat, lon, start_date) values.
 
     Parameters
@@ -591,10 +988,37 @@ def get_lat_lon_date_features(gt_ids=[], gt_masks=None, gt_shifts=None,
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    start_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the features
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+
+    n_jobs: int, optional (default=1)
+        Number of sources loaded at the same time; -1 uses all cores. Sources
+        are loaded, masked, year-sliced and shifted concurrently and merged
+        in order, so the result equals that of loading them one by one.
+        Fewer sources are loaded at once if their estimated memory exceeds
+        PARALLEL_MEMORY_FRACTION of the available memory.
+
+    executor: {None, 'thread', 'process'} or concurrent.futures.Executor, optional (default=None)
+        Pool loading the sources if n_jobs != 1 or an Executor is given;
+        None uses threads. HDF5 files are read one at a time within a process,
+        so use 'process' to also read them in parallel.
+
     Returns
     -------
     lat_lon_date_features_df: pd.DataFrame
         Data dataframe containing (lat, lon, start_date) features.
+
+    See Also
+    --------
+    :class:`~subseasonal_data.features.FeatureSet`: builds the same features
+    reading each source file once.
     """
     # If particular arguments aren't lists, replace with repeating iterators
     if not isinstance(gt_masks, list):
@@ -610,67 +1034,175 @@ def get_lat_lon_date_features(gt_ids=[], gt_masks=None, gt_shifts=None,
     if not isinstance(anom_shifts, list):
         anom_shifts = itertools.repeat(anom_shifts)
 
-    # Define canonical name for target start date column
-    date_col = "start_date"
-    # Function that warns if any lat-lon-date combinations are duplicated
-
-    def warn_if_duplicated(df):
-        if df[['lat', 'lon', date_col]].duplicated().any():
-            print(
-                "Warning: dataframe contains duplicated lat-lon-date combinations", file=sys.stderr)
+    # Download or sync all source files at once
+    if sync:
+        _prefetch_sources(
+            [_ground_truth_fname(gt_id) for gt_id in gt_ids] +
+            [_forecast_fname(forecast_id) for forecast_id in forecast_ids] +
+            [fname for anom_id in anom_ids
+             for fname in [_ground_truth_fname(anom_id), _climatology_fname(anom_id)]],
+            allow_write=allow_write)
+
+    # Collect all features and align them on (lat,lon,start_date) at the end
+    options = dict(sync=False, first_year=first_year, start_date=start_date, end_date=end_date,
+                   dtype_policy=dtype_policy)
+    tasks = []
     # Add each ground truth feature to dataframe
-    df = None
-    printf("\nAdding ground truth features to dataframe")
     for gt_id, gt_mask, gt_shift in zip(gt_ids, gt_masks, gt_shifts):
-        printf(f"\nGetting {gt_id}_shift{gt_shift}")
-        # Load ground truth data
-        gt = get_ground_truth(gt_id, gt_mask, shift=gt_shift,
-                              sync=sync, allow_write=allow_write)
-        # Discard years prior to first_year
-        gt = year_slice(gt, first_year=first_year)
-        # Use outer merge to include union of (lat,lon,date_col)
-        # combinations across all features
-        df = df_merge(df, gt)
-        warn_if_duplicated(df)
+        tasks.append(([_ground_truth_fname(gt_id)], functools.partial(
+            _load_feature, f"\nGetting {gt_id}_shift{gt_shift}", get_ground_truth,
+            gt_id, gt_mask, shift=gt_shift, **options)))
 
     # Add each forecast feature to dataframe
-    printf("\nAdding forecast features to dataframe")
     for forecast_id, forecast_mask, forecast_shift in zip(forecast_ids,
                                                           forecast_masks,
                                                           forecast_shifts):
-        printf("\nGetting {}_shift{}".format(forecast_id, forecast_shift))
-        # Load forecast with years >= first_year
-        forecast = get_forecast(
-            forecast_id, forecast_mask, shift=forecast_shift, sync=sync, allow_write=allow_write)
-        # Discard years prior to first_year
-        forecast = year_slice(forecast, first_year=first_year)
-        # Use outer merge to include union of (lat,lon,date_col)
-        # combinations across all features
-        df = df_merge(df, forecast)
-        warn_if_duplicated(df)
+        tasks.append(([_forecast_fname(forecast_id)], functools.partial(
+            _load_feature, f"\nGetting {forecast_id}_shift{forecast_shift}", get_forecast,
+            forecast_id, forecast_mask, shift=forecast_shift, **options)))
 
     # Add anomaly features and climatology last so that climatology
     # is produced for all previously added start dates
-    printf("\nAdding anomaly features to dataframe")
     for anom_id, anom_mask, anom_shift in zip(anom_ids, anom_masks, anom_shifts):
-        printf("\nGetting {}_shift{} with anomalies".format(anom_id, anom_shift))
-        # Add masked ground truth anomalies
-        gt = get_ground_truth_anomalies(
-            anom_id, mask_df=anom_mask, shift=anom_shift)
-        # Discard years prior to first_year
-        printf(f"Discarding years prior to {first_year}")
-        gt = year_slice(gt, first_year=first_year)
-        # Use outer merge to include union of (lat,lon,date_col)
-        # combinations across all features
-        printf("Merging in features")
-        df = df_merge(df, gt)
-        printf("Checking for row duplications")
-        warn_if_duplicated(df)
+        tasks.append(([_ground_truth_fname(anom_id), _climatology_fname(anom_id)], functools.partial(
+            _load_feature, f"\nGetting {anom_id}_shift{anom_shift} with anomalies",
+            get_ground_truth_anomalies, anom_id, anom_mask, shift=anom_shift, **options)))
+    features = _load_sources(tasks, n_jobs=n_jobs, executor=executor)
+
+    # Use outer merge to include union of (lat,lon,start_date)
+    # combinations across all features
+    with stage("merge", message="Merging in features") as info:
+        df = align_frames(
+            features, duplicate_warning="Warning: dataframe contains duplicated lat-lon-date combinations")
+        info["rows_out"] = None if df is None else len(df)
+    return df
+
 
+def _load_feature(message, load, *args, **kwargs):
+    """Return the rows of load(*args, **kwargs) with year >= first_year
+    as a feature stage with the given message.
+    """
+    with stage("feature", message=message) as info:
+        df = load(*args, **kwargs)
+        # Discard years prior to first_year
+        df = year_slice(df, first_year=kwargs.get("first_year"))
+        info["rows_out"] = len(df)
     return df
 
 
-def get_lat_lon_features(gt_ids=[], gt_masks=None, sync=True, allow_write=False):
+def iter_date_features(gt_ids=[], gt_masks=None, gt_shifts=None, first_year=None, sync=True,
+                       allow_write=False, start_date=None, end_date=None, window="year",
+                       partition=False, dtype_policy=None, n_jobs=1, executor=None):
+    """Yield dataframes of features associated with start_date values for consecutive date windows.
+
+    Takes the same arguments as :func:`get_date_features` and yields, in
+    start_date order, the rows of its result for one window of start dates at a
+    time, by calling it with the start_date and end_date bounds of each window.
+    Wide-format columns of each window are those of the grid points present in
+    that window.
+
+    Only source files with a partitioned layout are read incrementally; others
+    are read in full for every window, and a warning is issued (see partition).
+
+    Parameters
+    ----------
+    gt_ids, gt_masks, gt_shifts, first_year, sync, allow_write, start_date, end_date, dtype_policy, n_jobs, executor:
+        See :func:`get_date_features`.
+
+    window: "year" or int, optional (default="year")
+        Yield one frame per calendar year of start dates or one frame per
+        window of this many consecutive start dates.
+
+    partition: bool, optional (default=False)
+        Whether to convert the source files to the partitioned layout
+        (see :func:`~subseasonal_data.storage.convert_to_partitioned`) first so
+        each window reads only its own rows. Conversion writes a Parquet copy
+        of each source file next to it in the data directory; it requires
+        ``pyarrow`` and is skipped with a warning if it is not installed.
+
+    Yields
+    ------
+    date_features_df: pd.DataFrame
+        Date features of one window.
+    """
+    if sync:
+        _prefetch_sources([_ground_truth_fname(gt_id) for gt_id in gt_ids],
+                          allow_write=allow_write)
+    shifts = gt_shifts if isinstance(gt_shifts, list) else itertools.repeat(gt_shifts)
+    sources = [(_ground_truth_fname(gt_id), "measurement", shift)
+               for gt_id, shift in zip(gt_ids, shifts)]
+    for window_start, window_end in _date_windows(sources, window, first_year, start_date,
+                                                  end_date, partition):
+        yield get_date_features(gt_ids, gt_masks, gt_shifts, first_year=first_year, sync=False,
+                                start_date=window_start, end_date=window_end,
+                                dtype_policy=dtype_policy, n_jobs=n_jobs, executor=executor)
+
+
+def iter_lat_lon_date_features(gt_ids=[], gt_masks=None, gt_shifts=None,
+                               forecast_ids=[], forecast_masks=None, forecast_shifts=None,
+                               anom_ids=[], anom_masks=None, anom_shifts=None,
+                               first_year=None, sync=True, allow_write=False,
+                               start_date=None, end_date=None, window="year", partition=False,
+                               dtype_policy=None, n_jobs=1, executor=None):
+    """Yield dataframes of features associated with (lat, lon, start_date) values for consecutive date windows.
+
+    Takes the same arguments as :func:`get_lat_lon_date_features` and yields,
+    in start_date order, the rows of its result for one window of start dates
+    at a time, by calling it with the start_date and end_date bounds of each
+    window. Each source file is read only for the dates of the window, moved
+    back by the feature's shift, so shifted and anomaly features are
+    identical to those of the full result. Peak memory scales with the
+    window rather than with the full date range.
+
+    Only source files with a partitioned layout are read incrementally; others
+    are read in full for every window, and a warning is issued (see partition).
+
+    Parameters
+    ----------
+    gt_ids, gt_masks, gt_shifts, forecast_ids, forecast_masks, forecast_shifts, anom_ids, anom_masks, anom_shifts, first_year, sync, allow_write, start_date, end_date, dtype_policy, n_jobs, executor:
+        See :func:`get_lat_lon_date_features`.
+
+    window: "year" or int, optional (default="year")
+        Yield one frame per calendar year of start dates or one frame per
+        window of this many consecutive start dates.
+
+    partition: bool, optional (default=False)
+        Whether to convert the source files to the partitioned layout
+        (see :func:`~subseasonal_data.storage.convert_to_partitioned`) first so
+        each window reads only its own rows. Conversion writes a Parquet copy
+        of each source file next to it in the data directory; it requires
+        ``pyarrow`` and is skipped with a warning if it is not installed.
+
+    Yields
+    ------
+    lat_lon_date_features_df: pd.DataFrame
+        (lat, lon, start_date) features of one window.
+    """
+    if sync:
+        _prefetch_sources(
+            [_ground_truth_fname(gt_id) for gt_id in gt_ids] +
+            [_forecast_fname(forecast_id) for forecast_id in forecast_ids] +
+            [fname for anom_id in anom_ids
+             for fname in [_ground_truth_fname(anom_id), _climatology_fname(anom_id)]],
+            allow_write=allow_write)
+    sources = []
+    for ids, shifts, fname_func, reader in [
+            (gt_ids, gt_shifts, _ground_truth_fname, "measurement"),
+            (forecast_ids, forecast_shifts, _forecast_fname, "forecast"),
+            (anom_ids, anom_shifts, _ground_truth_fname, "measurement")]:
+        shifts = shifts if isinstance(shifts, list) else itertools.repeat(shifts)
+        sources += [(fname_func(source_id), reader, shift) for source_id, shift in zip(ids, shifts)]
+    for window_start, window_end in _date_windows(sources, window, first_year, start_date,
+                                                  end_date, partition):
+        yield get_lat_lon_date_features(
+            gt_ids, gt_masks, gt_shifts, forecast_ids, forecast_masks, forecast_shifts,
+            anom_ids, anom_masks, anom_shifts, first_year=first_year, sync=False,
+            start_date=window_start, end_date=window_end, dtype_policy=dtype_policy,
+            n_jobs=n_jobs, executor=executor)
+
+
+def get_lat_lon_features(gt_ids=[], gt_masks=None, sync=True, allow_write=False, n_jobs=1,
+                         executor=None):
     """Return dataframe with (lat, lon) features gt_ids.
 
     Parameters
@@ -687,6 +1219,9 @@ def get_lat_lon_features(gt_ids=[], gt_masks=None, sync=True, allow_write=False)
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    n_jobs, executor:
+        See :func:`get_lat_lon_date_features`.
+
     Returns
     -------
     lat_lon_features_df: pd.DataFrame
@@ -696,12 +1231,205 @@ def get_lat_lon_features(gt_ids=[], gt_masks=None, sync=True, allow_write=False)
     if not isinstance(gt_masks, list):
         gt_masks = itertools.repeat(gt_masks)
 
+    # Download or sync all source files at once
+    if sync:
+        _prefetch_sources([_lat_lon_gt_fname(gt_id) for gt_id in gt_ids],
+                          allow_write=allow_write)
+
+    # Load ground truth data
+    features = _load_sources(
+        [([_lat_lon_gt_fname(gt_id)], functools.partial(
+            _load_feature, "Getting {}".format(gt_id), get_lat_lon_gt, gt_id, gt_mask,
+            sync=False))
+         for gt_id, gt_mask in zip(gt_ids, gt_masks)],
+        n_jobs=n_jobs, executor=executor)
+
     df = None
-    for gt_id, gt_mask in zip(gt_ids, gt_masks):
-        printf("Getting {}".format(gt_id))
-        # Load ground truth data
-        gt = get_lat_lon_gt(gt_id, gt_mask, sync=sync, allow_write=allow_write)
+    for gt in features:
         # Use outer merge to include union of (lat,lon,date_col)
         # combinations across all features
         df = df_merge(df, gt, on=["lat", "lon"])
     return df
+
+
+def _as_cube(df, as_cube):
+    """Return df as a GridCube if as_cube is True and df unchanged otherwise."""
+    return GridCube.from_frame(df) if as_cube else df
+
+
+def _ground_truth_fname(gt_id):
+    """Return name of the ground truth file of gt_id in the dataframes directory."""
+    if gt_id.endswith("mei"):
+        # MEI does not have an associated number of days
+        return "gt-"+gt_id+".h5"
+    if gt_id.endswith("mjo"):
+        # MJO is not aggregated to a 14-day period
+        return "gt-"+gt_id+"-1d.h5"
+    return "gt-"+gt_id+"-14d.h5"
+
+
+def _climatology_fname(gt_id):
+    """Return name of the climatology file of gt_id in the dataframes directory."""
+    return "official_climatology-"+gt_id+".h5"
+
+
+def _forecast_fname(forecast_id):
+    """Return name of the forecast file of forecast_id in the dataframes directory."""
+    return FORECASTID_TO_FILENAME[forecast_id]+".h5"
+
+
+def _lat_lon_gt_fname(gt_id):
+    """Return name of the lat_lon feature file of gt_id in the dataframes directory."""
+    return "gt-{}.h5".format(gt_id)
+
+
+def _prefetch_sources(fnames, allow_write=False):
+    """Download or sync the given files of the dataframes directory concurrently.
+
+    Raises the error of the first failed transfer.
+    """
+    with stage("sync", message="Syncing data....Set sync=False to avoid this step."):
+        status = prefetch([("dataframes", fname) for fname in fnames], allow_write=allow_write)
+    for file_status in status.values():
+        if file_status["error"] is not None:
+            raise file_status["error"]
+
+
+def _load_sources(tasks, n_jobs=1, executor=None):
+    """Return the results of the (fnames, load) source tasks in task order.
+
+    Runs the loads one after the other if n_jobs is 1 and executor is None and
+    concurrently otherwise. Tasks are submitted in order, and a task waits
+    until the estimated memory of the tasks in flight, SOURCE_MEMORY_FACTOR
+    times the size of their files in the dataframes directory, leaves room
+    for it within PARALLEL_MEMORY_FRACTION of the available memory; one task
+    is always allowed to run.
+    """
+    return list(_iter_sources(tasks, n_jobs=n_jobs, executor=executor))
+
+
+def _iter_sources(tasks, n_jobs=1, executor=None, bounded=False):
+    """Yield the results of the (fnames, load) source tasks in task order
+    (see :func:`_load_sources`).
+
+    If bounded, at most n_jobs results are loaded ahead of the consumer, so
+    consuming one result at a time keeps at most n_jobs + 1 results in memory.
+    """
+    if n_jobs == 1 and executor is None:
+        for _, load in tasks:
+            yield load()
+        return
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    if isinstance(executor, Executor):
+        pool = executor
+    elif executor is None or executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=n_jobs)
+    elif executor == "process":
+        pool = ProcessPoolExecutor(max_workers=n_jobs)
+    else:
+        raise ValueError(f"Unrecognized executor {executor}; use 'thread', 'process' or an Executor")
+    budget = _memory_budget()
+    futures = deque()
+    in_flight = {}
+    try:
+        for fnames, load in tasks:
+            if bounded and len(futures) >= n_jobs:
+                yield futures.popleft().result()
+            nbytes = SOURCE_MEMORY_FACTOR * sum(_local_size(fname) or 0 for fname in fnames)
+            while budget is not None and in_flight and sum(in_flight.values()) + nbytes > budget:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+            future = pool.submit(load)
+            in_flight[future] = nbytes
+            futures.append(future)
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        # Drop tasks that have not started, e.g., if the consumer stopped early
+        for future in futures:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown()
+
+
+def _memory_budget():
+    """Return PARALLEL_MEMORY_FRACTION of the available memory in bytes or None if unknown.
+
+    Available memory is MemAvailable of /proc/meminfo, which counts reclaimable
+    page cache, falling back to the free physical memory.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return PARALLEL_MEMORY_FRACTION * int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return PARALLEL_MEMORY_FRACTION * os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _local_size(fname):
+    """Return size in bytes of fname in the local dataframes directory or None if absent."""
+    try:
+        return os.path.getsize(get_local_file_path(data_subdir="dataframes", fname=fname, sync=False))
+    except OSError:
+        return None
+
+
+def _date_windows(sources, window, first_year=None, start_date=None, end_date=None,
+                  partition=False):
+    """Return list of (first date, last date) of consecutive windows of the shifted
+    start dates of the given (fname, reader, shift) sources of the dataframes directory.
+
+    Warns if several windows will read source files without a partitioned layout in full.
+    """
+    if window != "year" and not (isinstance(window, int) and window > 0):
+        raise ValueError(f"Unrecognized window {window}; use 'year' or a positive integer")
+    first_date, end_date = _first_date(first_year, start_date), _to_timestamp(end_date)
+    source_dates = []
+    unpartitioned = []
+    for fname, reader, shift in sources:
+        file_name = get_local_file_path(data_subdir="dataframes", fname=fname, sync=False)
+        if partition:
+            _convert_if_possible(file_name, reader)
+        if is_partitioned_current(file_name):
+            read = _read_measurement if reader == "measurement" else _read_forecast
+            # Only read the dates that can produce shifted dates in range
+            dates = read(file_name, columns=[], start_date=_lookback_date(first_date, shift),
+                         end_date=_lookback_date(end_date, shift))['start_date']
+            dates = pd.Series(dates.unique())
+        else:
+            # Read only the dates of the HDF5 file
+            dates = _read_hdf_dates(file_name)
+            unpartitioned.append(fname)
+        if shift is not None:
+            dates = dates + pd.Timedelta(days=int(shift))
+        source_dates.append(dates)
+    if not source_dates:
+        return []
+    dates = pd.DatetimeIndex(date_slice(
+        pd.DataFrame({'start_date': pd.concat(source_dates).unique()}), first_date, end_date
+    )['start_date']).sort_values()
+    if window == "year":
+        groups = [dates[dates.year == year] for year in dates.year.unique()]
+    else:
+        groups = [dates[ii:ii+window] for ii in range(0, len(dates), window)]
+    if unpartitioned and len(groups) > 1:
+        warnings.warn(f"Files {unpartitioned} have no partitioned layout, so each of the "
+                      f"{len(groups)} windows reads them in full; pass partition=True "
+                      "(requires pyarrow) to read each window incrementally.")
+    return [(group[0], group[-1]) for group in groups]
+
+
+def _convert_if_possible(file_name, reader):
+    """Convert file_name to the partitioned layout if pyarrow is installed, warning otherwise."""
+    if importlib.util.find_spec("pyarrow") is None:
+        warnings.warn("partition=True requires 'pyarrow', so files are read from HDF5; "
+                      "install it with 'pip install subseasonal-data[arrow]'.")
+        return
+    convert_to_partitioned(file_name, reader=reader)
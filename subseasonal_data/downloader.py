@@ -1,16 +1,58 @@
 import os
+import re
 import sys
+import json
+import time
+import shutil
+import hashlib
 import subprocess
+import threading
 import warnings
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
 from os.path import expanduser
 from subprocess import CalledProcessError
 import requests
+from .instrumentation import stage
 
 # Globals
 DEFAULT_SUBSEASONAL_DATA_DIR = "subseasonal_data"
 SUBSEASONAL_DATA_SUBDIRS = ["dataframes", "combined_dataframes", "masks", os.path.join("ground_truth", "sst_1d")]
 SUBSEASONAL_DATA_BLOB = "https://subseasonalusa.blob.core.windows.net/subseasonalusa"
 SUBSEASONAL_TOKEN_URL = "https://planetarycomputer.microsoft.com/api/sas/v1/token/subseasonalusa/subseasonalusa"
+MANIFEST_DIR = ".manifest"
+MANIFEST_TTL = 3600
+# Seconds for which a failed manifest fetch is not retried by is_local_file_current
+MANIFEST_FAILURE_TTL = 300
+# Seconds before expiry at which a cached access token is renewed
+TOKEN_EXPIRY_MARGIN = 300
+# Assumed token lifetime in seconds if the token endpoint reports no expiry
+DEFAULT_TOKEN_LIFETIME = 1800
+# Default number of files synced concurrently by prefetch
+DEFAULT_PREFETCH_WORKERS = 8
+# Available transfer backends; the default can be set with $SUBSEASONALDATA_TRANSFER
+TRANSFER_BACKENDS = ["azcopy", "http"]
+DEFAULT_TRANSFER_BACKEND = "azcopy"
+# Byte-range size, number of parallel ranges and retries per range of the http backend
+HTTP_CHUNK_SIZE = 32 * 1024**2
+HTTP_MAX_WORKERS = 8
+HTTP_MAX_RETRIES = 5
+# Manifest listing the files of each data subdirectory of an HTTP mirror
+MIRROR_MANIFEST_FNAME = "_manifest.json"
+# ioctl request cloning a file into another on copy-on-write file systems (Linux FICLONE)
+_FICLONE = 0x40049409
+
+# Remote manifests fetched in this session, keyed by data_subdir
+_manifests = {}
+# Times of failed manifest fetches, keyed like _manifests
+_manifest_failures = {}
+_manifest_lock = threading.Lock()
+# Session used by the module-level functions
+_default_session = None
+# Data source set with set_data_source; None to use $SUBSEASONALDATA_SOURCE
+_data_source = None
 
 def download(verbose=True):
     """Download or sync the entire subseasonal dataset from Azure storage.
@@ -31,16 +73,26 @@ def download(verbose=True):
 
     If the data was downloaded before, this function will instead sync the modified files.
 
+    If the transfer backend (see :func:`~subseasonal_data.downloader.get_transfer_backend`)
+    is ``'http'``, files are downloaded with :func:`~subseasonal_data.downloader.http_download`
+    and ``azcopy`` is not required. If the data source
+    (see :func:`~subseasonal_data.downloader.get_data_source`) is a mirror, files
+    are synced from the mirror instead of Azure storage.
+
     Parameters
     ----------
     verbose: bool, default True
         Whether to redirect download progress messages to stdout.
 
     """
+    if get_transfer_backend() == "http" or not isinstance(get_data_source(), AzureBlobSource):
+        for data_subdir in SUBSEASONAL_DATA_SUBDIRS:
+            download_dir(data_subdir, verbose=verbose, backend="http")
+        return
     # Get data path
     data_path = get_subseasonal_data_path()
     # Check azcopy is installed
-    check_azcopy_install()
+    get_default_session().check_azcopy_install()
     # Get data access token
     token = get_access_token()
     # Sync data
@@ -54,9 +106,11 @@ def download(verbose=True):
         # Run azcopy sync
         # Use Popen to access logs in real time
         azcopy_cmd = f"azcopy sync \"{os.path.join(SUBSEASONAL_DATA_BLOB, data_subdir)}?{token}\" {data_subdir_path} --recursive"
-        _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose)
+        _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose,
+                                      progress_callback=get_default_session().progress_callback,
+                                      label=data_subdir, echo=get_default_session().echo_output)
 
-def download_dir(data_subdir, verbose=True, allow_write=False):
+def download_dir(data_subdir, verbose=True, allow_write=False, backend=None):
     """Download or sync the contents of one subseasonal data directory from Azure storage.
     
     Behavior and is similar to :func:`~subseasonal_data.downloader.download`.
@@ -76,11 +130,20 @@ def download_dir(data_subdir, verbose=True, allow_write=False):
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    backend: {'azcopy', 'http'}, optional (default=None)
+        Transfer backend; if None, :func:`~subseasonal_data.downloader.get_transfer_backend` is used.
+
     """
+    if (backend or get_transfer_backend()) == "http" or not isinstance(get_data_source(), AzureBlobSource):
+        print(f"Downloading data from the '{data_subdir}' directory...")
+        for filename in get_remote_manifest(data_subdir, refresh=True):
+            download_file(data_subdir, filename, verbose=verbose,
+                          allow_write=allow_write, backend="http")
+        return
     # Get data path
     data_path = get_subseasonal_data_path()
     # Check azcopy is installed
-    check_azcopy_install()
+    get_default_session().check_azcopy_install()
     # Get data access token
     token = get_access_token()
     print(f"Downloading data from the '{data_subdir}' directory...")
@@ -92,9 +155,11 @@ def download_dir(data_subdir, verbose=True, allow_write=False):
     # Run azcopy sync
     # Use Popen to access logs in real time
     azcopy_cmd = f"azcopy sync \"{os.path.join(SUBSEASONAL_DATA_BLOB, data_subdir)}?{token}\" {data_subdir_path} --recursive"
-    _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose)
+    _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose,
+                                  progress_callback=get_default_session().progress_callback,
+                                  label=data_subdir, echo=get_default_session().echo_output)
 
-def download_file(data_subdir, filename, verbose=True, allow_write=False):
+def download_file(data_subdir, filename, verbose=True, allow_write=False, backend=None):
     """Download or sync one subseasonal data file from Azure storage.
 
     Behavior and is similar to :func:`~subseasonal_data.downloader.download`.
@@ -117,41 +182,627 @@ def download_file(data_subdir, filename, verbose=True, allow_write=False):
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
 
+    backend: {'azcopy', 'http'}, optional (default=None)
+        Transfer backend from Azure storage; if None,
+        :func:`~subseasonal_data.downloader.get_transfer_backend` is used.
+        Ignored if the data source (see :func:`~subseasonal_data.downloader.get_data_source`)
+        is a mirror.
+
     """
     # Check data_subdir is valid
     if data_subdir not in SUBSEASONAL_DATA_SUBDIRS:
         raise ValueError(
             f"The data_subdir '{data_subdir}' does not exist. Valid choices are {SUBSEASONAL_DATA_SUBDIRS}.")
+    backend = backend or get_transfer_backend()
+    if backend not in TRANSFER_BACKENDS:
+        raise ValueError(
+            f"The transfer backend '{backend}' does not exist. Valid choices are {TRANSFER_BACKENDS}.")
     # Get data path
     data_path = get_subseasonal_data_path()
-    # Check azcopy is installed
-    check_azcopy_install()
     # Copy or sync data
     data_subdir_path = os.path.join(
         data_path, data_subdir)
-    if not os.path.exists(data_subdir_path):
-        os.makedirs(data_subdir_path)
     filepath = os.path.join(data_subdir_path, filename)
-    if not os.path.exists(filepath):
-        cmd = "copy"
-    else:
-        cmd = "sync"
-    # Get data access token
-    token = get_access_token()
-    # Run azcopy
-    # Use Popen to access logs in real time
-    azcopy_cmd = f"azcopy {cmd} \"{os.path.join(SUBSEASONAL_DATA_BLOB, data_subdir, filename)}?{token}\" {filepath}"
-    _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose)
+    if not os.path.exists(os.path.dirname(filepath)):
+        os.makedirs(os.path.dirname(filepath))
+    get_data_source().fetch(data_subdir, filename, filepath, verbose=verbose, backend=backend,
+                            allow_write=allow_write)
+    _record_synced_file(data_subdir, filename)
     if allow_write:
         try:
             os.chmod(filepath, 0o777)
         except Exception as err:
             warnings.warn(f'Changing file permissions of {filepath} failed.')
 
+def get_transfer_backend():
+    """Get the default transfer backend.
+
+    Either ``'azcopy'``, which shells out to the Azure Storage CLI, or ``'http'``,
+    which downloads files with :func:`~subseasonal_data.downloader.http_download`.
+
+    You can change the default :const:`DEFAULT_TRANSFER_BACKEND` by defining
+    :envvar:`$SUBSEASONALDATA_TRANSFER`.
+    """
+    backend = os.environ.get("SUBSEASONALDATA_TRANSFER", DEFAULT_TRANSFER_BACKEND)
+    if backend not in TRANSFER_BACKENDS:
+        raise ValueError(
+            f"The transfer backend '{backend}' does not exist. Valid choices are {TRANSFER_BACKENDS}.")
+    return backend
+
+
+def get_data_source():
+    """Get the source from which data files are synced.
+
+    Unless a source was set with :func:`~subseasonal_data.downloader.set_data_source`,
+    the source is given by :envvar:`$SUBSEASONALDATA_SOURCE`:
+
+        * unset or ``'azure'``: the Azure blob :const:`SUBSEASONAL_DATA_BLOB`
+          (:class:`~subseasonal_data.downloader.AzureBlobSource`)
+        * an ``http://`` or ``https://`` URL: an HTTP mirror
+          (:class:`~subseasonal_data.downloader.HttpMirrorSource`)
+        * any other value, optionally prefixed by ``file://``: a local or NFS
+          mirror directory (:class:`~subseasonal_data.downloader.LocalMirrorSource`)
+    """
+    if _data_source is not None:
+        return _data_source
+    source = os.environ.get("SUBSEASONALDATA_SOURCE", "")
+    if source in ["", "azure"]:
+        return AzureBlobSource()
+    if source.startswith(("http://", "https://")):
+        return HttpMirrorSource(source)
+    if source.startswith("file://"):
+        source = source[len("file://"):]
+    return LocalMirrorSource(expanduser(source))
+
+
+def set_data_source(source):
+    """Set the source from which data files are synced.
+
+    Parameters
+    ----------
+    source: AzureBlobSource, LocalMirrorSource, HttpMirrorSource or None
+        New data source; if None, the source is again given by
+        :envvar:`$SUBSEASONALDATA_SOURCE` (see :func:`~subseasonal_data.downloader.get_data_source`).
+    """
+    global _data_source
+    _data_source = source
+
+
+class AzureBlobSource:
+    """Data source syncing files from the Azure blob :const:`SUBSEASONAL_DATA_BLOB`.
+
+    Files are listed with one blob listing request per data subdirectory and
+    transferred with ``azcopy`` or :func:`~subseasonal_data.downloader.http_download`
+    (see :func:`~subseasonal_data.downloader.get_transfer_backend`).
+    """
+
+    key = None
+
+    def list_files(self, data_subdir):
+        """Return dictionary mapping each file name of data_subdir to a dictionary
+        with keys 'size' (bytes), 'etag' and 'last_modified' (POSIX timestamp).
+        """
+        return _list_remote_files(data_subdir)
+
+    def fetch(self, data_subdir, filename, filepath, verbose=True, backend=None, allow_write=False):
+        """Download or sync file filename of data_subdir to filepath."""
+        # Get data access token
+        token = get_access_token()
+        if (backend or get_transfer_backend()) == "http":
+            url = "/".join([SUBSEASONAL_DATA_BLOB, data_subdir.replace(os.sep, "/"), filename])
+            http_download(f"{url}?{token}", filepath, verbose=verbose)
+            return
+        # Check azcopy is installed
+        get_default_session().check_azcopy_install()
+        if not os.path.exists(filepath):
+            cmd = "copy"
+        else:
+            cmd = "sync"
+        # Run azcopy
+        # Use Popen to access logs in real time
+        azcopy_cmd = f"azcopy {cmd} \"{os.path.join(SUBSEASONAL_DATA_BLOB, data_subdir, filename)}?{token}\" {filepath}"
+        _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=verbose,
+                                      progress_callback=get_default_session().progress_callback,
+                                      label=os.path.join(data_subdir, filename),
+                                      echo=get_default_session().echo_output)
+
+
+class LocalMirrorSource:
+    """Data source syncing files from a local or NFS mirror directory.
+
+    The mirror has the layout of :func:`~subseasonal_data.downloader.get_subseasonal_data_path`,
+    e.g., a data directory filled by :func:`~subseasonal_data.downloader.download`
+    and shared by all nodes of a cluster. Files are hardlinked into the local
+    data directory if both are on the same file system, otherwise cloned on
+    copy-on-write file systems, and otherwise copied, so no file is transferred
+    over the network unless the mirror is remote. Hardlinked files share
+    permissions with the mirror, so files synced with allow_write are never
+    hardlinked.
+
+    Parameters
+    ----------
+    path: string
+        Mirror directory.
+
+    hardlink: bool, optional (default=True)
+        Whether to hardlink files when possible.
+    """
+
+    def __init__(self, path, hardlink=True):
+        self.path = path
+        self.hardlink = hardlink
+        self.key = f"local:{os.path.abspath(path)}"
+
+    def list_files(self, data_subdir):
+        """Return dictionary mapping each file name of data_subdir to a dictionary
+        with keys 'size' (bytes), 'etag' and 'last_modified' (POSIX timestamp).
+        """
+        manifest = {}
+        try:
+            entries = list(os.scandir(os.path.join(self.path, data_subdir)))
+        except FileNotFoundError:
+            return manifest
+        for entry in entries:
+            # Skip manifests and partial files of transfers in progress
+            if not entry.is_file() or entry.name.startswith(MIRROR_MANIFEST_FNAME) \
+                    or entry.name.endswith((".part", ".part.json", ".tmp")):
+                continue
+            stat = entry.stat()
+            manifest[entry.name] = {"size": stat.st_size,
+                                    "etag": f"{stat.st_size:x}-{stat.st_mtime_ns:x}",
+                                    "last_modified": stat.st_mtime}
+        return manifest
+
+    def fetch(self, data_subdir, filename, filepath, verbose=True, backend=None, allow_write=False):
+        """Link, clone or copy file filename of data_subdir to filepath.
+
+        Files are never hardlinked if allow_write is True, since changing the
+        permissions of a hardlink would change those of the mirror's file.
+        """
+        source = os.path.join(self.path, data_subdir, filename)
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.part"
+        method = None
+        if self.hardlink and not allow_write:
+            try:
+                os.link(source, tmp_path)
+                method = "Linked"
+            except OSError:
+                pass
+        if method is None:
+            try:
+                _clone_file(source, tmp_path)
+                shutil.copystat(source, tmp_path)
+                method = "Cloned"
+            except OSError:
+                shutil.copy2(source, tmp_path)
+                method = "Copied"
+        # Replace target file only once complete
+        os.replace(tmp_path, filepath)
+        if verbose:
+            print(f"{method} {source} to {filepath}")
+
+
+class HttpMirrorSource:
+    """Data source syncing files from an HTTP mirror.
+
+    The mirror serves each file at ``{url}/{data_subdir}/{filename}`` and lists
+    the files of each data subdirectory in ``{url}/{data_subdir}/``:const:`MIRROR_MANIFEST_FNAME`,
+    e.g., a mirror directory with manifests written by
+    :func:`~subseasonal_data.downloader.write_mirror_manifest` and served by
+    any static file server. Files are downloaded with
+    :func:`~subseasonal_data.downloader.http_download`.
+
+    Parameters
+    ----------
+    url: string
+        Base URL of the mirror.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.key = f"http:{self.url}"
+
+    def list_files(self, data_subdir):
+        """Return dictionary mapping each file name of data_subdir to a dictionary
+        with keys 'size' (bytes), 'etag' and 'last_modified' (POSIX timestamp).
+        """
+        response = _http_request_with_retries(
+            get_default_session().http, "GET", self._url(data_subdir, MIRROR_MANIFEST_FNAME),
+            HTTP_MAX_RETRIES)
+        return response.json()
+
+    def fetch(self, data_subdir, filename, filepath, verbose=True, backend=None, allow_write=False):
+        """Download file filename of data_subdir to filepath."""
+        http_download(self._url(data_subdir, filename), filepath, verbose=verbose)
+
+    def _url(self, data_subdir, filename):
+        return "/".join([self.url, data_subdir.replace(os.sep, "/"), filename])
+
+
+def write_mirror_manifest(path, data_subdirs=SUBSEASONAL_DATA_SUBDIRS):
+    """Write the file manifests that let a mirror directory be served as an HTTP mirror.
+
+    Writes :const:`MIRROR_MANIFEST_FNAME` to each existing data subdirectory of
+    the mirror (see :class:`~subseasonal_data.downloader.HttpMirrorSource`).
+    Rewrite the manifests whenever files of the mirror change.
+
+    Parameters
+    ----------
+    path: string
+        Mirror directory.
+
+    data_subdirs: list of string, optional (default=SUBSEASONAL_DATA_SUBDIRS)
+        Data subdirectories whose manifests are written.
+
+    Returns
+    -------
+    manifest_files: list of string
+        Paths of the written manifests.
+    """
+    source = LocalMirrorSource(path)
+    manifest_files = []
+    for data_subdir in data_subdirs:
+        if not os.path.isdir(os.path.join(path, data_subdir)):
+            continue
+        manifest_file = os.path.join(path, data_subdir, MIRROR_MANIFEST_FNAME)
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(source.list_files(data_subdir), f)
+        os.replace(tmp_file, manifest_file)
+        manifest_files.append(manifest_file)
+    return manifest_files
+
+
+def _clone_file(source, target):
+    """Clone source to target on a copy-on-write file system, raising OSError if unsupported."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("File cloning is not supported on this platform")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def http_download(url, filepath, session=None, chunk_size=HTTP_CHUNK_SIZE,
+                  max_workers=HTTP_MAX_WORKERS, max_retries=HTTP_MAX_RETRIES, verbose=True):
+    """Download a file over HTTP with parallel byte-range requests.
+
+    The file is downloaded to ``filepath + '.part'`` and renamed to ``filepath``
+    once complete, so ``filepath`` never holds a partial file. Completed byte
+    ranges are recorded in ``filepath + '.part.json'``, so an interrupted
+    download resumes where it stopped as long as the remote file is unchanged.
+    Failed range requests are retried with exponential backoff. If the server
+    does not support range requests, the file is downloaded in one request.
+
+    If ``filepath`` exists with the remote size and is newer than the remote
+    file, nothing is downloaded.
+
+    The ``progress_callback`` of the session is called with a 'progress'
+    event after each byte range, with keys 'percent', 'bytes_transferred',
+    'bytes_total' and 'bytes_per_second', and with a 'summary' event holding
+    the returned statistics at the end.
+
+    Parameters
+    ----------
+    url: string
+        URL of the remote file, including any access token.
+
+    filepath: string
+        Local path of the downloaded file.
+
+    session: DownloaderSession, optional (default=None)
+        Session whose pooled connections are used; if None,
+        :func:`~subseasonal_data.downloader.get_default_session` is used.
+
+    chunk_size: int, (default=HTTP_CHUNK_SIZE)
+        Size of each byte range in bytes.
+
+    max_workers: int, (default=HTTP_MAX_WORKERS)
+        Maximum number of byte ranges downloaded at the same time.
+
+    max_retries: int, (default=HTTP_MAX_RETRIES)
+        Maximum number of retries of each request.
+
+    verbose: bool, (default=True)
+        Whether to print a summary of the transfer.
+
+    Returns
+    -------
+    stats: dict
+        Dictionary with keys 'size' (bytes of the file), 'bytes_transferred',
+        'resumed_bytes', 'seconds' and 'throughput' (bytes per second).
+    """
+    session = session or get_default_session()
+    http, progress_callback = session.http, session.progress_callback
+    tic = time.time()
+    response = _http_request_with_retries(http, "HEAD", url, max_retries)
+    size = int(response.headers.get("Content-Length", -1))
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if os.path.exists(filepath) and size == os.path.getsize(filepath) and last_modified \
+            and os.path.getmtime(filepath) >= parsedate_to_datetime(last_modified).timestamp():
+        # Local file is up to date
+        return {"size": size, "bytes_transferred": 0, "resumed_bytes": 0,
+                "seconds": time.time() - tic, "throughput": 0.0}
+    part_path, state_path = filepath + ".part", filepath + ".part.json"
+    if size < 0 or response.headers.get("Accept-Ranges") != "bytes":
+        # Ranges unsupported: stream the whole file
+        with _http_request_with_retries(http, "GET", url, max_retries, stream=True) as response:
+            with open(part_path, "wb") as f:
+                for block in response.iter_content(1024**2):
+                    f.write(block)
+        resumed_bytes, bytes_transferred = 0, os.path.getsize(part_path)
+    else:
+        # Resume if a partial download of the same remote file exists
+        state = {"size": size, "etag": etag, "chunk_size": chunk_size, "done": []}
+        try:
+            with open(state_path) as f:
+                saved_state = json.load(f)
+            if os.path.exists(part_path) and all(
+                    saved_state[key] == state[key] for key in ["size", "etag", "chunk_size"]):
+                state = saved_state
+        except (OSError, ValueError, KeyError):
+            pass
+        if not state["done"]:
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+        done = set(state["done"])
+        chunks = [ii for ii in range((size + chunk_size - 1) // chunk_size) if ii not in done]
+        resumed_bytes = sum(min(chunk_size, size - ii * chunk_size) for ii in done)
+        state_lock = threading.Lock()
+        progress = {"bytes_transferred": 0}
+        headers = {"If-Match": etag} if etag else {}
+
+        def download_chunk(ii):
+            start, end = ii * chunk_size, min(size, (ii + 1) * chunk_size) - 1
+            range_headers = dict(headers, Range=f"bytes={start}-{end}")
+            for attempt in range(max_retries + 1):
+                try:
+                    with http.get(url, headers=range_headers, stream=True, timeout=60) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise requests.HTTPError(
+                                f"Expected partial content, got status {response.status_code}",
+                                response=response)
+                        with open(part_path, "r+b") as f:
+                            f.seek(start)
+                            written = 0
+                            for block in response.iter_content(1024**2):
+                                f.write(block)
+                                written += len(block)
+                    if written != end - start + 1:
+                        raise requests.ConnectionError(
+                            f"Incomplete byte range {start}-{end} of {url}")
+                    break
+                except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as err:
+                    if attempt == max_retries or not _is_retryable(err):
+                        raise
+                    time.sleep(min(2 ** attempt * 0.1, 10))
+            with state_lock:
+                state["done"].append(ii)
+                tmp_path = f"{state_path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, state_path)
+                progress["bytes_transferred"] += end - start + 1
+                if progress_callback is not None:
+                    bytes_done = resumed_bytes + progress["bytes_transferred"]
+                    progress_callback({
+                        "event": "progress", "label": filepath,
+                        "percent": 100.0 * bytes_done / size,
+                        "files_done": 0, "files_total": 1,
+                        "bytes_transferred": progress["bytes_transferred"], "bytes_total": size,
+                        "bytes_per_second": progress["bytes_transferred"] / max(time.time() - tic, 1e-9)})
+            return end - start + 1
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks) or 1))) as executor:
+            futures = [executor.submit(download_chunk, ii) for ii in chunks]
+        # Let all ranges finish before raising so completed ranges can be resumed
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+        bytes_transferred = sum(future.result() for future in futures)
+    # Replace target file only once the download is complete
+    os.replace(part_path, filepath)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    seconds = time.time() - tic
+    stats = {"size": os.path.getsize(filepath), "bytes_transferred": bytes_transferred,
+             "resumed_bytes": resumed_bytes, "seconds": seconds,
+             "throughput": bytes_transferred / seconds if seconds > 0 else 0.0}
+    if progress_callback is not None:
+        progress_callback(dict(stats, event="summary", label=filepath))
+    if verbose:
+        print(f"Downloaded {stats['size']} bytes to {filepath} in {seconds:.1f}s "
+              f"({stats['throughput'] / 1024**2:.1f} MiB/s)")
+    return stats
+
+
+def _http_request_with_retries(http, method, url, max_retries, **kwargs):
+    """Send an HTTP request, retrying failed requests with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            response = http.request(method, url, timeout=60, **kwargs)
+            response.raise_for_status()
+            return response
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as err:
+            if attempt == max_retries or not _is_retryable(err):
+                raise
+            time.sleep(min(2 ** attempt * 0.1, 10))
+
+
+def _is_retryable(err):
+    """Whether a failed HTTP request may succeed when retried."""
+    response = getattr(err, "response", None)
+    return response is None or response.status_code >= 500 or response.status_code in [408, 429]
+
+
+def prefetch(files, max_workers=DEFAULT_PREFETCH_WORKERS, verbose=False, allow_write=False):
+    """Download or sync many subseasonal data files concurrently.
+
+    Files whose local copy matches the remote manifest
+    (see :func:`~subseasonal_data.downloader.is_local_file_current`) are skipped.
+    Failures do not interrupt the other transfers; they are reported in the returned status.
+
+    Parameters
+    ----------
+    files: list of (string, string) tuples
+        (data_subdir, filename) pairs of target files; duplicates are synced once.
+
+    max_workers: int, (default=DEFAULT_PREFETCH_WORKERS)
+        Maximum number of files transferred at the same time.
+
+    verbose: bool, (default=False)
+        Whether to redirect download progress messages to stdout.
+        Messages of concurrent transfers are interleaved.
+
+    allow_write: bool, (default=False)
+        Whether to give write permissions to all users when syncing files.
+        Recommended if working in shared directories. Users must be allowed
+        to set permissions.
+
+    Returns
+    -------
+    status: dict
+        Dictionary mapping each (data_subdir, filename) pair to a dictionary
+        with keys 'status' ('current', 'synced' or 'failed'), 'error'
+        (exception raised by a failed transfer or None) and 'seconds'.
+    """
+    files = list(dict.fromkeys((data_subdir, filename) for data_subdir, filename in files))
+    if not files:
+        return {}
+
+    def sync_file(data_subdir, filename):
+        tic = time.time()
+        try:
+            if is_local_file_current(data_subdir, filename):
+                status = "current"
+            else:
+                download_file(data_subdir, filename, verbose=verbose, allow_write=allow_write)
+                status = "synced"
+            error = None
+        except Exception as err:
+            status, error = "failed", err
+        return {"status": status, "error": error, "seconds": time.time() - tic}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        futures = [executor.submit(sync_file, *f) for f in files]
+        return {f: future.result() for f, future in zip(files, futures)}
+
+
 def get_access_token():
     """Get token for subseasonal data access.
+
+    The token is cached by the default :class:`~subseasonal_data.downloader.DownloaderSession`
+    until shortly before it expires.
+    """
+    return get_default_session().get_access_token()
+
+
+class DownloaderSession:
+    """Reusable state for downloading subseasonal data.
+
+    A session keeps a pooled :class:`requests.Session` for HTTP requests,
+    caches the data access token until shortly before it expires and checks
+    the ``azcopy`` install only once. The module-level functions use the session
+    returned by :func:`~subseasonal_data.downloader.get_default_session`.
+
+    Parameters
+    ----------
+    token_url: string, (default=SUBSEASONAL_TOKEN_URL)
+        Endpoint returning the data access token.
+
+    token_expiry_margin: float, (default=TOKEN_EXPIRY_MARGIN)
+        Number of seconds before expiry at which the token is renewed.
+
+    pool_maxsize: int, (default=16)
+        Maximum number of pooled HTTP connections per host.
+
+    progress_callback: callable, optional (default=None)
+        Function called with a dictionary describing each transfer progress
+        update (see :func:`~subseasonal_data.downloader.parse_azcopy_output`
+        and :func:`~subseasonal_data.downloader.http_download`). If None,
+        verbose ``azcopy`` transfers print their events with
+        :func:`~subseasonal_data.downloader.print_transfer_event`.
+
+    echo_output: bool, (default=False)
+        Whether to also echo the raw ``azcopy`` output to stdout, for debugging.
+    """
+
+    def __init__(self, token_url=SUBSEASONAL_TOKEN_URL,
+                 token_expiry_margin=TOKEN_EXPIRY_MARGIN, pool_maxsize=16,
+                 progress_callback=None, echo_output=False):
+        self.token_url = token_url
+        self.progress_callback = progress_callback
+        self.echo_output = echo_output
+        self.token_expiry_margin = token_expiry_margin
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self._token = None
+        self._token_expiry = 0
+        self._azcopy_checked = False
+        self._lock = threading.Lock()
+
+    def get_access_token(self):
+        """Get token for subseasonal data access, fetching a new one only if needed."""
+        with self._lock:
+            if self._token is None or time.time() >= self._token_expiry - self.token_expiry_margin:
+                response = self.http.get(self.token_url)
+                response.raise_for_status()
+                content = response.json()
+                self._token = content["token"]
+                self._token_expiry = _parse_token_expiry(content.get("msft:expiry"))
+            return self._token
+
+    def check_azcopy_install(self):
+        """Check ``azcopy`` is installed correctly, running the check only once per session.
+
+        Raises :exc:`~subprocess.CalledProcessError` if ``azcopy`` is not installed correctly.
+        """
+        with self._lock:
+            if not self._azcopy_checked:
+                check_azcopy_install()
+                self._azcopy_checked = True
+
+    def close(self):
+        """Close pooled HTTP connections."""
+        self.http.close()
+
+
+def get_default_session():
+    """Get the :class:`~subseasonal_data.downloader.DownloaderSession` used by the module-level functions."""
+    global _default_session
+    if _default_session is None:
+        _default_session = DownloaderSession()
+    return _default_session
+
+
+def set_default_session(session):
+    """Set the :class:`~subseasonal_data.downloader.DownloaderSession` used by the module-level functions.
+
+    Parameters
+    ----------
+    session: DownloaderSession or None
+        New default session; if None, a new session is created on next use.
     """
-    return requests.get(SUBSEASONAL_TOKEN_URL).json()["token"]
+    global _default_session
+    _default_session = session
+
+
+def _parse_token_expiry(expiry):
+    """Convert token expiry time string to a POSIX timestamp."""
+    try:
+        return datetime.fromisoformat(expiry.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        # Missing or unrecognized expiry
+        return time.time() + DEFAULT_TOKEN_LIFETIME
 
 def get_subseasonal_data_path():
     """Get local path for doanloaded subseasonal data files.
@@ -161,7 +812,7 @@ def get_subseasonal_data_path():
     You can change the default behavior by defining :envvar:`$SUBSEASONALDATA_PATH` as the target I/O folder.
     """
     # Look up data path and convert ~ to home directory
-    data_path = expanduser(os.environ.get("SUBSEASONALDATA_PATH"))
+    data_path = expanduser(os.environ.get("SUBSEASONALDATA_PATH", ""))
     if not data_path:
         # Set default to user's home
         # Get home for local install
@@ -172,7 +823,8 @@ def get_subseasonal_data_path():
 def get_local_file_path(data_subdir, fname, sync=True, allow_write=False):
     """Get the local path of a directory/file combo.
 
-    If ``sync=True``, it will also sync the target file.
+    If ``sync=True``, it will also sync the target file unless the local copy
+    matches the remote manifest (see :func:`~subseasonal_data.downloader.is_local_file_current`).
 
     Parameters
     ----------
@@ -190,14 +842,186 @@ def get_local_file_path(data_subdir, fname, sync=True, allow_write=False):
         Recommended if working in shared directories. Users must be allowed
         to set permissions.
     """
-    if sync:
-        print("Syncing data....Set sync=False to avoid this step.")
-        download_file(data_subdir, fname, verbose=True,
-                      allow_write=allow_write)
+    if sync and not is_local_file_current(data_subdir, fname):
+        with stage("sync", message="Syncing data....Set sync=False to avoid this step.",
+                   file=os.path.join(data_subdir, fname)):
+            download_file(data_subdir, fname, verbose=True,
+                          allow_write=allow_write)
     data_path = get_subseasonal_data_path()
     return os.path.join(data_path, data_subdir, fname)
 
 
+def get_remote_manifest(data_subdir, ttl=MANIFEST_TTL, refresh=False):
+    """Get size, ETag and last-modified time of all remote files in a data subdirectory.
+
+    The manifest is fetched from the data source
+    (see :func:`~subseasonal_data.downloader.get_data_source`), with a single
+    blob listing for Azure storage, and cached both in memory and in the
+    :const:`MANIFEST_DIR` subdirectory of
+    :func:`~subseasonal_data.downloader.get_subseasonal_data_path` for ``ttl`` seconds.
+
+    Parameters
+    ----------
+    data_subdir: {'dataframes', 'combined_dataframes', 'masks', os.path.join('ground_truth', 'sst_1d')}
+        Azure data directory.
+
+    ttl: float, (default=MANIFEST_TTL)
+        Number of seconds for which a fetched manifest is reused.
+
+    refresh: bool, (default=False)
+        Whether to fetch the manifest even if a cached manifest is available.
+
+    Returns
+    -------
+    manifest: dict
+        Dictionary mapping each file name to a dictionary with keys
+        'size' (bytes), 'etag' and 'last_modified' (POSIX timestamp).
+    """
+    source = get_data_source()
+    key = _manifest_key(data_subdir, source)
+    manifest_file = os.path.join(get_subseasonal_data_path(), MANIFEST_DIR, key + ".json")
+    with _manifest_lock:
+        if not refresh:
+            # Look up manifest in memory, then on disk
+            fetched_at, manifest = _manifests.get(key, (None, None))
+            if manifest is None and os.path.exists(manifest_file):
+                try:
+                    with open(manifest_file) as f:
+                        cached = json.load(f)
+                    fetched_at, manifest = cached["fetched_at"], cached["files"]
+                except (OSError, ValueError, KeyError):
+                    manifest = None
+            if manifest is not None and time.time() - fetched_at < ttl:
+                _manifests[key] = (fetched_at, manifest)
+                return manifest
+        fetched_at, manifest = time.time(), source.list_files(data_subdir)
+        _manifests[key] = (fetched_at, manifest)
+        _manifest_failures.pop(key, None)
+        try:
+            os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+            tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump({"fetched_at": fetched_at, "files": manifest}, f)
+            os.replace(tmp_file, manifest_file)
+        except OSError:
+            warnings.warn(f'Saving the remote manifest to {manifest_file} failed.')
+        return manifest
+
+
+def is_local_file_current(data_subdir, fname):
+    """Check whether the local copy of a data file matches the remote manifest.
+
+    A local file is current if it has the remote size and either was synced
+    from the remote version with the current ETag or is newer than the remote
+    file. Returns False if the manifest cannot be fetched; a failed fetch is
+    reported once and not retried for :const:`MANIFEST_FAILURE_TTL` seconds,
+    so offline syncs do not list the remote files once per file.
+
+    Parameters
+    ----------
+    data_subdir: {'dataframes', 'combined_dataframes', 'masks', os.path.join('ground_truth', 'sst_1d')}
+        Azure data directory of target file.
+
+    fname: string
+        Name of target file.
+    """
+    filepath = os.path.join(get_subseasonal_data_path(), data_subdir, fname)
+    if not os.path.exists(filepath):
+        return False
+    key = _manifest_key(data_subdir)
+    with _manifest_lock:
+        failed_at = _manifest_failures.get(key)
+    if failed_at is not None and time.time() - failed_at < MANIFEST_FAILURE_TTL:
+        return False
+    try:
+        remote = get_remote_manifest(data_subdir).get(fname)
+    except Exception as err:
+        with _manifest_lock:
+            _manifest_failures[key] = time.time()
+        warnings.warn(f'Fetching the remote manifest of {data_subdir} failed: {err}')
+        return False
+    if remote is None:
+        return False
+    stat = os.stat(filepath)
+    if stat.st_size != remote["size"]:
+        return False
+    synced = _load_synced_files(data_subdir).get(fname)
+    if synced is not None and synced["mtime"] == stat.st_mtime:
+        # Local file is unchanged since it was synced
+        return synced["etag"] == remote["etag"]
+    return stat.st_mtime >= remote["last_modified"]
+
+
+def _manifest_key(data_subdir, source=None):
+    """Key of the cached manifest of data_subdir listed by source."""
+    key = data_subdir.replace(os.sep, "_")
+    source = source or get_data_source()
+    if source.key is None:
+        return key
+    # Manifests of mirrors are cached separately from those of Azure storage
+    return f"{key}-{hashlib.md5(source.key.encode()).hexdigest()[:8]}"
+
+
+def _list_remote_files(data_subdir):
+    """List remote files of data_subdir with a (paged) blob listing request."""
+    token = get_access_token()
+    prefix = data_subdir.replace(os.sep, "/") + "/"
+    manifest = {}
+    params = {"restype": "container", "comp": "list", "prefix": prefix}
+    while True:
+        response = get_default_session().http.get(
+            f"{SUBSEASONAL_DATA_BLOB}?{token}", params=params)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        for blob in root.iter("Blob"):
+            name = blob.findtext("Name")[len(prefix):]
+            properties = blob.find("Properties")
+            manifest[name] = {
+                "size": int(properties.findtext("Content-Length")),
+                "etag": properties.findtext("Etag"),
+                "last_modified": parsedate_to_datetime(
+                    properties.findtext("Last-Modified")).timestamp()}
+        params["marker"] = root.findtext("NextMarker")
+        if not params["marker"]:
+            return manifest
+
+
+def _synced_files_path(data_subdir):
+    """Path of the record of files synced to data_subdir."""
+    return os.path.join(get_subseasonal_data_path(), MANIFEST_DIR,
+                        data_subdir.replace(os.sep, "_") + "-synced.json")
+
+
+def _load_synced_files(data_subdir):
+    """Load record mapping synced files of data_subdir to their ETag and local mtime."""
+    try:
+        with open(_synced_files_path(data_subdir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_synced_file(data_subdir, fname):
+    """Record ETag of the remote version of a file that has just been synced."""
+    with _manifest_lock:
+        fetched_at, manifest = _manifests.get(_manifest_key(data_subdir), (None, None))
+    if manifest is None or fname not in manifest:
+        return
+    filepath = os.path.join(get_subseasonal_data_path(), data_subdir, fname)
+    try:
+        with _manifest_lock:
+            synced = _load_synced_files(data_subdir)
+            synced[fname] = {"etag": manifest[fname]["etag"],
+                             "mtime": os.stat(filepath).st_mtime}
+            os.makedirs(os.path.dirname(_synced_files_path(data_subdir)), exist_ok=True)
+            tmp_file = f"{_synced_files_path(data_subdir)}.{os.getpid()}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(synced, f)
+            os.replace(tmp_file, _synced_files_path(data_subdir))
+    except OSError:
+        pass
+
+
 def check_azcopy_install():
     """Check ``azcopy`` is installed correctly.
 
@@ -214,31 +1038,170 @@ def check_azcopy_install():
 def list_subdir_files(data_subdir):
     """List files in a data subdirectory in Azure.
 
-    Requires ``azcopy`` to run.
+    Requires ``azcopy`` to run, unless the data source
+    (see :func:`~subseasonal_data.downloader.get_data_source`) is a mirror,
+    in which case the files of the mirror are listed.
 
     Parameters
     ----------
     data_subdir: {'dataframes', 'combined_dataframes', 'masks', os.path.join('ground_truth', 'sst_1d')}
         Azure data directory of target file.
     """
-    check_azcopy_install()
+    if not isinstance(get_data_source(), AzureBlobSource):
+        for filename in sorted(get_remote_manifest(data_subdir, refresh=True)):
+            print(filename)
+        return
+    get_default_session().check_azcopy_install()
     # Get data access token
     token = get_access_token()
     azcopy_cmd = f"azcopy list \"{os.path.join(SUBSEASONAL_DATA_BLOB, data_subdir)}?{token}\""
-    _subprocess_with_realtime_log(cmd=azcopy_cmd)
+    _subprocess_with_realtime_log(cmd=azcopy_cmd, verbose=False, echo=True)
+
+
+def parse_azcopy_output(line):
+    """Parse one line of ``azcopy`` output into a structured event.
+
+    Parameters
+    ----------
+    line: string
+        Line printed by ``azcopy``.
+
+    Returns
+    -------
+    event: dict or None
+        None if the line is neither a progress nor a summary line. Progress
+        lines yield a dictionary with keys 'event' ('progress'), 'percent',
+        'files_done', 'files_failed', 'files_pending', 'files_skipped',
+        'files_total' and 'bytes_per_second' (None if not reported).
+        Summary lines yield a dictionary with key 'event' ('summary') and one
+        of the keys 'files_completed', 'files_failed', 'bytes_transferred',
+        'elapsed_seconds' or 'job_status'.
+    """
+    match = _AZCOPY_PROGRESS_PATTERN.search(line)
+    if match is not None:
+        throughput = match.group("throughput")
+        return {"event": "progress", "percent": float(match.group("percent")),
+                "files_done": int(match.group("done")), "files_failed": int(match.group("failed")),
+                "files_pending": int(match.group("pending")),
+                "files_skipped": int(match.group("skipped")),
+                "files_total": int(match.group("total")),
+                # azcopy reports throughput in megabits per second
+                "bytes_per_second": None if throughput is None else float(throughput) * 1e6 / 8}
+    match = _AZCOPY_SUMMARY_PATTERN.match(line.strip())
+    if match is not None:
+        key, convert = _AZCOPY_SUMMARY_FIELDS[match.group("name")]
+        return {"event": "summary", key: convert(match.group("value"))}
+    return None
+
+
+_AZCOPY_PROGRESS_PATTERN = re.compile(
+    r"(?P<percent>[\d.]+) %, (?P<done>\d+) Done, (?P<failed>\d+) Failed, (?P<pending>\d+) Pending, "
+    r"(?P<skipped>\d+) Skipped, (?P<total>\d+) Total"
+    r"(?:.*?Throughput \(Mb/s\): (?P<throughput>[\d.]+))?")
+_AZCOPY_SUMMARY_FIELDS = {
+    "Number of File Transfers Completed": ("files_completed", int),
+    "Number of File Transfers Failed": ("files_failed", int),
+    "Total Number of Bytes Transferred": ("bytes_transferred", int),
+    "Elapsed Time (Minutes)": ("elapsed_seconds", lambda value: float(value) * 60),
+    "Final Job Status": ("job_status", str),
+}
+_AZCOPY_SUMMARY_PATTERN = re.compile(
+    "^(?P<name>" + "|".join(re.escape(name) for name in _AZCOPY_SUMMARY_FIELDS) + r"): (?P<value>.+)$")
+
+
+def print_transfer_event(event):
+    """Print a transfer event in a human-readable form.
 
+    Progress and summary events are printed to stdout and 'error' events to
+    stderr. This is how verbose ``azcopy`` transfers report progress if the
+    default :class:`~subseasonal_data.downloader.DownloaderSession` has no
+    progress_callback.
 
-def _subprocess_with_realtime_log(cmd, verbose=True):
-    """Run subprocess with realtime log."""
+    Parameters
+    ----------
+    event: dict
+        Event passed to a progress_callback (see
+        :func:`~subseasonal_data.downloader.parse_azcopy_output`).
+    """
+    label = event.get("label")
+    prefix = "" if label is None else f"{label}: "
+    if event["event"] == "error":
+        print(f"{prefix}{event['message']}", file=sys.stderr, flush=True)
+        return
+    if event["event"] == "progress":
+        message = f"{event['percent']:.1f} %, {event['files_done']} of {event['files_total']} files done"
+        if event.get("bytes_per_second") is not None:
+            message += f", {event['bytes_per_second'] / 1024**2:.1f} MiB/s"
+    else:
+        message = ", ".join(f"{key.replace('_', ' ')}: {value}" for key, value in event.items()
+                            if key not in ("event", "label"))
+    print(f"{prefix}{message}", flush=True)
+
+
+def _subprocess_with_realtime_log(cmd, verbose=True, progress_callback=None, label=None, echo=False):
+    """Run subprocess with realtime log.
+
+    stdout is read in chunks and stderr line by line by a separate thread, so
+    neither pipe can fill up and block the subprocess. Every ``azcopy``
+    progress line is passed to progress_callback as a dictionary parsed by
+    :func:`~subseasonal_data.downloader.parse_azcopy_output` with an added
+    'label' key, followed by one 'summary' event combining all summary lines.
+    Every stderr line is passed as it arrives as an 'error' event with keys
+    'message' and 'label'. If progress_callback is None and verbose, events
+    are printed with :func:`~subseasonal_data.downloader.print_transfer_event`.
+    The raw stdout is only echoed if echo.
+    """
+    if progress_callback is None and verbose:
+        progress_callback = print_transfer_event
     p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
                          stderr=subprocess.PIPE, shell=True)
-    # Reroute log
-    if verbose:
-        for c in iter(lambda: p.stdout.read(1), b''):
+    stderr_lines = []
+
+    def forward_stderr():
+        for line in iter(p.stderr.readline, b''):
+            stderr_lines.append(line)
+            if progress_callback is not None:
+                progress_callback({"event": "error", "label": label,
+                                   "message": line.decode(errors="replace").rstrip()})
+
+    stderr_thread = threading.Thread(target=forward_stderr, daemon=True)
+    stderr_thread.start()
+    # Reroute log and parse progress
+    pending = b""
+    summary = {}
+
+    def handle_line(line):
+        event = parse_azcopy_output(line.decode(errors="replace"))
+        if event is None:
+            return
+        if event["event"] == "summary":
+            summary.update(event)
+        else:
+            event["label"] = label
+            progress_callback(event)
+
+    for chunk in iter(lambda: p.stdout.read1(65536), b''):
+        if echo:
             if hasattr(sys.stdout, 'buffer'):
-                sys.stdout.buffer.write(c)
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+            else:
+                sys.stdout.write(chunk.decode(errors="replace"))
+        if progress_callback is not None:
+            # azcopy terminates progress lines with carriage returns on terminals
+            lines = re.split(rb"[\r\n]", pending + chunk)
+            pending = lines.pop()
+            for line in lines:
+                handle_line(line)
+    p.wait()
+    stderr_thread.join()
+    if progress_callback is not None:
+        handle_line(pending)
+        if summary:
+            summary["label"] = label
+            progress_callback(summary)
     # Parse errors
-    _, stderr = p.communicate()
+    stderr = b"".join(stderr_lines)
     if p.returncode != 0 or stderr:
         raise CalledProcessError(
             returncode=p.returncode, cmd=cmd, output=stderr)
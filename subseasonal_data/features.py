@@ -0,0 +1,245 @@
+import itertools
+import functools
+from collections import OrderedDict
+from .utils import (load_measurement, load_forecast_from_file, shift_df, year_slice,
+                    date_slice, align_frames, _first_date, _lookback_date, _to_timestamp)
+from .cache import mask_fingerprint, _cow_copy
+from .instrumentation import stage, log_message
+from .downloader import get_local_file_path
+from .data_loaders import (_ground_truth_fname, _forecast_fname, _climatology_fname,
+                           _prefetch_sources, _add_anomalies, _load_sources, _local_size)
+
+# Globals
+# Feature kinds in the order in which get_lat_lon_date_features adds them
+FEATURE_KINDS = ["ground_truth", "forecast", "anomalies"]
+
+
+class FeatureSet:
+    """Declarative set of (lat, lon, start_date) features compiled into a load plan.
+
+    Features are recorded with :meth:`add_ground_truth`, :meth:`add_forecast`
+    and :meth:`add_anomalies` and only loaded by :meth:`load`, which returns
+    the same dataframe as :func:`~subseasonal_data.data_loaders.get_lat_lon_date_features`
+    with the same features. Unlike the feature builder, the plan reads each
+    (source file, mask) pair once, over the date range needed by all of its
+    features and shifts, and derives every feature from that shared frame:
+    a lag sweep or a ground truth id requested both as a feature and as an
+    anomaly reads its file once, and climatology is read once per anomaly
+    id and mask. Use :meth:`explain` to inspect the plan before loading.
+
+    Parameters
+    ----------
+    first_year: int, optional (default=None)
+        Only include rows with year >= first_year; if None, do
+        not prune rows by year.
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only include rows with start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes of the features
+        (see :func:`~subseasonal_data.utils.apply_dtype_policy`).
+    """
+
+    def __init__(self, first_year=None, start_date=None, end_date=None, dtype_policy=None):
+        self.first_year = first_year
+        self.start_date = _to_timestamp(start_date)
+        self.end_date = _to_timestamp(end_date)
+        self.dtype_policy = dtype_policy
+        self.features = []
+
+    @classmethod
+    def from_arguments(cls, gt_ids=[], gt_masks=None, gt_shifts=None,
+                       forecast_ids=[], forecast_masks=None, forecast_shifts=None,
+                       anom_ids=[], anom_masks=None, anom_shifts=None,
+                       first_year=None, start_date=None, end_date=None, dtype_policy=None):
+        """Return feature set with the features requested by the arguments of
+        :func:`~subseasonal_data.data_loaders.get_lat_lon_date_features`.
+        """
+        feature_set = cls(first_year=first_year, start_date=start_date, end_date=end_date,
+                          dtype_policy=dtype_policy)
+        for ids, masks, shifts, add in [
+                (gt_ids, gt_masks, gt_shifts, feature_set.add_ground_truth),
+                (forecast_ids, forecast_masks, forecast_shifts, feature_set.add_forecast),
+                (anom_ids, anom_masks, anom_shifts, feature_set.add_anomalies)]:
+            # If particular arguments aren't lists, replace with repeating iterators
+            masks = masks if isinstance(masks, list) else itertools.repeat(masks)
+            shifts = shifts if isinstance(shifts, list) else itertools.repeat(shifts)
+            for source_id, mask_df, shift in zip(ids, masks, shifts):
+                add(source_id, mask_df=mask_df, shift=shift)
+        return feature_set
+
+    def add_ground_truth(self, gt_id, mask_df=None, shift=None):
+        """Add ground truth feature (see :func:`~subseasonal_data.data_loaders.get_ground_truth`)."""
+        return self._add("ground_truth", gt_id, mask_df, shift)
+
+    def add_forecast(self, forecast_id, mask_df=None, shift=None):
+        """Add forecast feature (see :func:`~subseasonal_data.data_loaders.get_forecast`)."""
+        return self._add("forecast", forecast_id, mask_df, shift)
+
+    def add_anomalies(self, gt_id, mask_df=None, shift=None):
+        """Add ground truth, climatology and anomaly features
+        (see :func:`~subseasonal_data.data_loaders.get_ground_truth_anomalies`).
+        """
+        return self._add("anomalies", gt_id, mask_df, shift)
+
+    def _add(self, kind, source_id, mask_df, shift):
+        self.features.append({"kind": kind, "id": source_id, "mask_df": mask_df,
+                              "shift": None if shift == 0 else shift})
+        return self
+
+    def plan(self):
+        """Compile the features into a load plan.
+
+        Returns
+        -------
+        plan: dict
+            Dictionary with keys "reads", the list of source reads, each a dict
+            with keys "fname", "reader", "mask", "start_date", "end_date" and
+            "features"; "climatologies", the list of climatology reads, each a
+            dict with keys "fname", "mask" and "features"; and "features", the
+            list of features, each a dict with keys "name", "kind", "read"
+            (index into "reads") and "shift", in output order.
+        """
+        lower = _first_date(self.first_year, self.start_date)
+        reads = OrderedDict()
+        climatologies = OrderedDict()
+        features = []
+        ordered = sorted(self.features, key=lambda feature: FEATURE_KINDS.index(feature["kind"]))
+        for feature in ordered:
+            kind, source_id, mask_df, shift = (feature["kind"], feature["id"],
+                                               feature["mask_df"], feature["shift"])
+            fname = _forecast_fname(source_id) if kind == "forecast" else _ground_truth_fname(source_id)
+            reader = "forecast" if kind == "forecast" else "measurement"
+            mask_key = mask_fingerprint(mask_df)
+            name = f"{source_id}_shift{shift}" if kind != "anomalies" else f"{source_id}_shift{shift}_anom"
+            read = reads.setdefault((fname, reader, mask_key), {
+                "fname": fname, "reader": reader, "mask": mask_key, "mask_df": mask_df,
+                "shifts": [], "features": []})
+            read["shifts"].append(shift or 0)
+            read["features"].append(name)
+            if kind == "anomalies":
+                climatology = climatologies.setdefault((_climatology_fname(source_id), mask_key), {
+                    "fname": _climatology_fname(source_id), "mask": mask_key, "features": []})
+                climatology["features"].append(name)
+            features.append({"name": name, "kind": kind, "id": source_id,
+                             "read": list(reads).index((fname, reader, mask_key)),
+                             "shift": shift, "mask_df": mask_df})
+        for read in reads.values():
+            # Read back far enough for the largest shift and up to the smallest shift
+            read["start_date"] = _lookback_date(lower, max(read["shifts"]))
+            read["end_date"] = _lookback_date(self.end_date, min(read["shifts"]))
+        return {"reads": list(reads.values()), "climatologies": list(climatologies.values()),
+                "features": features}
+
+    def explain(self):
+        """Return description of the load plan and its estimated cost.
+
+        The cost is the number of file reads and, for files already present
+        locally, their size, compared with loading the same features
+        with :func:`~subseasonal_data.data_loaders.get_lat_lon_date_features`.
+
+        Returns
+        -------
+        explanation: string
+            Human-readable plan.
+        """
+        plan = self.plan()
+        lines = [f"FeatureSet with {len(plan['features'])} features"]
+        planned_bytes = 0
+        builder_bytes = 0
+        for ii, read in enumerate(plan["reads"]):
+            size = _local_size(read["fname"])
+            planned_bytes += size or 0
+            builder_bytes += (size or 0) * len(read["features"])
+            lines.append(
+                f"  read[{ii}] {read['fname']} ({_format_size(size)}, mask={read['mask'] or 'none'}, "
+                f"dates={read['start_date'] or '-inf'}..{read['end_date'] or 'inf'}) "
+                f"-> {', '.join(read['features'])}")
+        for climatology in plan["climatologies"]:
+            size = _local_size(climatology["fname"])
+            planned_bytes += size or 0
+            builder_bytes += (size or 0) * len(climatology["features"])
+            lines.append(
+                f"  climatology {climatology['fname']} ({_format_size(size)}, "
+                f"mask={climatology['mask'] or 'none'}) -> {', '.join(climatology['features'])}")
+        for feature in plan["features"]:
+            lines.append(f"  derive {feature['name']} from read[{feature['read']}]"
+                         f" (shift={feature['shift']})")
+        planned_reads = len(plan["reads"]) + len(plan["climatologies"])
+        builder_reads = len(plan["features"]) + sum(
+            feature["kind"] == "anomalies" for feature in plan["features"])
+        lines.append(f"Estimated cost: {planned_reads} file reads ({_format_size(planned_bytes)}) "
+                     f"vs {builder_reads} file reads ({_format_size(builder_bytes)}) "
+                     f"for get_lat_lon_date_features")
+        return "\n".join(lines)
+
+    def load(self, sync=True, allow_write=False, n_jobs=1, executor=None):
+        """Execute the load plan and return the features.
+
+        Parameters
+        ----------
+        sync: bool, optional (default=True)
+            Whether to download/sync the source files.
+
+        allow_write: bool, optional (default=False)
+            Whether to give write permissions to all users when syncing files.
+            Recommended if working in shared directories. Users must be allowed
+            to set permissions.
+
+        n_jobs, executor:
+            Number of source files read at the same time and pool reading them
+            (see :func:`~subseasonal_data.data_loaders.get_lat_lon_date_features`).
+
+        Returns
+        -------
+        lat_lon_date_features_df: pd.DataFrame or None
+            Data dataframe containing (lat, lon, start_date) features or None
+            if the feature set is empty.
+        """
+        plan = self.plan()
+        if sync:
+            _prefetch_sources(
+                [read["fname"] for read in plan["reads"]] +
+                [climatology["fname"] for climatology in plan["climatologies"]],
+                allow_write=allow_write)
+        tasks = []
+        for read in plan["reads"]:
+            file_name = get_local_file_path(data_subdir="dataframes", fname=read["fname"], sync=False)
+            log_message(f"Loading {file_name}")
+            load = load_measurement if read["reader"] == "measurement" else load_forecast_from_file
+            tasks.append(([read["fname"]], functools.partial(
+                load, file_name, read["mask_df"], start_date=read["start_date"],
+                end_date=read["end_date"], dtype_policy=self.dtype_policy)))
+        frames = _load_sources(tasks, n_jobs=n_jobs, executor=executor)
+        features = []
+        for feature in plan["features"]:
+            with stage("derive", message=f"\nDeriving {feature['name']}") as info:
+                df = frames[feature["read"]]
+                info["rows_in"] = len(df)
+                if feature["kind"] == "anomalies":
+                    clim_file = get_local_file_path(
+                        data_subdir="dataframes", fname=_climatology_fname(feature["id"]), sync=False)
+                    df = _add_anomalies(_cow_copy(df), feature["id"], clim_file, feature["mask_df"],
+                                        feature["shift"], self.dtype_policy)
+                    df = shift_df(df, shift=feature["shift"], rename_cols=False)
+                else:
+                    df = shift_df(df, shift=feature["shift"], groupby_cols=['lat', 'lon'])
+                df = year_slice(df, first_year=self.first_year)
+                features.append(date_slice(df, self.start_date, self.end_date).reset_index(drop=True))
+                info["rows_out"] = len(features[-1])
+        with stage("merge", message="Merging in features") as info:
+            df = align_frames(
+                features, duplicate_warning="Warning: dataframe contains duplicated lat-lon-date combinations")
+            info["rows_out"] = None if df is None else len(df)
+        return df
+
+
+def _format_size(nbytes):
+    """Return human-readable size of nbytes bytes."""
+    if nbytes is None:
+        return "size unknown"
+    return f"{nbytes / 1024**2:.1f} MB"
@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+
+# Globals
+# Resolution in degrees of the integer cell ids returned by cell_ids
+CELL_ID_RESOLUTION = 0.01
+# Number of distinct longitude codes, i.e., (720 / CELL_ID_RESOLUTION) + 1
+CELL_ID_LON_CODES = 72001
+# Number of (month, day) keys of DayOfYearLookup, i.e., 13 * 32
+DAY_KEYS = 416
+# Long-format column of the ensemble member axis of a GridCube
+MEMBER_COL = 'member'
+
+
+class GridCube:
+    """Dense (date, lat, lon) arrays of gridded variables with coordinate labels.
+
+    Each variable is stored once as an array of shape (n_dates, n_lats, n_lons)
+    instead of as a long-format column alongside repeated lat, lon and date
+    columns. Cells without a row in the long format are marked absent in
+    :attr:`present` and hold NaN (or NaT, or None) in float (datetime, or
+    object) variables; integer and boolean variables keep their dtype and
+    hold 0 (False) in absent cells, so use :attr:`present` to tell them apart.
+
+    Use :meth:`from_frame` and :meth:`to_frame` to convert from and to the long
+    format; the round trip preserves all rows, values, dtypes and column order
+    but not the row order: rows are returned ordered by lat, lon and date.
+
+    Ensemble cubes have a leading member axis: each variable, and
+    :attr:`present`, has shape (n_members, n_dates, n_lats, n_lons), and
+    :meth:`to_frame` adds a MEMBER_COL column.
+
+    Parameters
+    ----------
+    data: dict of np.ndarray
+        Mapping from variable name to array of shape (n_dates, n_lats, n_lons).
+
+    dates: np.ndarray
+        Sorted datetime64 date labels of the first axis.
+
+    lats: np.ndarray
+        Sorted latitude labels of the second axis.
+
+    lons: np.ndarray
+        Sorted longitude labels of the third axis.
+
+    present: np.ndarray, optional (default=None)
+        Boolean array of shape (n_dates, n_lats, n_lons) indicating which cells
+        have data; if None, all cells have data.
+
+    date_col: string, optional (default='start_date')
+        Name of the date column in the long format.
+
+    columns: list of string, optional (default=None)
+        Column order of the long format; if None, lat, lon, date_col followed
+        by the variables.
+
+    dtypes: dict, optional (default=None)
+        Mapping from variable name to its dtype in the long format; if None,
+        the dtype of its array.
+
+    members: np.ndarray, optional (default=None)
+        Member labels of the leading axis of an ensemble cube; if None,
+        arrays have no member axis.
+    """
+
+    def __init__(self, data, dates, lats, lons, present=None, date_col='start_date',
+                 columns=None, dtypes=None, members=None):
+        self.data = dict(data)
+        self.dates = np.asarray(dates)
+        self.lats = np.asarray(lats)
+        self.lons = np.asarray(lons)
+        self.members = None if members is None else np.asarray(members)
+        self.shape = (len(self.dates), len(self.lats), len(self.lons))
+        if self.members is not None:
+            self.shape = (len(self.members),) + self.shape
+        for variable, values in self.data.items():
+            if values.shape != self.shape:
+                raise ValueError(
+                    f"Variable {variable} has shape {values.shape}; expected {self.shape}")
+        self.present = np.ones(self.shape, dtype=bool) if present is None else present
+        self.date_col = date_col
+        keys = ['lat', 'lon', date_col] if self.members is None else [MEMBER_COL, 'lat', 'lon', date_col]
+        self.columns = keys + list(self.data) if columns is None else list(columns)
+        self.dtypes = {variable: values.dtype for variable, values in self.data.items()}
+        if dtypes is not None:
+            self.dtypes.update(dtypes)
+
+    @property
+    def variables(self):
+        """List of variable names."""
+        return list(self.data)
+
+    @property
+    def nbytes(self):
+        """Number of bytes used by the variable arrays, labels and presence mask."""
+        return (sum(values.nbytes for values in self.data.values()) + self.present.nbytes
+                + self.dates.nbytes + self.lats.nbytes + self.lons.nbytes
+                + (0 if self.members is None else self.members.nbytes))
+
+    def __getitem__(self, variable):
+        return self.data[variable]
+
+    def __repr__(self):
+        members = "" if self.members is None else f"members={len(self.members)}, "
+        return (f"GridCube(variables={self.variables}, {members}dates={len(self.dates)}, "
+                f"lats={len(self.lats)}, lons={len(self.lons)})")
+
+    @classmethod
+    def from_frame(cls, df, date_col='start_date'):
+        """Convert long-format dataframe with lat, lon and date_col columns into a cube.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            Dataframe with columns lat, lon, date_col and one column per variable.
+
+        date_col: string, optional (default='start_date')
+            Name of date column.
+
+        Returns
+        -------
+        cube: GridCube
+            Cube holding the values of all other columns of df; the row order
+            of df is not recorded.
+        """
+        keys = ['lat', 'lon', date_col]
+        missing = [col for col in keys if col not in df.columns]
+        if missing:
+            raise ValueError(f"Dataframe lacks columns {missing} required to form a cube")
+        if df[keys].isna().any().any():
+            raise ValueError("Dataframe has missing lat, lon or date values")
+        dates, date_idx = np.unique(df[date_col].values, return_inverse=True)
+        lats, lat_idx = np.unique(df['lat'].to_numpy(), return_inverse=True)
+        lons, lon_idx = np.unique(df['lon'].to_numpy(), return_inverse=True)
+        shape = (len(dates), len(lats), len(lons))
+        flat_idx = np.ravel_multi_index((date_idx.ravel(), lat_idx.ravel(), lon_idx.ravel()), shape)
+        present = np.zeros(np.prod(shape), dtype=bool)
+        present[flat_idx] = True
+        if present.sum() != len(df):
+            raise ValueError(f"Dataframe has duplicate (lat, lon, {date_col}) rows")
+        data = {}
+        dtypes = {}
+        for col in df.columns:
+            if col in keys:
+                continue
+            values = df[col].values
+            dtypes[col] = df[col].dtype
+            if isinstance(values, np.ndarray) and values.dtype.kind in 'fmM':
+                # Floats and datetimes have NaN or NaT fill values
+                dense = np.full(np.prod(shape), np.nan if values.dtype.kind == 'f' else 'NaT',
+                                dtype=values.dtype)
+            elif isinstance(values, np.ndarray) and values.dtype.kind in 'biu':
+                # Integers and booleans keep their dtype; absent cells are marked in present
+                dense = np.zeros(np.prod(shape), dtype=values.dtype)
+            else:
+                dense = np.full(np.prod(shape), None, dtype=object)
+                values = np.asarray(values, dtype=object)
+            dense[flat_idx] = values
+            data[col] = dense.reshape(shape)
+        return cls(data, dates, lats, lons, present=present.reshape(shape),
+                   date_col=date_col, columns=list(df.columns), dtypes=dtypes)
+
+    def to_frame(self):
+        """Convert cube into a long-format dataframe with one row per present cell.
+
+        Returns
+        -------
+        df: pd.DataFrame
+            Dataframe with columns lat, lon, date_col and one column per variable,
+            ordered by lat, lon and date_col, preceded by member for ensemble cubes.
+        """
+        columns = {}
+        if self.members is None:
+            # Order cells by lat, lon and date
+            lat_idx, lon_idx, date_idx = np.nonzero(self.present.transpose(1, 2, 0))
+            idx = (date_idx, lat_idx, lon_idx)
+        else:
+            member_idx, lat_idx, lon_idx, date_idx = np.nonzero(self.present.transpose(0, 2, 3, 1))
+            idx = (member_idx, date_idx, lat_idx, lon_idx)
+            columns[MEMBER_COL] = self.members[member_idx]
+        columns.update({'lat': self.lats[lat_idx], 'lon': self.lons[lon_idx],
+                        self.date_col: self.dates[date_idx]})
+        for variable, values in self.data.items():
+            columns[variable] = pd.Series(values[idx]).astype(self.dtypes[variable])
+        return pd.DataFrame({col: columns[col] for col in self.columns})
+
+
+def cell_ids(lat, lon):
+    """Return integer ids of the grid cells containing (lat, lon) coordinates.
+
+    Coordinates are rounded to CELL_ID_RESOLUTION degrees, so ids are exact for
+    the 1x1 and 1.5x1.5 grids and any other grid aligned to that resolution.
+    Cells with missing coordinates get id -1.
+
+    Parameters
+    ----------
+    lat: np.ndarray
+        Latitudes in [-90, 90].
+
+    lon: np.ndarray
+        Longitudes in [-360, 360].
+
+    Returns
+    -------
+    ids: np.ndarray
+        Array of int64 cell ids.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat_code = np.rint((lat + 90) / CELL_ID_RESOLUTION)
+    lon_code = np.rint((lon + 360) / CELL_ID_RESOLUTION)
+    ids = lat_code * CELL_ID_LON_CODES + lon_code
+    ids[~np.isfinite(ids)] = -1
+    return ids.astype(np.int64)
+
+
+def mask_cell_ids(mask_df):
+    """Return sorted integer cell ids of the (lat, lon) pairs in mask_df and their row positions.
+
+    Parameters
+    ----------
+    mask_df: pd.DataFrame
+        Mask with columns lat and lon.
+
+    Returns
+    -------
+    ids: np.ndarray
+        Sorted array of int64 cell ids.
+
+    positions: np.ndarray
+        Row position in mask_df of each id.
+    """
+    ids = cell_ids(mask_df['lat'].values, mask_df['lon'].values)
+    positions = np.argsort(ids, kind='stable')
+    return ids[positions], positions
+
+
+class DayOfYearLookup:
+    """Table of a climatology variable indexed by grid cell and (month, day).
+
+    The table has one row per (lat, lon) cell of the climatology and one column
+    per (month, day) pair, so climatology values for any dates can be gathered
+    by direct indexing instead of merging on lat, lon, month and day. Dates
+    and cells absent from the climatology, including leap days, get NaN.
+
+    Parameters
+    ----------
+    climatology: pd.DataFrame
+        Dataframe with columns lat, lon, date_col and col and at most one row
+        per (lat, lon, month, day).
+
+    col: string
+        Climatology variable.
+
+    date_col: string, optional (default='start_date')
+        Name of date column.
+    """
+
+    def __init__(self, climatology, col, date_col='start_date'):
+        values = climatology[col].values
+        if not (isinstance(values, np.ndarray) and values.dtype.kind == 'f'):
+            raise ValueError(f"Climatology column {col} is not a float column")
+        keys = climatology[['lat', 'lon', date_col]]
+        if keys.isna().any().any():
+            raise ValueError("Climatology has missing lat, lon or date values")
+        lat, lon = keys['lat'].values, keys['lon'].values
+        self.cell_ids, first, cell_idx = np.unique(
+            cell_ids(lat, lon), return_index=True, return_inverse=True)
+        cell_idx = cell_idx.ravel()
+        self.cell_lats, self.cell_lons = lat[first], lon[first]
+        if not ((lat == self.cell_lats[cell_idx]).all() and (lon == self.cell_lons[cell_idx]).all()):
+            raise ValueError("Climatology has distinct coordinates within one grid cell")
+        flat_idx = cell_idx * DAY_KEYS + _day_keys(keys[date_col])
+        if len(np.unique(flat_idx)) != len(flat_idx):
+            raise ValueError("Climatology has duplicate (lat, lon, month, day) rows")
+        self.table = np.full((len(self.cell_ids), DAY_KEYS), np.nan, dtype=values.dtype)
+        self.table.ravel()[flat_idx] = values
+
+    def lookup(self, lat, lon, dates):
+        """Return climatology values for the given coordinates and dates.
+
+        Parameters
+        ----------
+        lat: np.ndarray
+            Latitudes.
+
+        lon: np.ndarray
+            Longitudes.
+
+        dates: pd.Series
+            Datetime series.
+
+        Returns
+        -------
+        values: np.ndarray
+            Climatology value of each (lat, lon, date) or NaN if absent.
+        """
+        lat, lon = np.asarray(lat), np.asarray(lon)
+        if len(self.cell_ids) == 0:
+            return np.full(len(lat), np.nan, dtype=self.table.dtype)
+        ids = cell_ids(lat, lon)
+        pos = np.minimum(np.searchsorted(self.cell_ids, ids), len(self.cell_ids)-1)
+        found = (self.cell_ids[pos] == ids) & (self.cell_lats[pos] == lat) \
+            & (self.cell_lons[pos] == lon) & dates.notna().values
+        values = np.full(len(lat), np.nan, dtype=self.table.dtype)
+        values[found] = self.table[pos[found], _day_keys(dates[found])]
+        return values
+
+
+def _day_keys(dates):
+    """Return month * 32 + day of each date in datetime series dates."""
+    return (dates.dt.month.values.astype(np.int64) * 32 + dates.dt.day.values.astype(np.int64))
@@ -0,0 +1,218 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+# Globals
+# Fields of the end event of a stage that callers may set
+STAGE_FIELDS = ["rows_in", "rows_out", "bytes_read"]
+# Stages running in each thread
+_local = threading.local()
+_subscribers_lock = threading.Lock()
+
+
+def print_subscriber(event):
+    """Print the message of each started stage and logged message in real time.
+
+    This is the default subscriber, which reproduces the progress messages
+    of the data loaders; unsubscribe it to silence them.
+    """
+    if event["event"] in ["start", "message"] and event.get("message") is not None:
+        print(event["message"], flush=True)
+
+
+# Callables receiving each stage event
+_subscribers = [print_subscriber]
+
+
+def subscribe(subscriber):
+    """Register subscriber to be called with every stage event.
+
+    Events are dictionaries with keys 'event' ('start', 'end' or 'message'),
+    'stage' (stage name, or name of the enclosing stage or None for messages
+    of :func:`log_message`), 'message' (progress message or None), 'depth'
+    (number of enclosing stages in the same thread), 'thread' and 'time'
+    (POSIX timestamp) plus any fields passed to :func:`stage`. End events also have
+    keys 'seconds', 'rows_in', 'rows_out', 'bytes_read' (bytes read by the
+    process during the stage, including concurrent threads), 'peak_rss_delta'
+    (bytes by which the stage raised the peak resident set size of the
+    process) and 'error' (repr of the exception raised by the stage or None);
+    unknown values are None. Subscribers are called in the thread running
+    the stage, so they must be thread-safe; stages run in worker processes
+    notify the subscribers of those processes.
+
+    Parameters
+    ----------
+    subscriber: callable
+        Function called with each event.
+
+    Returns
+    -------
+    subscriber: callable
+        The registered subscriber.
+    """
+    with _subscribers_lock:
+        if subscriber not in _subscribers:
+            _subscribers.append(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber):
+    """Stop calling subscriber with stage events; does nothing if it is not registered."""
+    with _subscribers_lock:
+        if subscriber in _subscribers:
+            _subscribers.remove(subscriber)
+
+
+@contextmanager
+def stage(name, message=None, **fields):
+    """Instrument the stage of a pipeline run inside the context.
+
+    Notifies the subscribers (see :func:`subscribe`) with a start event on
+    entry and an end event with the duration and resource usage of the stage
+    on exit. The context yields a dictionary in which the stage sets
+    the fields STAGE_FIELDS of its end event, e.g., ``info['rows_out'] = len(df)``.
+
+    Parameters
+    ----------
+    name: string
+        Stage name, e.g., 'read', 'mask' or 'shift'.
+
+    message: string, optional (default=None)
+        Progress message printed by :func:`print_subscriber`.
+
+    **fields:
+        Additional fields of both events, e.g., file=file_name.
+    """
+    stages = _stages()
+    event = dict(fields, event="start", stage=name, message=message, depth=len(stages),
+                 thread=threading.get_ident(), time=time.time())
+    _notify(event)
+    info = dict.fromkeys(STAGE_FIELDS)
+    bytes_before, peak_before = _bytes_read(), _peak_rss()
+    tic = time.perf_counter()
+    error = None
+    stages.append(name)
+    try:
+        yield info
+    except BaseException as err:
+        error = repr(err)
+        raise
+    finally:
+        stages.pop()
+        seconds = time.perf_counter() - tic
+        bytes_after, peak_after = _bytes_read(), _peak_rss()
+        if info["bytes_read"] is None and bytes_after is not None:
+            info["bytes_read"] = bytes_after - bytes_before
+        _notify(dict(event, **info, event="end", time=time.time(), seconds=seconds, error=error,
+                     peak_rss_delta=None if peak_after is None else peak_after - peak_before))
+
+
+def log_message(message):
+    """Notify the subscribers of a progress message within the current stage."""
+    stages = _stages()
+    _notify({"event": "message", "stage": stages[-1] if stages else None, "message": message,
+             "depth": len(stages), "thread": threading.get_ident(), "time": time.time()})
+
+
+class StageRecorder:
+    """Subscriber recording the end events of stages.
+
+    Use :func:`record_stages` to record the stages run inside a context.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event["event"] == "end":
+            with self._lock:
+                self.events.append(event)
+
+    def to_records(self):
+        """Return list of recorded end events, e.g., to send to a metrics system."""
+        with self._lock:
+            return list(self.events)
+
+    def export(self, file_name):
+        """Write the recorded end events to file_name as JSON lines."""
+        with open(file_name, "w") as f:
+            for event in self.to_records():
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def summary(self):
+        """Return dataframe summarizing the recorded stages.
+
+        Has one row per stage name with the number of calls, total seconds,
+        rows in and out and bytes read and the largest peak RSS delta, sorted
+        by decreasing total seconds. Totals of values that no call measured
+        are NaN. Time of nested stages is also counted in their enclosing stages.
+        """
+        columns = ["stage", "seconds"] + STAGE_FIELDS + ["peak_rss_delta"]
+        events = pd.DataFrame(self.to_records(), columns=columns)
+        # Unmeasured values are None; keep them NaN rather than summing them as 0
+        for col in columns[1:]:
+            events[col] = pd.to_numeric(events[col])
+        grouped = events.groupby("stage")
+        summary = pd.DataFrame({"calls": grouped.size(), "seconds": grouped["seconds"].sum()})
+        for col in STAGE_FIELDS:
+            summary[col] = grouped[col].sum(min_count=1)
+        summary["peak_rss_delta"] = grouped["peak_rss_delta"].max()
+        return summary.sort_values("seconds", ascending=False)
+
+
+@contextmanager
+def record_stages():
+    """Record the stages run inside the context with a :class:`StageRecorder`.
+
+    Example
+    -------
+    >>> with record_stages() as recorder:
+    ...     data_loaders.get_ground_truth_anomalies("us_tmp2m", shift=15)
+    >>> print(recorder.summary())
+    """
+    recorder = subscribe(StageRecorder())
+    try:
+        yield recorder
+    finally:
+        unsubscribe(recorder)
+
+
+def _stages():
+    """Return stack of the names of the stages running in this thread."""
+    if not hasattr(_local, "stages"):
+        _local.stages = []
+    return _local.stages
+
+
+def _notify(event):
+    """Call each subscriber with event."""
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        subscriber(event)
+
+
+def _bytes_read():
+    """Return bytes read by this process so far or None if unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _peak_rss():
+    """Return peak resident set size of this process in bytes or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
@@ -0,0 +1,295 @@
+import os
+import json
+import glob
+import shutil
+import pandas as pd
+from .downloader import get_subseasonal_data_path
+
+# Globals
+PARTITIONED_SUFFIX = ".parquet"
+PARTITION_COL = "year"
+# Column recording the row order of the source file
+ROW_NUMBER_COL = "_row_number"
+SOURCE_METADATA_FNAME = "_source.json"
+
+
+def get_partitioned_path(file_name):
+    """Return path of the year-partitioned Parquet layout of an HDF5 data file.
+
+    The layout is a directory next to the HDF5 file with the same name and
+    extension :const:`PARTITIONED_SUFFIX`.
+    """
+    return os.path.splitext(file_name)[0] + PARTITIONED_SUFFIX
+
+
+def is_partitioned_current(file_name):
+    """Check whether the partitioned layout of file_name exists and was converted
+    from the current version of file_name.
+    """
+    metadata_file = os.path.join(get_partitioned_path(file_name), SOURCE_METADATA_FNAME)
+    try:
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+        stat = os.stat(file_name)
+    except (OSError, ValueError):
+        return False
+    return metadata.get("mtime_ns") == stat.st_mtime_ns and metadata.get("size") == stat.st_size
+
+
+def convert_to_partitioned(file_name, reader="measurement", force=False):
+    """Rewrite an HDF5 data file into a start_date-partitioned Parquet layout.
+
+    Rows are written to one partition per start_date year in the directory
+    returned by :func:`get_partitioned_path`, so loaders can read only the
+    years and columns they need. Files without a start_date column are
+    written to a single partition. The layout records the modification time
+    and size of file_name and is ignored by the loaders once file_name is
+    re-synced.
+
+    Requires ``pyarrow``.
+
+    Parameters
+    ----------
+    file_name: string
+        Path of HDF5 data file.
+
+    reader: {'measurement', 'forecast'}, optional (default='measurement')
+        Whether file_name is read like :func:`~subseasonal_data.utils.load_measurement`
+        or like :func:`~subseasonal_data.utils.load_forecast_from_file`.
+
+    force: bool, optional (default=False)
+        Whether to convert file_name even if its layout is current.
+
+    Returns
+    -------
+    partitioned_path: string
+        Path of the partitioned layout.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from .utils import _read_measurement, _read_forecast
+
+    partitioned_path = get_partitioned_path(file_name)
+    if not force and is_partitioned_current(file_name):
+        return partitioned_path
+    stat = os.stat(file_name)
+    if reader == "measurement":
+        df = _read_measurement(file_name)
+    elif reader == "forecast":
+        df = _read_forecast(file_name)
+    else:
+        raise ValueError(f"Unrecognized reader {reader}")
+    df[ROW_NUMBER_COL] = range(len(df))
+    if 'start_date' in df.columns:
+        df[PARTITION_COL] = df['start_date'].dt.year.astype("int32")
+    else:
+        df[PARTITION_COL] = 0
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Write to a temporary directory and swap it in so readers never see a partial layout
+    tmp_path = f"{partitioned_path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(table, tmp_path, format="parquet", partitioning=_partitioning())
+    with open(os.path.join(tmp_path, SOURCE_METADATA_FNAME), "w") as f:
+        json.dump({"source": os.path.basename(file_name), "reader": reader,
+                   "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}, f)
+    if os.path.exists(partitioned_path):
+        old_path = f"{partitioned_path}.{os.getpid()}.old"
+        os.replace(partitioned_path, old_path)
+        os.replace(tmp_path, partitioned_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, partitioned_path)
+    return partitioned_path
+
+
+def convert_synced_files(data_subdir="dataframes", force=False, verbose=True):
+    """Convert all synced HDF5 files of a data subdirectory to the partitioned layout.
+
+    Files whose layout is current are skipped. Forecast files
+    (see :const:`~subseasonal_data.data_loaders.FORECASTID_TO_FILENAME`) are read
+    as forecasts, all other files as measurements.
+
+    Requires ``pyarrow``.
+
+    Parameters
+    ----------
+    data_subdir: string, optional (default='dataframes')
+        Local data directory containing HDF5 files.
+
+    force: bool, optional (default=False)
+        Whether to convert files even if their layout is current.
+
+    verbose: bool, optional (default=True)
+        Whether to print the name of each converted file.
+
+    Returns
+    -------
+    partitioned_paths: list of string
+        Paths of the partitioned layouts of all HDF5 files.
+    """
+    from .data_loaders import FORECASTID_TO_FILENAME
+
+    forecast_fnames = {fname+".h5" for fname in FORECASTID_TO_FILENAME.values()}
+    partitioned_paths = []
+    for file_name in sorted(glob.glob(os.path.join(get_subseasonal_data_path(), data_subdir, "*.h5"))):
+        if not force and is_partitioned_current(file_name):
+            partitioned_paths.append(get_partitioned_path(file_name))
+            continue
+        if verbose:
+            print(f"Converting {file_name}", flush=True)
+        reader = "forecast" if os.path.basename(file_name) in forecast_fnames else "measurement"
+        partitioned_paths.append(convert_to_partitioned(file_name, reader=reader, force=force))
+    return partitioned_paths
+
+
+def read_partitioned(file_name, columns=None, first_date=None, mask_df=None, last_date=None,
+                     leads=None):
+    """Read the partitioned layout of file_name if it is current.
+
+    Only the partitions of years containing dates in [first_date, last_date],
+    the requested leads and the requested columns are read. Rows are returned
+    in the order of file_name.
+
+    Parameters
+    ----------
+    file_name: string
+        Path of HDF5 data file.
+
+    columns: list of string, optional (default=None)
+        Columns to read in addition to start_date, lat and lon, or None to read all.
+
+    first_date: datetime-like, optional (default=None)
+        Only rows with start_date >= first_date are read.
+
+    mask_df: pd.DataFrame, optional (default=None)
+        If not None, rows with lat or lon values absent from mask_df are skipped
+        while reading; exact (lat, lon) masking is left to the caller.
+
+    last_date: datetime-like, optional (default=None)
+        Only rows with start_date <= last_date are read.
+
+    leads: list of float, optional (default=None)
+        If not None, only forecasts with these lead times in days are read:
+        rows with these values of the lead column if present and otherwise the
+        columns with these lead suffixes
+        (see :func:`~subseasonal_data.utils.select_lead_columns`).
+
+    Returns
+    -------
+    df: pd.DataFrame or None
+        Data or None if file_name has no current partitioned layout.
+    """
+    if not is_partitioned_current(file_name):
+        return None
+    import pyarrow.dataset as ds
+    from .utils import LEAD_COL, select_lead_columns
+
+    dataset = ds.dataset(get_partitioned_path(file_name), format="parquet",
+                         partitioning=_partitioning())
+    names = dataset.schema.names
+    if leads is not None and LEAD_COL not in names:
+        columns = select_lead_columns(
+            [col for col in names if col not in [PARTITION_COL, ROW_NUMBER_COL]]
+            if columns is None else columns, leads)
+    if columns is not None:
+        columns = [col for col in names
+                   if col in ['lat', 'lon', 'start_date', ROW_NUMBER_COL] or col in columns]
+    else:
+        columns = [col for col in names if col != PARTITION_COL]
+    row_filter = None
+    if first_date is not None and 'start_date' in names:
+        first_date = pd.Timestamp(first_date)
+        row_filter = (ds.field(PARTITION_COL) >= first_date.year) & \
+            (ds.field('start_date') >= first_date.to_pydatetime())
+    if last_date is not None and 'start_date' in names:
+        last_date = pd.Timestamp(last_date)
+        date_filter = (ds.field(PARTITION_COL) <= last_date.year) & \
+            (ds.field('start_date') <= last_date.to_pydatetime())
+        row_filter = date_filter if row_filter is None else row_filter & date_filter
+    if mask_df is not None and 'lat' in names and 'lon' in names:
+        mask_filter = ds.field('lat').isin(mask_df['lat'].unique().tolist()) & \
+            ds.field('lon').isin(mask_df['lon'].unique().tolist())
+        row_filter = mask_filter if row_filter is None else row_filter & mask_filter
+    if leads is not None and LEAD_COL in names:
+        lead_filter = ds.field(LEAD_COL).isin(list(leads))
+        row_filter = lead_filter if row_filter is None else row_filter & lead_filter
+    df = dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+    # Restore row order of the source file
+    df = df.sort_values(ROW_NUMBER_COL, kind='mergesort')
+    return df.drop(columns=ROW_NUMBER_COL).reset_index(drop=True)
+
+
+def read_feather_filtered(file_name, columns=None, start_date=None, end_date=None,
+                          mask_df=None, memory_map=True):
+    """Read rows and columns of a Feather file, filtering before conversion to pandas.
+
+    The file is scanned one record batch at a time and only rows with
+    start_date in [start_date, end_date] and lat, lon values present in mask_df
+    are kept, so peak memory scales with the selected slice rather than the
+    file size. With memory_map, uncompressed columns are read directly from
+    the mapped file; numeric columns without missing values are converted to
+    pandas without copying.
+
+    Requires ``pyarrow``.
+
+    Parameters
+    ----------
+    file_name: string
+        Path of Feather file.
+
+    columns: list of string, optional (default=None)
+        Columns to read or None to read all.
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only rows with start_date >= start_date are read.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only rows with start_date <= end_date are read.
+
+    mask_df: pd.DataFrame, optional (default=None)
+        If not None, only rows with (lat, lon) pairs in mask_df are returned.
+
+    memory_map: bool, optional (default=True)
+        Whether to memory-map file_name instead of reading it into memory.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        Selected data.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(os.path.abspath(file_name), format="feather",
+                         filesystem=fs.LocalFileSystem(use_mmap=memory_map))
+    names = dataset.schema.names
+    row_filter = None
+    for date, op in [(start_date, "__ge__"), (end_date, "__le__")]:
+        if date is not None:
+            date_filter = getattr(ds.field('start_date'), op)(pd.Timestamp(date).to_pydatetime())
+            row_filter = date_filter if row_filter is None else row_filter & date_filter
+    if mask_df is not None:
+        # Prefilter on lat and lon values; exact (lat, lon) pairs are matched below
+        mask_filter = ds.field('lat').isin(mask_df['lat'].unique().tolist()) & \
+            ds.field('lon').isin(mask_df['lon'].unique().tolist())
+        row_filter = mask_filter if row_filter is None else row_filter & mask_filter
+    read_columns = None
+    if columns is not None:
+        # Keep the columns needed to match mask_df
+        key_columns = ['lat', 'lon'] if mask_df is not None else []
+        read_columns = [col for col in names if col in columns or col in key_columns]
+    table = dataset.to_table(columns=read_columns, filter=row_filter)
+    df = table.to_pandas(split_blocks=True)
+    del table
+    if mask_df is not None:
+        df = pd.merge(df, mask_df[['lat', 'lon']].drop_duplicates(), on=['lat', 'lon'], how='inner')
+        if columns is not None:
+            df = df[[col for col in names if col in columns]]
+    return df
+
+
+def _partitioning():
+    """Hive partitioning of the layout by integer year."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([(PARTITION_COL, pa.int32())]), flavor="hive")
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pandas as pd
+import netCDF4
+from .downloader import get_subseasonal_data_path
+from .utils import get_measurement_variable
+from .data_loaders import _ground_truth_fname, _climatology_fname, _forecast_fname
+
+# Globals
+# Reference (leap) year of the dates of climatology files
+CLIMATOLOGY_YEAR = 2020
+# Lead times, in days, of synthetic forecast columns
+SYNTHETIC_LEADS = [0.5, 7.5, 14.5, 21.5, 28.5]
+
+
+def write_synthetic_data(data_path=None, gt_ids=["contest_tmp2m", "contest_precip"],
+                         forecast_ids=["subx_cfsv2-tmp2m"], n_lats=26, n_lons=59,
+                         first_lat=25.0, first_lon=235.0, start_date="1979-01-01", n_dates=365,
+                         mask_fname="us_mask.nc", seed=0):
+    """Write synthetic data files with the names and schemas of the dataset.
+
+    Writes, for each gt_id, a ground truth file and a climatology file with
+    dates in :const:`CLIMATOLOGY_YEAR`; for each forecast_id, a forecast file
+    with one column per lead in :const:`SYNTHETIC_LEADS`; and a netCDF4 mask
+    file, so the data loaders can run offline with ``sync=False`` once
+    :envvar:`$SUBSEASONALDATA_PATH` points at data_path. Values follow a
+    seasonal cycle plus noise: precipitation is non-negative and all other
+    variables are temperatures in deg C.
+
+    Parameters
+    ----------
+    data_path: string, optional (default=None)
+        Directory in which the 'dataframes' and 'masks' subdirectories are written;
+        if None, use :func:`~subseasonal_data.downloader.get_subseasonal_data_path`.
+
+    gt_ids: list of string, optional (default=["contest_tmp2m", "contest_precip"])
+        Ground truth ids (see :func:`~subseasonal_data.data_loaders.get_ground_truth`).
+
+    forecast_ids: list of string, optional (default=["subx_cfsv2-tmp2m"])
+        Forecast ids recognized by FORECASTID_TO_FILENAME.
+
+    n_lats, n_lons: int, optional (default=26, 59)
+        Number of grid latitudes and longitudes, spaced 1 degree apart.
+
+    first_lat, first_lon: float, optional (default=25.0, 235.0)
+        Smallest grid latitude and longitude; longitudes are in [0, 360).
+
+    start_date: datetime-like, optional (default="1979-01-01")
+        First start_date of ground truth and forecast files.
+
+    n_dates: int, optional (default=365)
+        Number of consecutive daily start_dates.
+
+    mask_fname: string, optional (default="us_mask.nc")
+        Name of the mask file written to the 'masks' subdirectory.
+
+    seed: int, optional (default=0)
+        Seed of the random values.
+
+    Returns
+    -------
+    file_paths: list of string
+        Paths of the written files.
+    """
+    data_path = get_subseasonal_data_path() if data_path is None else data_path
+    dataframes_path = os.path.join(data_path, "dataframes")
+    masks_path = os.path.join(data_path, "masks")
+    os.makedirs(dataframes_path, exist_ok=True)
+    os.makedirs(masks_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    lats = first_lat + np.arange(n_lats, dtype=float)
+    lons = first_lon + np.arange(n_lons, dtype=float)
+    dates = pd.date_range(start_date, periods=n_dates)
+    climatology_dates = pd.date_range(f"{CLIMATOLOGY_YEAR}-01-01", f"{CLIMATOLOGY_YEAR}-12-31")
+    file_paths = []
+    for gt_id in gt_ids:
+        var = get_measurement_variable(gt_id)
+        for fname, frame_dates in [(_ground_truth_fname(gt_id), dates),
+                                   (_climatology_fname(gt_id), climatology_dates)]:
+            df = _grid_frame(lats, lons, frame_dates)
+            df[var] = _values(var, df, rng)
+            file_paths.append(os.path.join(dataframes_path, fname))
+            df.to_hdf(file_paths[-1], key='data')
+    for forecast_id in forecast_ids:
+        model, var = forecast_id.split("-")[:2]
+        df = _grid_frame(lats, lons, dates)
+        for lead in SYNTHETIC_LEADS:
+            df[f"{model}_{var}-{lead}d"] = _values(var, df, rng)
+        file_paths.append(os.path.join(dataframes_path, _forecast_fname(forecast_id)))
+        df.to_hdf(file_paths[-1], key='data')
+    file_paths.append(os.path.join(masks_path, mask_fname))
+    _write_mask(file_paths[-1], lats, lons, rng)
+    return file_paths
+
+
+def _grid_frame(lats, lons, dates):
+    """Return dataframe with one (lat, lon, start_date) row per grid cell and date."""
+    lat, lon, start_date = np.meshgrid(lats, lons, dates, indexing="ij")
+    return pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(), 'start_date': start_date.ravel()})
+
+
+def _values(var, df, rng):
+    """Return seasonal cycle plus noise of variable var at the rows of df."""
+    season = np.cos(2 * np.pi * (df['start_date'].dt.dayofyear.to_numpy() - 200) / 365.25)
+    if var.startswith("precip"):
+        return rng.gamma(2.0, 1.0 + 0.5 * season, size=len(df))
+    return 30.0 - 0.5 * df['lat'].to_numpy() + 10.0 * season + rng.normal(size=len(df))
+
+
+def _write_mask(mask_file, lats, lons, rng):
+    """Write netCDF4 mask with about 80% of the (lat, lon) grid cells included."""
+    with netCDF4.Dataset(mask_file, 'w') as fh:
+        fh.createDimension('lat', len(lats))
+        fh.createDimension('lon', len(lons))
+        fh.createVariable('lat', 'f4', ('lat',))[:] = lats
+        # Mask files store longitudes in [-180, 180)
+        fh.createVariable('lon', 'f4', ('lon',))[:] = lons - 360
+        fh.createVariable('mask', 'i4', ('lat', 'lon'))[:] = rng.random((len(lats), len(lons))) < 0.8
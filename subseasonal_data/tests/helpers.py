@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from subseasonal_data import cache
+from subseasonal_data.synthetic import write_synthetic_data
+
+# Globals
+# Arguments of write_synthetic_data for a grid of 3 x 2 cells with dates from December 1999
+SMALL_GRID = dict(n_lats=3, n_lons=2, first_lat=27.0, first_lon=261.0, start_date="1999-12-01")
+
+
+class DataPathTestCase(unittest.TestCase):
+    """Test case with :envvar:`$SUBSEASONALDATA_PATH` set to a new temporary directory.
+
+    If synthetic_data is not None, ``write_synthetic_data(**synthetic_data)``
+    writes synthetic data files to the directory before each test. Climatology
+    lookups and masks cached by other tests are dropped.
+    """
+    synthetic_data = None
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.tmp_dir})
+        self.env.start()
+        self.file_paths = ([] if self.synthetic_data is None
+                           else write_synthetic_data(self.tmp_dir, **self.synthetic_data))
+        cache.clear_climatology_cache()
+        cache.clear_mask_cache()
+
+    def tearDown(self):
+        cache.clear_climatology_cache()
+        self.env.stop()
+        shutil.rmtree(self.tmp_dir)
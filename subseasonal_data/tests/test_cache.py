@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from subseasonal_data import cache, utils, data_loaders
+
+
+class TestFrameCache(unittest.TestCase):
+    """Tests for the in-process frame cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmp_dir, "gt-us_tmp2m-14d.h5")
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2000-01-01", periods=5),
+            indexing="ij")
+        self.df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                'start_date': start_date.ravel(),
+                                'tmp2m': np.arange(lat.size, dtype=float)})
+        self.df.to_hdf(self.file_name, key='data')
+        cache.enable_frame_cache()
+
+    def tearDown(self):
+        cache.disable_frame_cache()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hits_and_misses(self):
+        """Repeated loads are served from the cache."""
+        first = utils.load_measurement(self.file_name)
+        second = utils.load_measurement(self.file_name)
+        assert_frame_equal(first, second)
+        info = cache.frame_cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (1, 1))
+        # Shifted loads reuse the cached unshifted frame
+        shifted = utils.load_measurement(self.file_name, shift=1)
+        assert_frame_equal(shifted, utils.shift_df(self.df, shift=1))
+        info = cache.frame_cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (2, 2))
+
+    def test_mask_in_key(self):
+        """Masked and unmasked loads are cached separately."""
+        mask_df = pd.DataFrame({'lat': [27.0], 'lon': [261.0]})
+        self.assertEqual(len(utils.load_measurement(self.file_name)), 20)
+        self.assertEqual(len(utils.load_measurement(self.file_name, mask_df)), 5)
+        self.assertEqual(cache.frame_cache_info()["misses"], 2)
+
+    def test_copy_on_write(self):
+        """Modifying a returned frame leaves the cached frame intact."""
+        df = utils.load_measurement(self.file_name)
+        df.loc[0, 'tmp2m'] = -100.0
+        df.rename(columns={'tmp2m': 'renamed'}, inplace=True)
+        assert_frame_equal(utils.load_measurement(self.file_name), self.df)
+        df = utils.load_measurement(self.file_name)
+        df['tmp2m'] *= 2
+        assert_frame_equal(utils.load_measurement(self.file_name), self.df)
+
+    def test_invalidated_by_modification(self):
+        """Rewriting the source file invalidates cached frames."""
+        utils.load_measurement(self.file_name)
+        self.df['tmp2m'] += 1
+        self.df.to_hdf(self.file_name, key='data')
+        stat = os.stat(self.file_name)
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert_frame_equal(utils.load_measurement(self.file_name), self.df)
+
+    def test_eviction(self):
+        """Least recently used frames are evicted under the memory budget."""
+        frame_cache = cache.FrameCache(max_bytes=2000)
+        for ii in range(3):
+            frame_cache.put(ii, pd.DataFrame({'x': np.zeros(100)}))
+        self.assertIsNone(frame_cache.get(0))
+        self.assertIsNotNone(frame_cache.get(2))
+        info = frame_cache.info()
+        self.assertLessEqual(info["nbytes"], 2000)
+        self.assertEqual(info["evictions"], 1)
+
+    def test_climatology_cache(self):
+        """Climatology lookups are bounded and dropped with the frame cache."""
+        cache.clear_climatology_cache()
+        loads = []
+        with mock.patch.object(cache, "CLIMATOLOGY_LOOKUP_CACHE_SIZE", 1):
+            for key in ["a", "a", "b", "a"]:
+                cache.memoize_climatology_lookup(key, lambda: loads.append(key))
+        self.assertEqual(loads, ["a", "b", "a"])
+        cache.disable_frame_cache()
+        cache.memoize_climatology_lookup("a", lambda: loads.append("a"))
+        self.assertEqual(len(loads), 4)
+
+
+class TestDerivedCache(unittest.TestCase):
+    """Tests for the persistent derived frame cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.tmp_dir})
+        self.env.start()
+        os.makedirs(os.path.join(self.tmp_dir, "dataframes"))
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2000-12-25", periods=10),
+            indexing="ij")
+        self.gt = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                'start_date': start_date.ravel(),
+                                'tmp2m': np.arange(lat.size, dtype=float)})
+        self.gt.to_hdf(self.path("gt-us_tmp2m-14d.h5"), key='data')
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2020-01-01", "2020-12-31"),
+            indexing="ij")
+        climatology = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                    'start_date': start_date.ravel(),
+                                    'tmp2m': np.ones(lat.size)})
+        climatology.to_hdf(self.path("official_climatology-us_tmp2m.h5"), key='data')
+        self.cache_dir = cache.enable_derived_cache()
+
+    def tearDown(self):
+        cache.disable_derived_cache()
+        self.env.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, fname):
+        return os.path.join(self.tmp_dir, "dataframes", fname)
+
+    def cached_files(self):
+        return [fname for _, _, fnames in os.walk(self.cache_dir) for fname in fnames]
+
+    def test_anomalies_reused(self):
+        """Anomalies are computed once and then read from disk."""
+        self.assertEqual(self.cache_dir, os.path.join(self.tmp_dir, cache.DERIVED_CACHE_SUBDIR))
+        compute = data_loaders._compute_ground_truth_anomalies
+        with mock.patch.object(data_loaders, "_compute_ground_truth_anomalies",
+                               side_effect=compute) as mocked:
+            first = data_loaders.get_ground_truth_anomalies("us_tmp2m", shift=15, sync=False)
+            second = data_loaders.get_ground_truth_anomalies("us_tmp2m", shift=15, sync=False)
+            self.assertEqual(mocked.call_count, 1)
+            data_loaders.get_ground_truth_anomalies("us_tmp2m", shift=30, sync=False)
+            self.assertEqual(mocked.call_count, 2)
+        assert_frame_equal(first, second)
+        self.assertIn("tmp2m_shift15_anom", second.columns)
+        self.assertEqual(len(self.cached_files()), 2)
+
+    def test_masked_measurements_reused(self):
+        """Masked measurements are stored on disk; unmasked, unshifted reads are not."""
+        mask_df = pd.DataFrame({'lat': [27.0], 'lon': [261.0]})
+        utils.load_measurement(self.path("gt-us_tmp2m-14d.h5"))
+        self.assertEqual(self.cached_files(), [])
+        expected = utils.load_measurement(self.path("gt-us_tmp2m-14d.h5"), mask_df)
+        self.assertEqual(len(self.cached_files()), 1)
+        with mock.patch.object(utils, "_read_measurement") as mocked:
+            result = utils.load_measurement(self.path("gt-us_tmp2m-14d.h5"), mask_df)
+            mocked.assert_not_called()
+        assert_frame_equal(result, expected)
+
+    def test_requires_pyarrow(self):
+        """Enabling the cache without pyarrow raises an ImportError."""
+        with mock.patch("importlib.util.find_spec", return_value=None), \
+                self.assertRaisesRegex(ImportError, "subseasonal-data\\[arrow\\]"):
+            cache.enable_derived_cache()
+
+    def test_invalidated_by_resync(self):
+        """Rewriting a source file invalidates and removes its derived frames."""
+        data_loaders.get_ground_truth_anomalies("us_tmp2m", sync=False)
+        stale_files = self.cached_files()
+        self.gt['tmp2m'] += 1
+        self.gt.to_hdf(self.path("gt-us_tmp2m-14d.h5"), key='data')
+        stat = os.stat(self.path("gt-us_tmp2m-14d.h5"))
+        os.utime(self.path("gt-us_tmp2m-14d.h5"),
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        result = data_loaders.get_ground_truth_anomalies("us_tmp2m", sync=False)
+        np.testing.assert_array_equal(result['tmp2m_anom'], self.gt['tmp2m'] - 1)
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertNotEqual(self.cached_files(), stale_files)
@@ -1,7 +1,15 @@
 import io
+import os
+import threading
+import time
+import functools
 import unittest
+from unittest import mock
 from contextlib import redirect_stdout
-from subseasonal_data import data_loaders
+import numpy as np
+import pandas as pd
+from subseasonal_data import data_loaders, utils
+from subseasonal_data.tests.helpers import DataPathTestCase, SMALL_GRID
 
 
 def _quiet_test(f):
@@ -82,3 +90,255 @@ class TestDataLoaders(unittest.TestCase):
         """Smoke test for 'get_lat_lon_features' data loader."""
         gt_ids = ["elevation", "climate_regions"]
         data_loaders.get_lat_lon_features(gt_ids=gt_ids)
+
+
+class TestFeatureBuilders(DataPathTestCase):
+    """Offline tests for feature builders on synthetic data."""
+    synthetic_data = dict(SMALL_GRID, n_dates=40)
+
+    @_quiet_test
+    def test_sources_prefetched_once(self):
+        """Feature builders sync all sources in one prefetch batch."""
+        status = {"status": "current", "error": None, "seconds": 0.0}
+        with mock.patch.object(data_loaders, "prefetch",
+                               side_effect=lambda files, **kw: {f: status for f in files}) as mocked, \
+                mock.patch.object(data_loaders, "download_file") as download_file:
+            data_loaders.get_lat_lon_date_features(
+                gt_ids=["contest_tmp2m", "contest_precip"], gt_shifts=15,
+                forecast_ids=["subx_cfsv2-tmp2m"], anom_ids=["contest_tmp2m"])
+            download_file.assert_not_called()
+        mocked.assert_called_once()
+        self.assertEqual(sorted(f for _, f in mocked.call_args[0][0]), sorted([
+            "gt-contest_tmp2m-14d.h5", "gt-contest_precip-14d.h5",
+            "subx-cfsv2-tmp2m-all_leads-8_periods_avg.h5",
+            "gt-contest_tmp2m-14d.h5", "official_climatology-contest_tmp2m.h5"]))
+
+    def test_compact_dtype_policy(self):
+        """Compact features match default features in compact dtypes and less memory."""
+        mask = pd.DataFrame({'lat': [27.0, 28.0, 29.0], 'lon': [261.0, 262.0, 261.0]})
+        arguments = dict(gt_ids=["contest_precip"], gt_shifts=15, forecast_ids=["subx_cfsv2-tmp2m"],
+                         anom_ids=["contest_tmp2m"], anom_masks=mask, sync=False)
+        with redirect_stdout(io.StringIO()):
+            expected = data_loaders.get_lat_lon_date_features(**arguments)
+            compact = data_loaders.get_lat_lon_date_features(dtype_policy="compact", **arguments)
+        self.assertIsInstance(compact['lat'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(compact['lon'].dtype, pd.CategoricalDtype)
+        self.assertTrue((compact.dtypes.drop(['lat', 'lon', 'start_date']) == np.float32).all())
+        self.assertLess(compact.memory_usage().sum(), 0.6 * expected.memory_usage().sum())
+        pd.testing.assert_frame_equal(compact.astype({'lat': float, 'lon': float}), expected,
+                                      check_dtype=False, atol=1e-5)
+
+    def test_concurrent_loading_matches_serial(self):
+        """Thread and process pools return the features of the serial path."""
+        mask = pd.DataFrame({'lat': [27.0, 28.0, 29.0], 'lon': [261.0, 262.0, 261.0]})
+        arguments = dict(gt_ids=["contest_tmp2m", "contest_precip"], gt_shifts=[15, None],
+                         forecast_ids=["subx_cfsv2-tmp2m"], anom_ids=["contest_tmp2m"],
+                         anom_masks=mask, sync=False)
+        with redirect_stdout(io.StringIO()):
+            expected = data_loaders.get_lat_lon_date_features(**arguments)
+            expected_date = data_loaders.get_date_features(["contest_tmp2m", "contest_precip"],
+                                                           sync=False)
+            for executor in ["thread", "process"]:
+                pd.testing.assert_frame_equal(data_loaders.get_lat_lon_date_features(
+                    n_jobs=3, executor=executor, **arguments), expected)
+                pd.testing.assert_frame_equal(data_loaders.get_date_features(
+                    ["contest_tmp2m", "contest_precip"], sync=False, n_jobs=2, executor=executor),
+                    expected_date)
+
+    def test_concurrent_loading_memory_guard(self):
+        """Sources exceeding the memory budget are loaded one at a time."""
+        lock = threading.Lock()
+        state = {"running": 0, "max_running": 0}
+
+        def load(value):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(state["max_running"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            return value
+        tasks = [(["gt-contest_tmp2m-14d.h5"], functools.partial(load, ii)) for ii in range(4)]
+        with mock.patch.object(data_loaders, "_memory_budget", return_value=1):
+            self.assertEqual(data_loaders._load_sources(tasks, n_jobs=4), [0, 1, 2, 3])
+        self.assertEqual(state["max_running"], 1)
+        with self.assertRaises(ValueError):
+            data_loaders._load_sources(tasks, n_jobs=2, executor="fiber")
+
+    def test_memory_budget(self):
+        """The memory budget counts reclaimable memory reported as MemAvailable."""
+        meminfo = "MemTotal: 400 kB\nMemFree: 10 kB\nMemAvailable: 200 kB\n"
+        with mock.patch("builtins.open", mock.mock_open(read_data=meminfo)):
+            self.assertEqual(data_loaders._memory_budget(),
+                             data_loaders.PARALLEL_MEMORY_FRACTION * 200 * 1024)
+
+    def test_prefetch_errors_raised(self):
+        """Failed transfers are raised by the feature builders."""
+        status = {"status": "failed", "error": OSError("transfer failed"), "seconds": 0.0}
+        with mock.patch.object(data_loaders, "prefetch",
+                               side_effect=lambda files, **kw: {f: status for f in files}), \
+                redirect_stdout(io.StringIO()), self.assertRaises(OSError):
+            data_loaders.get_date_features(gt_ids=["contest_tmp2m"])
+
+
+class TestForecastEnsemble(DataPathTestCase):
+    """Tests for 'get_forecast_ensemble' on synthetic ensemble members."""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.tmp_dir, "dataframes"))
+        rng = np.random.default_rng(0)
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2020-01-01", periods=5), indexing="ij")
+        self.members = []
+        for member in range(1, 8):
+            df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(), 'start_date': start_date.ravel(),
+                               'iri_ecmwf_tmp2m': rng.normal(size=lat.size)})
+            if member == 3:
+                # Member without the first cells
+                df = df.iloc[2:]
+            df.to_hdf(os.path.join(self.tmp_dir, "dataframes",
+                                   f"iri-ecmwf-tmp2m-all-us1_5-pf{member}-forecast.h5"), key='data')
+            self.members.append(df.assign(member=member))
+
+    def test_members_cube(self):
+        """Members are stacked into a (member, date, lat, lon) cube."""
+        with redirect_stdout(io.StringIO()):
+            cube = data_loaders.get_forecast_ensemble("tmp2m", members=range(1, 8), sync=False, n_jobs=3)
+        self.assertEqual(cube['iri_ecmwf_tmp2m'].shape, (7, 5, 2, 2))
+        expected = pd.concat(self.members)[['member', 'lat', 'lon', 'start_date', 'iri_ecmwf_tmp2m']]
+        expected = expected.sort_values(['member', 'lat', 'lon', 'start_date']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(cube.to_frame(), expected)
+
+    def test_streaming_statistics(self):
+        """Streaming statistics match statistics of the concatenated members."""
+        with redirect_stdout(io.StringIO()):
+            result = data_loaders.get_forecast_ensemble(
+                "tmp2m", members=range(1, 8), stats=["mean", "spread", "quantiles", "exceedance"],
+                quantiles=[0.5], sync=False, n_jobs=2)
+        grouped = pd.concat(self.members).groupby(['lat', 'lon', 'start_date'])['iri_ecmwf_tmp2m']
+        np.testing.assert_allclose(result['iri_ecmwf_tmp2m_mean'], grouped.mean().values)
+        np.testing.assert_allclose(result['iri_ecmwf_tmp2m_spread'], grouped.std().values)
+        np.testing.assert_allclose(result['iri_ecmwf_tmp2m_exceed0.0'],
+                                   grouped.apply(lambda values: (values > 0).mean()).values)
+        self.assertEqual(len(result), 20)
+        with self.assertRaises(ValueError):
+            data_loaders.get_forecast_ensemble("tmp2m", members=[51], sync=False)
+
+
+class TestGroundTruthAnomalies(DataPathTestCase):
+    """Tests for the day-of-year climatology lookup of 'get_ground_truth_anomalies'."""
+
+    def setUp(self):
+        super().setUp()
+        dataframes_path = os.path.join(self.tmp_dir, "dataframes")
+        os.makedirs(dataframes_path)
+        rng = np.random.default_rng(0)
+        # Ground truth spans a leap day and a cell absent from the climatology
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0, 29.0], [261.0, 262.0], pd.date_range("2000-02-20", "2001-03-05"),
+            indexing="ij")
+        pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(), 'start_date': start_date.ravel(),
+                      'tmp2m': rng.normal(size=lat.size)}).to_hdf(
+            os.path.join(dataframes_path, "gt-contest_tmp2m-14d.h5"), key='data')
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2020-01-01", "2020-12-31"),
+            indexing="ij")
+        climatology = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                    'start_date': start_date.ravel(),
+                                    'tmp2m': rng.normal(size=lat.size)})
+        # One cell lacks a leap day value
+        climatology = climatology.drop(climatology.index[
+            (climatology.lat == 28.0) & (climatology.lon == 262.0)
+            & (climatology.start_date == "2020-02-29")])
+        climatology.to_hdf(os.path.join(dataframes_path, "official_climatology-contest_tmp2m.h5"),
+                           key='data')
+
+    def test_lookup_matches_merge(self):
+        """Climatology lookup produces the same anomalies as the merge."""
+        mask_df = pd.DataFrame({'lat': [27.0, 28.0, 29.0], 'lon': [261.0, 262.0, 262.0]})
+        for kwargs in [{}, {'shift': 15},
+                       {'shift': 15, 'start_date': "2000-11-01", 'end_date': "2001-02-28"},
+                       {'mask_df': mask_df, 'shift': 29}]:
+            with redirect_stdout(io.StringIO()):
+                result = data_loaders.get_ground_truth_anomalies(
+                    "contest_tmp2m", sync=False, **kwargs)
+                with mock.patch.object(data_loaders, "_climatology_lookup", return_value=None):
+                    expected = data_loaders.get_ground_truth_anomalies(
+                        "contest_tmp2m", sync=False, **kwargs)
+            pd.testing.assert_frame_equal(result, expected)
+        clim_col = "tmp2m_shift29_clim"
+        self.assertTrue(result.loc[result.lat == 29.0, clim_col].isna().all())
+        self.assertFalse(result.loc[result.lat == 27.0, clim_col].isna().any())
+
+    def test_trailing_window(self):
+        """Date windows across a year boundary match slices of the full data."""
+        window = {'start_date': "2000-11-01", 'end_date': "2001-02-28"}
+        with redirect_stdout(io.StringIO()):
+            full = data_loaders.get_ground_truth_anomalies("contest_tmp2m", shift=15, sync=False)
+            result = data_loaders.get_ground_truth_anomalies(
+                "contest_tmp2m", shift=15, sync=False, **window)
+            clim = data_loaders.get_climatology("contest_tmp2m", sync=False, **window)
+        pd.testing.assert_frame_equal(
+            result, utils.date_slice(full, **window).reset_index(drop=True))
+        self.assertEqual(result['start_date'].nunique(), 120)
+        self.assertEqual(clim['start_date'].nunique(), 120)
+        self.assertEqual(clim['start_date'].min(), pd.Timestamp("2020-01-01"))
+        self.assertEqual(clim['start_date'].max(), pd.Timestamp("2020-12-31"))
+
+    def test_lookup_reused(self):
+        """Lookup tables are built once per climatology, mask and variable."""
+        with redirect_stdout(io.StringIO()):
+            with mock.patch.object(data_loaders, "DayOfYearLookup",
+                                   side_effect=data_loaders.DayOfYearLookup) as mocked:
+                data_loaders.get_ground_truth_anomalies("contest_tmp2m", sync=False)
+                data_loaders.get_ground_truth_anomalies("contest_tmp2m", shift=15, sync=False)
+        self.assertEqual(mocked.call_count, 1)
+
+
+class TestFeatureIterators(DataPathTestCase):
+    """Tests for chunked feature iterators."""
+    synthetic_data = dict(SMALL_GRID, n_dates=420)
+
+    def assert_windows_match(self, windows, expected):
+        self.assertGreater(len(windows), 1)
+        for previous, current in zip(windows[:-1], windows[1:]):
+            self.assertLess(previous['start_date'].max(), current['start_date'].min())
+        for window in windows:
+            in_window = expected['start_date'].between(
+                window['start_date'].min(), window['start_date'].max())
+            pd.testing.assert_frame_equal(window, expected[in_window].reset_index(drop=True))
+        self.assertEqual(sum(len(window) for window in windows), len(expected))
+
+    def test_lat_lon_date_windows(self):
+        """Windows hold the rows of the full lat-lon-date features in their date range."""
+        kwargs = dict(gt_ids=["contest_tmp2m", "contest_precip"], gt_shifts=[None, 15],
+                      forecast_ids=["subx_cfsv2-tmp2m"], forecast_shifts=29,
+                      anom_ids=["contest_tmp2m"], anom_shifts=30, sync=False)
+        with redirect_stdout(io.StringIO()):
+            expected = data_loaders.get_lat_lon_date_features(**kwargs)
+            for window, partition in [("year", True), (50, False)]:
+                windows = list(data_loaders.iter_lat_lon_date_features(
+                    window=window, partition=partition, **kwargs))
+                self.assert_windows_match(windows, expected)
+        # 420 source dates extended by the largest shift of 30 days
+        self.assertEqual(len(windows), 9)
+
+    def test_date_windows(self):
+        """Windows hold the rows of the full date features in their date range."""
+        kwargs = dict(gt_ids=["contest_tmp2m"], gt_shifts=15, first_year=2000, sync=False)
+        with redirect_stdout(io.StringIO()):
+            expected = data_loaders.get_date_features(**kwargs)
+            # Unpartitioned source files are read in full for every window
+            with self.assertWarns(UserWarning), \
+                    mock.patch.object(pd, "read_hdf", wraps=pd.read_hdf) as read_hdf:
+                windows = list(data_loaders.iter_date_features(window=100, **kwargs))
+        self.assert_windows_match(windows, expected.reset_index(drop=True))
+        # Dates of the windows are listed without reading the whole file
+        self.assertEqual(read_hdf.call_count, len(windows))
+        self.assertEqual(windows[0]['start_date'].min(), pd.Timestamp("2000-01-01"))
+
+    def test_invalid_window(self):
+        """Windows must be 'year' or a positive number of dates."""
+        with self.assertRaises(ValueError):
+            next(data_loaders.iter_date_features(gt_ids=["contest_tmp2m"], sync=False, window=0))
@@ -1,6 +1,19 @@
 import io
+import os
+import shutil
+import tempfile
+import json
+import sys
+import time
+import warnings
+import threading
 import unittest
+from http.server import (BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer,
+                         SimpleHTTPRequestHandler)
+from unittest import mock
+from email.utils import formatdate
 from contextlib import redirect_stdout
+from functools import partial
 from subseasonal_data import downloader
 
 
@@ -35,3 +48,516 @@ class TestDownloader(unittest.TestCase):
         with redirect_stdout(buffer):
             downloader.list_subdir_files(data_subdir="combined_dataframes")
         print("Listing files at origin was successful.")
+
+
+class TestDataPath(unittest.TestCase):
+    """Offline tests for the local data path."""
+
+    def test_default_data_path(self):
+        """The data path defaults to the home directory when $SUBSEASONALDATA_PATH is unset."""
+        with mock.patch.dict(os.environ, clear=True):
+            os.environ["HOME"] = "/home/user"
+            self.assertEqual(downloader.get_subseasonal_data_path(),
+                             os.path.join("/home/user", downloader.DEFAULT_SUBSEASONAL_DATA_DIR))
+        with mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": "/data"}):
+            self.assertEqual(downloader.get_subseasonal_data_path(), "/data")
+
+
+class TestRemoteManifest(unittest.TestCase):
+    """Offline tests for the remote manifest freshness check."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.tmp_dir})
+        self.env.start()
+        downloader._manifests.clear()
+        downloader._manifest_failures.clear()
+        os.makedirs(os.path.join(self.tmp_dir, "masks"))
+        self.filepath = os.path.join(self.tmp_dir, "masks", "us_mask.nc")
+        with open(self.filepath, "wb") as f:
+            f.write(b"x" * 10)
+        self.set_remote(size=10, etag="0x1", last_modified=time.time() - 3600)
+
+    def tearDown(self):
+        downloader._manifests.clear()
+        downloader._manifest_failures.clear()
+        self.env.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def set_remote(self, size, etag, last_modified):
+        self.listing = f"""<?xml version="1.0" encoding="utf-8"?>
+            <EnumerationResults><Blobs><Blob><Name>masks/us_mask.nc</Name><Properties>
+            <Last-Modified>{formatdate(last_modified, usegmt=True)}</Last-Modified>
+            <Etag>{etag}</Etag><Content-Length>{size}</Content-Length>
+            </Properties></Blob></Blobs><NextMarker /></EnumerationResults>""".encode()
+
+    def patch_remote(self):
+        response = mock.Mock(content=self.listing)
+        session = downloader.get_default_session()
+        return (mock.patch.object(session, "get_access_token", return_value="sig=x"),
+                mock.patch.object(session.http, "get", return_value=response))
+
+    def test_manifest_fetched_once(self):
+        """The manifest is listed once and reused within its TTL."""
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch as get:
+            manifest = downloader.get_remote_manifest("masks")
+            self.assertEqual(manifest["us_mask.nc"]["size"], 10)
+            self.assertEqual(manifest["us_mask.nc"]["etag"], "0x1")
+            downloader.get_remote_manifest("masks")
+            downloader._manifests.clear()
+            # Manifest cached on disk
+            downloader.get_remote_manifest("masks")
+            self.assertEqual(get.call_count, 1)
+            downloader.get_remote_manifest("masks", ttl=0)
+            self.assertEqual(get.call_count, 2)
+
+    def test_sync_skipped_for_current_file(self):
+        """get_local_file_path does not sync files matching the manifest."""
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch, \
+                mock.patch.object(downloader, "download_file") as download_file:
+            downloader.get_local_file_path("masks", "us_mask.nc", sync=True)
+            download_file.assert_not_called()
+            downloader.get_local_file_path("masks", "missing.nc", sync=True)
+            download_file.assert_called_once()
+
+    def test_stale_file(self):
+        """Files with a different size or an older copy are not current."""
+        self.set_remote(size=11, etag="0x2", last_modified=time.time() - 3600)
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch:
+            self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+        downloader._manifests.clear()
+        self.set_remote(size=10, etag="0x2", last_modified=time.time() + 3600)
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch:
+            self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+
+    def test_etag_recorded_after_sync(self):
+        """A synced file is current until the remote ETag changes."""
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch:
+            downloader.get_remote_manifest("masks")
+            downloader._record_synced_file("masks", "us_mask.nc")
+            self.assertTrue(downloader.is_local_file_current("masks", "us_mask.nc"))
+        downloader._manifests.clear()
+        self.set_remote(size=10, etag="0x2", last_modified=time.time() - 3600)
+        token_patch, get_patch = self.patch_remote()
+        with token_patch, get_patch:
+            downloader.get_remote_manifest("masks", refresh=True)
+            self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+
+    def test_manifest_failure(self):
+        """Files are synced when the manifest cannot be fetched, and the failure is not retried."""
+        with mock.patch.object(downloader.get_default_session(), "get_access_token",
+                               side_effect=OSError) as get_token:
+            with self.assertWarns(UserWarning):
+                self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+        self.assertEqual(get_token.call_count, 1)
+
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the data access token endpoint."""
+
+    def do_GET(self):
+        self.server.requests += 1
+        expiry = time.strftime("%Y-%m-%dT%H:%M:%SZ",
+                               time.gmtime(time.time() + self.server.lifetime))
+        body = json.dumps({"msft:expiry": expiry,
+                           "token": f"sig={self.server.requests}"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownloaderSession(unittest.TestCase):
+    """Offline tests for DownloaderSession."""
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _TokenHandler)
+        self.server.requests = 0
+        self.server.lifetime = 3600
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.session = downloader.DownloaderSession(
+            token_url=f"http://127.0.0.1:{self.server.server_port}/token")
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_token_cached(self):
+        """The token is fetched once while it is valid."""
+        tokens = {self.session.get_access_token() for _ in range(5)}
+        self.assertEqual(tokens, {"sig=1"})
+        self.assertEqual(self.server.requests, 1)
+
+    def test_token_renewed_before_expiry(self):
+        """Tokens expiring within the margin are renewed."""
+        self.server.lifetime = 60
+        self.assertEqual(self.session.get_access_token(), "sig=1")
+        self.assertEqual(self.session.get_access_token(), "sig=2")
+
+    def test_default_session(self):
+        """Module-level functions use the default session."""
+        previous = downloader.get_default_session()
+        try:
+            downloader.set_default_session(self.session)
+            downloader.get_access_token()
+            downloader.get_access_token()
+            self.assertEqual(self.server.requests, 1)
+        finally:
+            downloader.set_default_session(previous)
+
+    def test_azcopy_checked_once(self):
+        """azcopy install is checked once per session."""
+        with mock.patch.object(downloader, "check_azcopy_install") as check:
+            self.session.check_azcopy_install()
+            self.session.check_azcopy_install()
+            check.assert_called_once()
+
+
+class TestPrefetch(unittest.TestCase):
+    """Offline tests for concurrent prefetching."""
+
+    def test_prefetch_concurrent(self):
+        """Files are synced concurrently with per-file status."""
+        running, peak = [], []
+        lock = threading.Lock()
+
+        def download_file(data_subdir, filename, verbose=True, allow_write=False):
+            with lock:
+                running.append(filename)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(filename)
+            if filename == "bad.h5":
+                raise OSError("transfer failed")
+
+        files = [("dataframes", f"{ii}.h5") for ii in range(6)] + \
+            [("dataframes", "0.h5"), ("dataframes", "bad.h5")]
+        with mock.patch.object(downloader, "download_file", side_effect=download_file) as mocked, \
+                mock.patch.object(downloader, "is_local_file_current",
+                                  side_effect=lambda d, f: f == "5.h5"):
+            status = downloader.prefetch(files, max_workers=3)
+        self.assertEqual(mocked.call_count, 6)
+        self.assertEqual(max(peak), 3)
+        self.assertEqual(len(status), 7)
+        self.assertEqual(status[("dataframes", "0.h5")]["status"], "synced")
+        self.assertEqual(status[("dataframes", "5.h5")]["status"], "current")
+        self.assertEqual(status[("dataframes", "bad.h5")]["status"], "failed")
+        self.assertIsInstance(status[("dataframes", "bad.h5")]["error"], OSError)
+
+
+class _BlobHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the blob store supporting HEAD and byte-range requests."""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.server.content)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", '"0x1"')
+        self.send_header("Last-Modified", formatdate(time.time() - 3600, usegmt=True))
+        self.end_headers()
+
+    def do_GET(self):
+        start, end = map(int, self.headers["Range"].split("=")[1].split("-"))
+        with self.server.lock:
+            self.server.ranges.append(start)
+            failures = self.server.failures.get(start, 0)
+            if failures:
+                self.server.failures[start] = failures - 1
+        if failures:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.server.content[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.server.content)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpDownload(unittest.TestCase):
+    """Offline tests for the http transfer backend against a local server."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmp_dir, "data.h5")
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _BlobHandler)
+        self.server.content = os.urandom(10 * 1000 + 7)
+        self.server.ranges = []
+        self.server.failures = {}
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data.h5?sig=x"
+        self.session = downloader.DownloaderSession()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def download(self, **kwargs):
+        return downloader.http_download(self.url, self.filepath, session=self.session,
+                                        chunk_size=1000, max_workers=4, verbose=False, **kwargs)
+
+    def read(self):
+        with open(self.filepath, "rb") as f:
+            return f.read()
+
+    def test_parallel_ranges(self):
+        """File is assembled from parallel byte ranges and renamed in place."""
+        stats = self.download()
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(sorted(self.server.ranges), list(range(0, 11000, 1000)))
+        self.assertEqual(stats["bytes_transferred"], len(self.server.content))
+        self.assertGreater(stats["throughput"], 0)
+        self.assertEqual(os.listdir(self.tmp_dir), ["data.h5"])
+        # Up-to-date file is not downloaded again
+        self.assertEqual(self.download()["bytes_transferred"], 0)
+
+    def test_progress_callback(self):
+        """Progress events are emitted per byte range."""
+        events = []
+        self.session.progress_callback = events.append
+        self.download()
+        self.assertEqual(len(events), 12)
+        self.assertEqual(events[-2]["percent"], 100.0)
+        self.assertEqual(events[-1]["event"], "summary")
+
+    def test_retries(self):
+        """Failed range requests are retried."""
+        self.server.failures = {0: 2, 5000: 1}
+        self.download(max_retries=2)
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(self.server.ranges.count(0), 3)
+
+    def test_resume(self):
+        """Interrupted downloads resume from completed ranges."""
+        self.server.failures = {3000: 1}
+        with self.assertRaises(downloader.requests.HTTPError):
+            self.download(max_retries=0)
+        self.assertFalse(os.path.exists(self.filepath))
+        self.assertTrue(os.path.exists(self.filepath + ".part"))
+        self.server.ranges.clear()
+        stats = self.download(max_retries=0)
+        self.assertEqual(self.server.ranges, [3000])
+        self.assertEqual(stats["bytes_transferred"], 1000)
+        self.assertEqual(stats["resumed_bytes"], len(self.server.content) - 1000)
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(os.listdir(self.tmp_dir), ["data.h5"])
+
+    def test_download_file_backend(self):
+        """download_file uses the http backend when selected."""
+        with mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.tmp_dir,
+                                          "SUBSEASONALDATA_TRANSFER": "http"}), \
+                mock.patch.object(downloader, "get_access_token", return_value="sig=x"), \
+                mock.patch.object(downloader, "SUBSEASONAL_DATA_BLOB",
+                                  f"http://127.0.0.1:{self.server.server_port}"), \
+                mock.patch.object(downloader, "check_azcopy_install") as check, \
+                redirect_stdout(io.StringIO()):
+            downloader.download_file("masks", "us_mask.nc")
+            check.assert_not_called()
+        with open(os.path.join(self.tmp_dir, "masks", "us_mask.nc"), "rb") as f:
+            self.assertEqual(f.read(), self.server.content)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """Static file server of the HTTP mirror tests."""
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDataSources(unittest.TestCase):
+    """Offline tests for syncing files from local and HTTP mirrors."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.tmp_dir, "data")
+        self.mirror_path = os.path.join(self.tmp_dir, "mirror")
+        os.makedirs(os.path.join(self.mirror_path, "masks"))
+        self.write_mirror(b"mask" * 100)
+        self.env = mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.data_path,
+                                                "SUBSEASONALDATA_SOURCE": self.mirror_path})
+        self.env.start()
+        downloader._manifests.clear()
+        downloader._manifest_failures.clear()
+        # Mirrors never need Azure storage
+        self.token = mock.patch.object(downloader.get_default_session(), "get_access_token",
+                                       side_effect=AssertionError("Azure storage accessed"))
+        self.token.start()
+
+    def tearDown(self):
+        self.token.stop()
+        downloader.set_data_source(None)
+        downloader._manifests.clear()
+        downloader._manifest_failures.clear()
+        self.env.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_mirror(self, content, mtime=None):
+        filepath = os.path.join(self.mirror_path, "masks", "us_mask.nc")
+        with open(filepath, "wb") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(filepath, (mtime, mtime))
+        self.content = content
+
+    def sync(self):
+        with redirect_stdout(io.StringIO()):
+            filepath = downloader.get_local_file_path("masks", "us_mask.nc")
+        with open(filepath, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        return filepath
+
+    def test_source_selection(self):
+        """The data source is selected by $SUBSEASONALDATA_SOURCE unless set explicitly."""
+        self.assertIsInstance(downloader.get_data_source(), downloader.LocalMirrorSource)
+        with mock.patch.dict(os.environ, {"SUBSEASONALDATA_SOURCE": "https://mirror/data/"}):
+            source = downloader.get_data_source()
+            self.assertIsInstance(source, downloader.HttpMirrorSource)
+            self.assertEqual(source.url, "https://mirror/data")
+        with mock.patch.dict(os.environ, {"SUBSEASONALDATA_SOURCE": "azure"}):
+            self.assertIsInstance(downloader.get_data_source(), downloader.AzureBlobSource)
+            downloader.set_data_source(downloader.LocalMirrorSource(self.mirror_path))
+            self.assertIsInstance(downloader.get_data_source(), downloader.LocalMirrorSource)
+
+    def test_local_mirror(self):
+        """Files are hardlinked from a local mirror and resynced when the mirror changes."""
+        filepath = self.sync()
+        mirror_file = os.path.join(self.mirror_path, "masks", "us_mask.nc")
+        self.assertTrue(os.path.samefile(filepath, mirror_file))
+        self.assertTrue(downloader.is_local_file_current("masks", "us_mask.nc"))
+        # The mirror replaces the file with a new version
+        os.remove(mirror_file)
+        self.write_mirror(b"new mask" * 100, mtime=time.time() + 10)
+        downloader.get_remote_manifest("masks", refresh=True)
+        self.assertFalse(downloader.is_local_file_current("masks", "us_mask.nc"))
+        self.sync()
+        self.assertTrue(downloader.is_local_file_current("masks", "us_mask.nc"))
+
+    def test_local_mirror_allow_write(self):
+        """Files synced with allow_write are not hardlinked, leaving the mirror's permissions."""
+        mirror_file = os.path.join(self.mirror_path, "masks", "us_mask.nc")
+        os.chmod(mirror_file, 0o644)
+        with redirect_stdout(io.StringIO()):
+            filepath = downloader.get_local_file_path("masks", "us_mask.nc", allow_write=True)
+        self.assertFalse(os.path.samefile(filepath, mirror_file))
+        self.assertEqual(os.stat(mirror_file).st_mode & 0o777, 0o644)
+        self.assertEqual(os.stat(filepath).st_mode & 0o777, 0o777)
+
+    def test_local_mirror_copy(self):
+        """Files are cloned or copied if hardlinks are disabled."""
+        downloader.set_data_source(downloader.LocalMirrorSource(self.mirror_path, hardlink=False))
+        filepath = self.sync()
+        self.assertFalse(os.path.samefile(filepath, os.path.join(self.mirror_path, "masks", "us_mask.nc")))
+        self.assertTrue(downloader.is_local_file_current("masks", "us_mask.nc"))
+
+    def test_http_mirror(self):
+        """Files are downloaded from an HTTP mirror listed by its manifests."""
+        manifest_files = downloader.write_mirror_manifest(self.mirror_path)
+        self.assertEqual(manifest_files, [os.path.join(self.mirror_path, "masks",
+                                                       downloader.MIRROR_MANIFEST_FNAME)])
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=self.mirror_path))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with mock.patch.dict(os.environ, {
+                    "SUBSEASONALDATA_SOURCE": f"http://127.0.0.1:{server.server_port}"}):
+                self.assertEqual(list(downloader.get_remote_manifest("masks")), ["us_mask.nc"])
+                self.sync()
+                self.assertTrue(downloader.is_local_file_current("masks", "us_mask.nc"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestRealtimeLog(unittest.TestCase):
+    """Offline tests for subprocess output streaming and azcopy progress parsing."""
+
+    def test_parse_azcopy_output(self):
+        """Progress and summary lines are parsed into events."""
+        event = downloader.parse_azcopy_output(
+            "50.0 %, 1 Done, 0 Failed, 1 Pending, 0 Skipped, 2 Total, 2-sec Throughput (Mb/s): 80")
+        self.assertEqual(event["event"], "progress")
+        self.assertEqual((event["files_done"], event["files_total"]), (1, 2))
+        self.assertEqual(event["bytes_per_second"], 1e7)
+        self.assertEqual(downloader.parse_azcopy_output("Total Number of Bytes Transferred: 123"),
+                         {"event": "summary", "bytes_transferred": 123})
+        self.assertIsNone(downloader.parse_azcopy_output("INFO: Scanning..."))
+
+    def test_progress_callback(self):
+        """Progress lines reach the callback; large stderr output does not deadlock."""
+        script = ("import sys\n"
+                  "sys.stderr.write('w' * 200000)\n"
+                  "for ii in range(3):\n"
+                  "    sys.stdout.write(f'{ii * 50}.0 %, {ii} Done, 0 Failed, {2 - ii} Pending, '\n"
+                  "                     f'0 Skipped, 2 Total, 2-sec Throughput (Mb/s): 8\\r')\n"
+                  "print('\\nNumber of File Transfers Completed: 2')\n"
+                  "print('Total Number of Bytes Transferred: 4096')\n"
+                  "print('Final Job Status: Completed')\n")
+        events = []
+        buffer = io.StringIO()
+        with redirect_stdout(buffer), \
+                self.assertRaises(downloader.CalledProcessError) as context:
+            downloader._subprocess_with_realtime_log(
+                f'"{sys.executable}" -c "{script}"', verbose=False,
+                progress_callback=events.append, label="masks")
+        self.assertEqual(len(context.exception.output), 200000)
+        self.assertEqual([event["message"] for event in events if event["event"] == "error"],
+                         ["w" * 200000])
+        self.assertEqual([event["files_done"] for event in events if event["event"] == "progress"],
+                         [0, 1, 2])
+        self.assertEqual(events[-1], {"event": "summary", "files_completed": 2,
+                                      "bytes_transferred": 4096, "job_status": "Completed",
+                                      "label": "masks"})
+        self.assertEqual(buffer.getvalue(), "")
+
+    def test_stderr_lines(self):
+        """stderr lines reach the callback while the subprocess is still running."""
+        script = ("import sys, time\n"
+                  "sys.stderr.write('ERROR: first\\n')\n"
+                  "sys.stderr.flush()\n"
+                  "time.sleep(1)\n"
+                  "sys.stderr.write('ERROR: second\\n')\n")
+        received = []
+        with self.assertRaises(downloader.CalledProcessError):
+            downloader._subprocess_with_realtime_log(
+                f'"{sys.executable}" -c "{script}"', verbose=False,
+                progress_callback=lambda event: received.append((time.time(), event)))
+        finished = time.time()
+        self.assertEqual([event["message"] for _, event in received], ["ERROR: first", "ERROR: second"])
+        self.assertLess(received[0][0], finished - 0.5)
+
+    def test_verbose(self):
+        """Verbose runs print formatted events rather than raw output, unless echo is set."""
+        script = ("print('INFO: Scanning...')\n"
+                  "print('50.0 %, 1 Done, 0 Failed, 1 Pending, 0 Skipped, 2 Total')\n"
+                  "print('Final Job Status: Completed')\n")
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            downloader._subprocess_with_realtime_log(f'"{sys.executable}" -c "{script}"', label="masks")
+        self.assertEqual(buffer.getvalue().splitlines(),
+                         ["masks: 50.0 %, 1 of 2 files done", "masks: job status: Completed"])
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            downloader._subprocess_with_realtime_log(
+                f'"{sys.executable}" -c "{script}"', verbose=False, echo=True)
+        self.assertIn("INFO: Scanning...", buffer.getvalue())
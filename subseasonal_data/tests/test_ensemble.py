@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from subseasonal_data.ensemble import EnsembleStatistics
+
+
+class TestEnsembleStatistics(unittest.TestCase):
+    """Tests for streaming ensemble statistics."""
+
+    def accumulate(self, members, stats, **kwargs):
+        statistics = EnsembleStatistics(stats, **kwargs)
+        statistics.extend(members.shape[1])
+        for values in members:
+            statistics.update(np.arange(members.shape[1]), values)
+        return statistics.result()
+
+    def test_moments_and_exceedance(self):
+        """Means, spreads and exceedance fractions match batch computations."""
+        members = np.random.default_rng(0).normal(size=(50, 30))
+        members[3, 4] = np.nan
+        result = self.accumulate(members, ["mean", "spread", "exceedance"], thresholds=[0.0, 1.0])
+        np.testing.assert_allclose(result["mean"], np.nanmean(members, axis=0))
+        np.testing.assert_allclose(result["spread"], np.nanstd(members, axis=0, ddof=1))
+        valid = ~np.isnan(members)
+        np.testing.assert_allclose(result["exceed1.0"], (members > 1.0).sum(axis=0) / valid.sum(axis=0))
+
+    def test_quantiles(self):
+        """Quantiles are exact for up to one centroid per member and estimated for more."""
+        members = np.random.default_rng(1).normal(size=(400, 200))
+        for n_members in [1, 3, 5, 16]:
+            result = self.accumulate(members[:n_members], ["quantiles"], quantiles=[0.1, 0.5])
+            np.testing.assert_allclose(result["q0.1"], np.quantile(members[:n_members], 0.1, axis=0))
+            np.testing.assert_allclose(result["q0.5"], np.quantile(members[:n_members], 0.5, axis=0))
+        for n_members, tolerance in [(50, 0.01), (400, 0.05)]:
+            result = self.accumulate(members[:n_members], ["quantiles"], quantiles=[0.1, 0.5, 0.9])
+            for q in [0.1, 0.5, 0.9]:
+                error = np.abs(result[f"q{q}"] - np.quantile(members[:n_members], q, axis=0))
+                self.assertLess(error.mean(), tolerance)
+
+    def test_new_cells(self):
+        """Cells added by later members only count the members covering them."""
+        statistics = EnsembleStatistics(["mean", "spread"])
+        statistics.extend(2)
+        statistics.update(np.array([0, 1]), np.array([1.0, 2.0]))
+        statistics.extend(1)
+        statistics.update(np.array([2, 0]), np.array([5.0, 3.0]))
+        result = statistics.result()
+        np.testing.assert_allclose(result["mean"], [2.0, 2.0, 5.0])
+        np.testing.assert_allclose(result["spread"], [np.sqrt(2.0), np.nan, np.nan])
+        statistics = EnsembleStatistics(["quantiles"], quantiles=[0.5])
+        statistics.extend(2)
+        for value in range(20):
+            statistics.update(np.array([0]), np.array([float(value)]))
+        statistics.update(np.array([1]), np.array([7.0]))
+        np.testing.assert_allclose(statistics.result()["q0.5"], [9.5, 7.0], atol=0.5)
+        with self.assertRaises(ValueError):
+            EnsembleStatistics(["median"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import os
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from subseasonal_data import data_loaders, features, utils
+from subseasonal_data.features import FeatureSet
+from subseasonal_data.tests.helpers import DataPathTestCase, SMALL_GRID
+
+
+class TestFeatureSet(DataPathTestCase):
+    """Tests for FeatureSet load plans on synthetic data."""
+    synthetic_data = dict(SMALL_GRID, n_dates=80)
+
+    def setUp(self):
+        super().setUp()
+        self.mask = pd.DataFrame({'lat': [27.0, 28.0, 29.0], 'lon': [261.0, 262.0, 261.0]})
+        self.arguments = dict(
+            gt_ids=["contest_tmp2m", "contest_tmp2m", "contest_precip"], gt_shifts=[15, 30, None],
+            forecast_ids=["subx_cfsv2-tmp2m"], forecast_shifts=15,
+            anom_ids=["contest_tmp2m"], anom_shifts=15, anom_masks=self.mask)
+
+    def _load_both(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            expected = data_loaders.get_lat_lon_date_features(sync=False, **self.arguments, **kwargs)
+            actual = FeatureSet.from_arguments(**self.arguments, **kwargs).load(sync=False)
+        return expected, actual
+
+    def test_load_matches_feature_builder(self):
+        """FeatureSet.load returns the output of get_lat_lon_date_features."""
+        for kwargs in [{}, {"first_year": 2000},
+                       {"start_date": "2000-01-10", "end_date": "2000-02-05"}]:
+            expected, actual = self._load_both(**kwargs)
+            assert_frame_equal(actual, expected)
+
+    def test_each_source_read_once(self):
+        """Each (file, mask) pair is read once, however many features use it."""
+        calls = []
+
+        def counting(load):
+            def wrapper(file_name, *args, **kwargs):
+                calls.append(os.path.basename(file_name))
+                return load(file_name, *args, **kwargs)
+            return wrapper
+        with mock.patch.object(features, "load_measurement", counting(utils.load_measurement)), \
+                mock.patch.object(features, "load_forecast_from_file",
+                                  counting(utils.load_forecast_from_file)), \
+                redirect_stdout(io.StringIO()):
+            FeatureSet.from_arguments(**self.arguments).load(sync=False)
+        self.assertEqual(sorted(calls), sorted([
+            "gt-contest_tmp2m-14d.h5", "gt-contest_tmp2m-14d.h5", "gt-contest_precip-14d.h5",
+            "subx-cfsv2-tmp2m-all_leads-8_periods_avg.h5"]))
+
+    def test_plan_and_explain(self):
+        """Shared reads cover the date range of all of their shifts."""
+        feature_set = (FeatureSet(start_date="2000-01-10", end_date="2000-02-05")
+                       .add_ground_truth("contest_tmp2m", shift=15)
+                       .add_ground_truth("contest_tmp2m", shift=30))
+        plan = feature_set.plan()
+        self.assertEqual(len(plan["reads"]), 1)
+        self.assertEqual(plan["reads"][0]["start_date"], pd.Timestamp("1999-12-11"))
+        self.assertEqual(plan["reads"][0]["end_date"], pd.Timestamp("2000-01-21"))
+        self.assertEqual([feature["name"] for feature in plan["features"]],
+                         ["contest_tmp2m_shift15", "contest_tmp2m_shift30"])
+        self.assertIn("1 file reads", feature_set.explain())
+        self.assertIn("vs 2 file reads", feature_set.explain())
+
+    def test_empty_feature_set(self):
+        """An empty feature set loads None like the feature builder."""
+        self.assertIsNone(FeatureSet().load(sync=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from subseasonal_data import grid, data_loaders
+
+
+def _sparse_grid_df(seed=0):
+    """Return synthetic long-format frame with missing cells, ordered by lat, lon, start_date."""
+    rng = np.random.default_rng(seed)
+    lat, lon, start_date = np.meshgrid(
+        [27.0, 28.5, 30.0], [261.0, 262.5], pd.date_range("2000-01-01", periods=6),
+        indexing="ij")
+    df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                       'start_date': start_date.ravel(),
+                       'tmp2m': rng.normal(size=lat.size).astype("float32"),
+                       'count': rng.integers(0, 10, size=lat.size),
+                       'flag': rng.random(lat.size) > 0.5,
+                       'target_date': start_date.ravel() + pd.Timedelta(days=14)})
+    df.loc[3, 'tmp2m'] = np.nan
+    return df.drop(index=[1, 7, 20]).reset_index(drop=True)
+
+
+class TestGridCube(unittest.TestCase):
+    """Tests for dense (date, lat, lon) cubes."""
+
+    def test_round_trip(self):
+        """Converting a frame ordered by lat, lon and date to a cube and back preserves it."""
+        df = _sparse_grid_df()
+        cube = grid.GridCube.from_frame(df)
+        self.assertEqual(cube.shape, (6, 3, 2))
+        self.assertEqual(cube.present.sum(), len(df))
+        self.assertEqual(cube['tmp2m'].dtype, np.float32)
+        assert_frame_equal(cube.to_frame(), df)
+        # Column order is preserved
+        reordered = df[['tmp2m', 'start_date', 'lon', 'lat', 'flag', 'count', 'target_date']]
+        assert_frame_equal(grid.GridCube.from_frame(reordered).to_frame(), reordered)
+
+    def test_values(self):
+        """Cube cells hold the values of matching rows; absent float cells are NaN."""
+        df = _sparse_grid_df()
+        cube = grid.GridCube.from_frame(df)
+        row = df.iloc[10]
+        ii = np.searchsorted(cube.dates, row['start_date'].to_datetime64())
+        jj = np.searchsorted(cube.lats, row['lat'])
+        kk = np.searchsorted(cube.lons, row['lon'])
+        self.assertEqual(cube['tmp2m'][ii, jj, kk], row['tmp2m'])
+        self.assertEqual(cube['count'][ii, jj, kk], row['count'])
+        self.assertTrue(np.isnan(cube['tmp2m'][1, 0, 0]))
+        self.assertFalse(cube.present[1, 0, 0])
+
+    def test_integer_precision(self):
+        """Integer variables keep their dtype and values above 2**53."""
+        df = _sparse_grid_df()
+        df['count'] = df['count'] + 2**62
+        cube = grid.GridCube.from_frame(df)
+        self.assertEqual(cube['count'].dtype, np.int64)
+        self.assertEqual(cube['count'][1, 0, 0], 0)
+        assert_frame_equal(cube.to_frame(), df)
+
+    def test_duplicates_rejected(self):
+        """Duplicate (lat, lon, start_date) rows cannot form a cube."""
+        df = _sparse_grid_df()
+        with self.assertRaises(ValueError):
+            grid.GridCube.from_frame(pd.concat([df, df.iloc[:1]]))
+
+    def test_getter(self):
+        """Getters return cubes on request."""
+        df = _sparse_grid_df()[['lat', 'lon', 'start_date', 'tmp2m']]
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": tmp_dir}):
+                os.makedirs(os.path.join(tmp_dir, "dataframes"))
+                df.to_hdf(os.path.join(tmp_dir, "dataframes", "gt-us_tmp2m-14d.h5"), key='data')
+                cube = data_loaders.get_ground_truth("us_tmp2m", sync=False, as_cube=True)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertIsInstance(cube, grid.GridCube)
+        assert_frame_equal(cube.to_frame(), df)
@@ -0,0 +1,86 @@
+import io
+import os
+import json
+import unittest
+import numpy as np
+from contextlib import redirect_stdout
+from subseasonal_data import instrumentation, data_loaders
+from subseasonal_data.tests.helpers import DataPathTestCase
+
+
+class TestStages(unittest.TestCase):
+    """Tests for stage events and subscribers."""
+
+    def test_events(self):
+        """Nested stages emit start and end events with the fields set by the stage."""
+        events = []
+        instrumentation.subscribe(events.append)
+        try:
+            with redirect_stdout(io.StringIO()) as buffer:
+                with instrumentation.stage("outer", message="Outer", file="f.h5") as info:
+                    info["rows_in"] = 3
+                    with instrumentation.stage("inner"):
+                        instrumentation.log_message("Inner message")
+                    info["rows_out"] = 2
+        finally:
+            instrumentation.unsubscribe(events.append)
+        self.assertEqual(buffer.getvalue(), "Outer\nInner message\n")
+        self.assertEqual([(event["event"], event["stage"], event["depth"]) for event in events],
+                         [("start", "outer", 0), ("start", "inner", 1), ("message", "inner", 2),
+                          ("end", "inner", 1), ("end", "outer", 0)])
+        end = events[-1]
+        self.assertEqual((end["rows_in"], end["rows_out"], end["file"], end["error"]),
+                         (3, 2, "f.h5", None))
+        self.assertGreaterEqual(end["seconds"], events[-2]["seconds"])
+
+    def test_error(self):
+        """Failed stages emit an end event with the error."""
+        with instrumentation.record_stages() as recorder:
+            with self.assertRaises(ValueError):
+                with instrumentation.stage("failing"):
+                    raise ValueError("bad")
+        self.assertEqual(recorder.to_records()[0]["error"], "ValueError('bad')")
+
+    def test_summary(self):
+        """Summaries keep counts that no call measured as NaN."""
+        with instrumentation.record_stages() as recorder:
+            with instrumentation.stage("merge") as info:
+                info["rows_in"] = 5
+            with instrumentation.stage("merge"):
+                pass
+        summary = recorder.summary()
+        self.assertEqual(summary.loc["merge", "calls"], 2)
+        self.assertEqual(summary.loc["merge", "rows_in"], 5)
+        self.assertTrue(np.isnan(summary.loc["merge", "rows_out"]))
+        self.assertEqual(summary["rows_out"].dtype, np.float64)
+
+    def test_silenced(self):
+        """Unsubscribing the print subscriber silences progress messages."""
+        instrumentation.unsubscribe(instrumentation.print_subscriber)
+        try:
+            with redirect_stdout(io.StringIO()) as buffer:
+                with instrumentation.stage("quiet", message="Hidden"):
+                    pass
+        finally:
+            instrumentation.subscribe(instrumentation.print_subscriber)
+        self.assertEqual(buffer.getvalue(), "")
+
+
+class TestLoaderStages(DataPathTestCase):
+    """Tests for the stages of the data loaders."""
+    synthetic_data = dict(n_lats=3, n_lons=4, n_dates=60)
+
+    def test_anomaly_stages(self):
+        """Ground truth anomalies report read, climatology and shift stages."""
+        with instrumentation.record_stages() as recorder, redirect_stdout(io.StringIO()):
+            data_loaders.get_ground_truth_anomalies("contest_tmp2m", shift=15, sync=False)
+        summary = recorder.summary()
+        self.assertTrue({"load", "read", "climatology", "shift"} <= set(summary.index))
+        self.assertEqual(summary.loc["load", "rows_out"], 3 * 4 * 60)
+        self.assertEqual(summary.loc["shift", "rows_in"], 3 * 4 * 60)
+        export_file = os.path.join(self.tmp_dir, "stages.jsonl")
+        recorder.export(export_file)
+        with open(export_file) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), len(recorder.to_records()))
+        self.assertTrue(all(record["event"] == "end" for record in records))
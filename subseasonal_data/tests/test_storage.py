@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from subseasonal_data import storage, utils, data_loaders
+
+
+class TestPartitionedStorage(unittest.TestCase):
+    """Tests for the year-partitioned columnar layout."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmp_dir, "gt-us_tmp2m-14d.h5")
+        rng = np.random.default_rng(0)
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("1999-12-01", "2002-01-31"),
+            indexing="ij")
+        self.df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                'start_date': start_date.ravel(),
+                                'tmp2m': rng.normal(size=lat.size),
+                                'tmp2m_sd': rng.gamma(1.0, size=lat.size)})
+        self.df.to_hdf(self.file_name, key='data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_matches_hdf(self):
+        """Partitioned reads match HDF5 reads."""
+        mask_df = pd.DataFrame({'lat': [27.0, 28.0], 'lon': [261.0, 262.0]})
+        kwargs_list = [{}, {'first_year': 2001}, {'columns': ['tmp2m']},
+                       {'mask_df': mask_df}, {'shift': 15, 'first_year': 2000}]
+        expected = [utils.load_measurement(self.file_name, **kwargs) for kwargs in kwargs_list]
+        path = storage.convert_to_partitioned(self.file_name)
+        self.assertTrue(storage.is_partitioned_current(self.file_name))
+        self.assertEqual(sorted(fname for fname in os.listdir(path) if fname.startswith("year=")),
+                         ["year=1999", "year=2000", "year=2001", "year=2002"])
+        for kwargs, df in zip(kwargs_list, expected):
+            assert_frame_equal(utils.load_measurement(self.file_name, **kwargs), df,
+                               check_index_type=False)
+
+    def test_pushdown(self):
+        """Only requested years and columns are read."""
+        storage.convert_to_partitioned(self.file_name)
+        df = storage.read_partitioned(self.file_name, columns=['tmp2m'], first_date="2001-06-01")
+        self.assertEqual(list(df.columns), ['lat', 'lon', 'start_date', 'tmp2m'])
+        self.assertGreaterEqual(df['start_date'].min(), pd.Timestamp("2001-06-01"))
+        # Shifted data from first_year on is filled from earlier years
+        shifted = utils.load_measurement(self.file_name, shift=30, first_year=2000)
+        self.assertEqual(shifted['start_date'].min(), pd.Timestamp("2000-01-01"))
+        self.assertFalse(shifted['tmp2m_shift30'].isna().any())
+
+    def test_stale_layout_ignored(self):
+        """Re-syncing the HDF5 file invalidates its partitioned layout."""
+        storage.convert_to_partitioned(self.file_name)
+        self.df['tmp2m'] += 1
+        self.df.to_hdf(self.file_name, key='data')
+        stat = os.stat(self.file_name)
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertFalse(storage.is_partitioned_current(self.file_name))
+        self.assertIsNone(storage.read_partitioned(self.file_name))
+        assert_frame_equal(utils.load_measurement(self.file_name), self.df)
+
+
+class TestLeadPushdown(unittest.TestCase):
+    """Tests for reading forecasts restricted to lead times."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0], [261.0, 262.0], pd.date_range("2010-12-25", "2011-01-05"), indexing="ij")
+        keys = {'lat': lat.ravel(), 'lon': lon.ravel(), 'start_date': start_date.ravel()}
+        self.wide = pd.DataFrame(dict(keys, **{f"subx_cfsv2_tmp2m-{lead}d": rng.normal(size=lat.size)
+                                              for lead in [0.5, 14.5, 28.5]}))
+        self.long = pd.concat([pd.DataFrame(dict(keys, lead=lead, subx_cfsv2_tmp2m=rng.normal(size=lat.size)))
+                               for lead in [0, 14, 28]], ignore_index=True)
+        self.wide_file = os.path.join(self.tmp_dir, "subx-cfsv2-tmp2m-wide.h5")
+        self.long_file = os.path.join(self.tmp_dir, "subx-cfsv2-tmp2m-long.h5")
+        self.wide.to_hdf(self.wide_file, key='data')
+        self.long.to_hdf(self.long_file, key='data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_select_lead_columns(self):
+        """Columns are selected by lead suffix and key columns are kept."""
+        self.assertEqual(utils.select_lead_columns(self.wide.columns, [14.5]),
+                         ['lat', 'lon', 'start_date', 'subx_cfsv2_tmp2m-14.5d'])
+
+    def test_matches_hdf(self):
+        """Lead and date pushdown into the partitioned layout matches HDF5 reads."""
+        dates = {'start_date': "2011-01-01", 'end_date': "2011-01-03"}
+        for file_name, leads, n_rows, n_columns in [(self.wide_file, [0.5, 28.5], 12, 5),
+                                                    (self.long_file, [0, 28], 24, 5)]:
+            expected = utils._read_forecast(file_name, leads=leads, **dates)
+            self.assertEqual(expected.shape, (n_rows, n_columns))
+            storage.convert_to_partitioned(file_name, reader="forecast")
+            df = storage.read_partitioned(file_name, first_date=dates['start_date'],
+                                          last_date=dates['end_date'], leads=leads)
+            assert_frame_equal(df, expected, check_index_type=False)
+        self.assertEqual(sorted(expected['lead'].unique()), [0, 28])
+
+    def test_get_forecast(self):
+        """get_forecast converts the forecast file and reads only the requested leads."""
+        with mock.patch.object(data_loaders, "get_local_file_path", return_value=self.wide_file):
+            df = data_loaders.get_forecast("subx_cfsv2-tmp2m", sync=False, leads=[14.5],
+                                           start_date="2011-01-01", partition=True)
+        self.assertTrue(storage.is_partitioned_current(self.wide_file))
+        self.assertEqual(list(df.columns), ['lat', 'lon', 'start_date', 'subx_cfsv2_tmp2m-14.5d'])
+        self.assertEqual(df['start_date'].min(), pd.Timestamp("2011-01-01"))
+
+    def test_get_forecast_without_pyarrow(self):
+        """get_forecast warns and reads the HDF5 file if pyarrow is missing."""
+        with mock.patch.object(data_loaders, "get_local_file_path", return_value=self.wide_file), \
+                mock.patch("importlib.util.find_spec", return_value=None), \
+                self.assertWarnsRegex(UserWarning, "requires 'pyarrow'"):
+            df = data_loaders.get_forecast("subx_cfsv2-tmp2m", sync=False, leads=[14.5],
+                                           start_date="2011-01-01", partition=True)
+        self.assertFalse(storage.is_partitioned_current(self.wide_file))
+        self.assertEqual(df['start_date'].min(), pd.Timestamp("2011-01-01"))
+
+
+class TestReadFeatherFiltered(unittest.TestCase):
+    """Tests for filtered, memory-mapped reads of combined data files."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = mock.patch.dict(os.environ, {"SUBSEASONALDATA_PATH": self.tmp_dir})
+        self.env.start()
+        os.makedirs(os.path.join(self.tmp_dir, "combined_dataframes"))
+        self.file_name = os.path.join(self.tmp_dir, "combined_dataframes",
+                                      "lat_lon_date_data-us_tmp2m_34w.feather")
+        rng = np.random.default_rng(0)
+        lat, lon, start_date = np.meshgrid(
+            [27.0, 28.0, 29.0], [261.0, 262.0], pd.date_range("2000-01-01", periods=100),
+            indexing="ij")
+        self.df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                                'start_date': start_date.ravel(),
+                                'tmp2m': rng.normal(size=lat.size),
+                                'precip': rng.gamma(1.0, size=lat.size)})
+        # Write several record batches
+        self.df.to_feather(self.file_name, chunksize=128)
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_unfiltered(self):
+        """Memory-mapped reads match pandas reads."""
+        assert_frame_equal(storage.read_feather_filtered(self.file_name), self.df)
+        assert_frame_equal(storage.read_feather_filtered(self.file_name, columns=['tmp2m']),
+                           self.df[['tmp2m']])
+
+    def test_filters(self):
+        """Date and mask filters select the same rows as filtering in pandas."""
+        mask_df = pd.DataFrame({'lat': [27.0, 29.0], 'lon': [262.0, 261.0]})
+        expected = self.df[(self.df['start_date'] >= "2000-02-01")
+                           & (self.df['start_date'] <= "2000-02-10")]
+        expected = pd.merge(expected, mask_df, on=['lat', 'lon'])
+        result = data_loaders.load_combined_data(
+            "lat_lon_date_data", "us_tmp2m", "34w", sync=False, start_date="2000-02-01",
+            end_date="2000-02-10", mask_df=mask_df, columns=['start_date', 'tmp2m'])
+        self.assertEqual(len(result), 20)
+        assert_frame_equal(result, expected[['start_date', 'tmp2m']])
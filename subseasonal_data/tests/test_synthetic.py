@@ -0,0 +1,31 @@
+import io
+from contextlib import redirect_stdout
+from subseasonal_data import data_loaders
+from subseasonal_data.synthetic import write_synthetic_data, SYNTHETIC_LEADS
+from subseasonal_data.tests.helpers import DataPathTestCase
+
+
+class TestSyntheticData(DataPathTestCase):
+    """Tests for synthetic data files."""
+
+    def test_loaders_read_offline(self):
+        """Data loaders read the synthetic files with sync=False."""
+        write_synthetic_data(n_lats=3, n_lons=4, n_dates=30)
+        with redirect_stdout(io.StringIO()):
+            gt = data_loaders.get_ground_truth("contest_precip", sync=False)
+            anom = data_loaders.get_ground_truth_anomalies("contest_tmp2m", shift=15, sync=False)
+            forecast = data_loaders.get_forecast("subx_cfsv2-tmp2m", sync=False, leads=[14.5])
+            mask = data_loaders.get_us_mask(sync=False)
+        self.assertEqual(len(gt), 3 * 4 * 30)
+        self.assertTrue((gt['precip'] >= 0).all())
+        self.assertFalse(anom.dropna()['tmp2m_shift15_anom'].empty)
+        self.assertEqual(list(forecast.columns), ['lat', 'lon', 'start_date', 'subx_cfsv2_tmp2m-14.5d'])
+        self.assertTrue(set(mask['lon']) <= set(gt['lon']))
+        self.assertTrue(0 < len(mask) <= 12)
+
+    def test_forecast_leads(self):
+        """Forecast files have one column per synthetic lead."""
+        write_synthetic_data(gt_ids=[], n_lats=2, n_lons=2, n_dates=5)
+        with redirect_stdout(io.StringIO()):
+            forecast = data_loaders.get_forecast("subx_cfsv2-tmp2m", sync=False)
+        self.assertEqual(len(forecast.columns), 3 + len(SYNTHETIC_LEADS))
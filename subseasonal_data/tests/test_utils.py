@@ -0,0 +1,279 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import netCDF4
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+from subseasonal_data import utils, cache
+
+
+def _lat_lon_date_df(n_lats=3, n_lons=4, n_dates=10, seed=0):
+    """Return shuffled synthetic (lat, lon, start_date) dataframe."""
+    rng = np.random.default_rng(seed)
+    lat, lon, start_date = np.meshgrid(
+        np.arange(27.0, 27.0+n_lats), np.arange(261.0, 261.0+n_lons),
+        pd.date_range("2000-01-01", periods=n_dates), indexing="ij")
+    df = pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(),
+                       'start_date': start_date.ravel(),
+                       'tmp2m': rng.normal(size=lat.size),
+                       'precip': rng.gamma(1.0, size=lat.size)})
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class TestShiftDf(unittest.TestCase):
+    """Tests for 'shift_df'."""
+
+    def test_vectorized_matches_groupby(self):
+        """Vectorized shift matches per-group shift."""
+        df = _lat_lon_date_df()
+        for shift in [1, 15, 29]:
+            expected = utils.shift_df(df, shift=shift, vectorized=False)
+            result = utils.shift_df(df, shift=shift, vectorized=True)
+            assert_frame_equal(result, expected)
+            self.assertIn(f"tmp2m_shift{shift}", result.columns)
+
+    def test_vectorized_matches_without_groups(self):
+        """Vectorized shift matches global shift when groupby_cols are absent."""
+        df = _lat_lon_date_df().drop(columns=['lat', 'lon'])
+        expected = utils.shift_df(df, shift=3, vectorized=False)
+        assert_frame_equal(utils.shift_df(df, shift=3), expected)
+
+    def test_vectorized_matches_missing_keys(self):
+        """Rows with missing group keys are dropped like groupby does."""
+        df = _lat_lon_date_df()
+        df.loc[[0, 5], 'lat'] = np.nan
+        expected = utils.shift_df(df, shift=2, rename_cols=False, vectorized=False)
+        result = utils.shift_df(df, shift=2, rename_cols=False)
+        assert_frame_equal(result, expected)
+
+    def test_no_shift(self):
+        """Zero or missing shift returns the input unmodified."""
+        df = _lat_lon_date_df()
+        self.assertIs(utils.shift_df(df, shift=None), df)
+        self.assertIs(utils.shift_df(df, shift=0), df)
+
+
+class TestSubsetmask(unittest.TestCase):
+    """Tests for 'subsetmask'."""
+
+    def test_matches_merge(self):
+        """Cell-id masking selects the same rows in the same order as a merge."""
+        for step in [1.0, 1.5]:
+            df = _lat_lon_date_df(n_lats=6, n_lons=6)
+            df['lat'] = 27.0 + (df['lat'] - 27.0) * step
+            df['lon'] = 261.0 + (df['lon'] - 261.0) * step
+            mask_df = df[['lat', 'lon']].drop_duplicates().sample(frac=0.5, random_state=0)
+            mask_df = mask_df.astype({'lat': 'float32'})
+            expected = pd.merge(df, mask_df, on=['lat', 'lon'], how='inner')
+            assert_frame_equal(utils.subsetmask(df, mask_df), expected)
+
+    def test_exact_coordinates(self):
+        """Coordinates in the same cell but not equal to mask coordinates are excluded."""
+        df = _lat_lon_date_df()
+        mask_df = pd.DataFrame({'lat': [27.0, 28.0001], 'lon': [261.0, 262.0]})
+        result = utils.subsetmask(df, mask_df)
+        self.assertEqual(len(result), 10)
+        assert_frame_equal(result, pd.merge(df, mask_df, on=['lat', 'lon'], how='inner'))
+
+    def test_points_in_one_cell(self):
+        """Mask points sharing a grid cell each select their own rows, like a merge."""
+        df = _lat_lon_date_df()
+        df.loc[df['lat'] == 28.0, 'lat'] = 27.001
+        mask_df = pd.DataFrame({'lat': [27.0, 27.001], 'lon': [261.0, 261.0]})
+        result = utils.subsetmask(df, mask_df)
+        self.assertEqual(len(result), 20)
+        assert_frame_equal(result, pd.merge(df, mask_df, on=['lat', 'lon'], how='inner'))
+
+    def test_mask_columns_kept(self):
+        """Extra mask columns are merged into the result."""
+        df = _lat_lon_date_df()
+        mask_df = pd.DataFrame({'lat': [27.0, 28.0], 'lon': [261.0, 262.0], 'mask': [1, 1]})
+        result = utils.subsetmask(df, mask_df)
+        self.assertIn('mask', result.columns)
+        assert_frame_equal(result, pd.merge(df, mask_df, on=['lat', 'lon'], how='inner'))
+
+
+class TestReadHdfDates(unittest.TestCase):
+    """Tests for '_read_hdf_dates'."""
+
+    def test_layouts(self):
+        """Dates are read from date columns and date index levels."""
+        df = _lat_lon_date_df()
+        expected = pd.Series(df['start_date'].unique())
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for ii, frame in enumerate([df, df.set_index(['lat', 'lon', 'start_date']),
+                                        df.set_index('start_date')]):
+                file_name = os.path.join(tmp_dir, f"{ii}.h5")
+                frame.to_hdf(file_name, key='data')
+                dates = utils._read_hdf_dates(file_name)
+                assert_series_equal(dates, expected, check_dtype=False)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestCreatemaskdf(unittest.TestCase):
+    """Tests for 'createmaskdf'."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.mask_file = os.path.join(self.tmp_dir, "us_mask.nc")
+        self.mask = np.random.default_rng(0).random((5, 7)) > 0.5
+        with netCDF4.Dataset(self.mask_file, 'w') as fh:
+            fh.createDimension('lat', 5)
+            fh.createDimension('lon', 7)
+            fh.createVariable('lat', 'f4', ('lat',))[:] = np.arange(25.0, 30.0)
+            fh.createVariable('lon', 'f4', ('lon',))[:] = np.arange(-120.0, -113.0)
+            fh.createVariable('mask', 'f4', ('lat', 'lon'))[:] = self.mask
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_mask_rows(self):
+        """Mask rows are the (lat, lon) pairs with mask value 1 in grid order."""
+        mask_df = utils.createmaskdf(self.mask_file)
+        lon, lat = np.meshgrid(np.arange(240.0, 247.0), np.arange(25.0, 30.0))
+        np.testing.assert_array_equal(mask_df['lat'], lat[self.mask])
+        np.testing.assert_array_equal(mask_df['lon'], lon[self.mask])
+        np.testing.assert_array_equal(mask_df.index, np.flatnonzero(self.mask))
+
+    def test_cached(self):
+        """Masks are read from file once."""
+        expected = utils.createmaskdf(self.mask_file)
+        with mock.patch.object(utils, "_read_mask") as mocked:
+            assert_frame_equal(utils.createmaskdf(self.mask_file), expected)
+            mocked.assert_not_called()
+        cache.clear_mask_cache()
+        with mock.patch.object(utils, "_read_mask", return_value=expected) as mocked:
+            utils.createmaskdf(self.mask_file)
+            mocked.assert_called_once()
+
+    def test_cache_bounded(self):
+        """At most MASK_CACHE_SIZE masks are cached."""
+        cache.clear_mask_cache()
+        with mock.patch.object(cache, "MASK_CACHE_SIZE", 1):
+            other_file = os.path.join(self.tmp_dir, "other_mask.nc")
+            shutil.copy(self.mask_file, other_file)
+            utils.createmaskdf(self.mask_file)
+            utils.createmaskdf(other_file)
+            self.assertEqual(len(cache._masks), 1)
+
+
+class TestAlignFrames(unittest.TestCase):
+    """Tests for 'align_frames'."""
+
+    def frames(self):
+        gt = _lat_lon_date_df(seed=0)[['lat', 'lon', 'start_date', 'tmp2m']]
+        forecast = _lat_lon_date_df(n_lats=4, n_dates=12, seed=1).rename(
+            columns={'tmp2m': 'cfsv2_tmp2m', 'precip': 'cfsv2_precip'})
+        forecast['cfsv2_count'] = np.arange(len(forecast))
+        anom = _lat_lon_date_df(n_lons=2, seed=2).sample(frac=0.5, random_state=0)
+        anom = anom.rename(columns={'tmp2m': 'tmp2m_anom'})[
+            ['start_date', 'lat', 'lon', 'tmp2m_anom']]
+        anom['flag'] = anom['tmp2m_anom'] > 0
+        return [gt, forecast, anom]
+
+    def merge_chain(self, frames, on=["lat", "lon", "start_date"]):
+        df = None
+        for frame in frames:
+            df = utils.df_merge(df, frame, on=on)
+        return df
+
+    def test_matches_merge_chain(self):
+        """Single-pass alignment matches successive outer merges."""
+        frames = self.frames()
+        for ii in range(1, len(frames)+1):
+            assert_frame_equal(utils.align_frames(frames[:ii]), self.merge_chain(frames[:ii]))
+        # Frames ordered differently
+        frames = frames[::-1]
+        assert_frame_equal(utils.align_frames(frames), self.merge_chain(frames))
+        self.assertIsNone(utils.align_frames([]))
+
+    def test_fallback(self):
+        """Duplicated keys and shared columns fall back to successive merges."""
+        gt, forecast, anom = self.frames()
+        duplicated = pd.concat([gt, gt.iloc[:2]], ignore_index=True)
+        with mock.patch('sys.stderr') as stderr:
+            result = utils.align_frames([duplicated, forecast], duplicate_warning="duplicated")
+            stderr.write.assert_any_call("duplicated")
+        assert_frame_equal(result, self.merge_chain([duplicated, forecast]))
+        shared = anom.rename(columns={'tmp2m_anom': 'tmp2m'})
+        assert_frame_equal(utils.align_frames([gt, shared]), self.merge_chain([gt, shared]))
+
+    def test_categorical_keys(self):
+        """Compact frames keep categorical keys with the union of their categories."""
+        frames = self.frames()
+        compact = [utils.apply_dtype_policy(frame, "compact") for frame in frames]
+        self.assertNotEqual(compact[0]['lat'].dtype, compact[1]['lat'].dtype)
+        result = utils.align_frames(compact)
+        self.assertIsInstance(result['lat'].dtype, pd.CategoricalDtype)
+        self.assertEqual(result['tmp2m'].dtype, np.float32)
+        expected = utils.apply_dtype_policy(self.merge_chain(frames), "compact")
+        assert_frame_equal(result.astype({'lat': float, 'lon': float}),
+                           expected.astype({'lat': float, 'lon': float}))
+        # Duplicated keys fall back to merging without upcasting the keys
+        duplicated = pd.concat([compact[0], compact[0].iloc[:2]], ignore_index=True)
+        merged = utils.align_frames([duplicated] + compact[1:])
+        for col in ['lat', 'lon']:
+            self.assertIsInstance(merged[col].dtype, pd.CategoricalDtype)
+        self.assertEqual(merged['tmp2m'].dtype, np.float32)
+        assert_frame_equal(merged.astype({'lat': float, 'lon': float}),
+                           utils.align_frames([duplicated.astype({'lat': float, 'lon': float})]
+                                              + [frame.astype({'lat': float, 'lon': float})
+                                                 for frame in compact[1:]]))
+
+
+class TestApplyDtypePolicy(unittest.TestCase):
+    """Tests for 'apply_dtype_policy'."""
+
+    def test_compact(self):
+        """Compact policy stores categorical coordinates and float32 values."""
+        df = _lat_lon_date_df()
+        df['count'] = np.arange(len(df))
+        compact = utils.apply_dtype_policy(df, "compact")
+        self.assertEqual(list(compact['lat'].cat.categories), sorted(df['lat'].unique()))
+        self.assertEqual(compact['tmp2m'].dtype, np.float32)
+        self.assertEqual(compact['count'].dtype, df['count'].dtype)
+        self.assertEqual(compact['start_date'].dtype, df['start_date'].dtype)
+        self.assertLess(compact.memory_usage().sum(), 0.6 * df.memory_usage().sum())
+        self.assertIs(utils.apply_dtype_policy(compact, "compact"), compact)
+        self.assertIs(utils.apply_dtype_policy(df), df)
+        with self.assertRaises(ValueError):
+            utils.apply_dtype_policy(df, "lean")
+
+    def test_shift_keeps_compact_dtypes(self):
+        """Shifting compact frames keeps their dtypes and row order."""
+        df = _lat_lon_date_df().sample(frac=1, random_state=0)
+        compact = utils.apply_dtype_policy(df, "compact")
+        shifted = utils.shift_df(compact, shift=15)
+        self.assertEqual(list(shifted.dtypes), list(compact.dtypes))
+        assert_frame_equal(shifted, utils.apply_dtype_policy(utils.shift_df(df, shift=15), "compact"))
+
+
+class TestPivotToWide(unittest.TestCase):
+    """Tests for 'pivot_to_wide'."""
+
+    def unstack(self, df):
+        return pd.DataFrame(df.set_index(['lat', 'lon', 'start_date']).unstack(['lat', 'lon']).to_records())
+
+    def test_matches_unstack(self):
+        """Vectorized pivot matches unstacking, including column labels."""
+        df = _lat_lon_date_df()
+        df['count'] = np.arange(len(df))
+        expected = self.unstack(df)
+        result = utils.pivot_to_wide(df)
+        assert_frame_equal(result, expected)
+        self.assertIn("('tmp2m', 27.0, 261.0)", result.columns)
+        # Missing (lat, lon, start_date) combinations
+        df = df.sample(frac=0.6, random_state=0)
+        df['lat'] = df['lat'].astype('float32')
+        assert_frame_equal(utils.pivot_to_wide(df), self.unstack(df))
+
+    def test_duplicates_rejected(self):
+        """Duplicated keys raise like unstacking does."""
+        df = _lat_lon_date_df()
+        with self.assertRaises(ValueError):
+            utils.pivot_to_wide(pd.concat([df, df.iloc[:1]]))
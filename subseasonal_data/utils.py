@@ -1,9 +1,28 @@
 import os
+import re
+import sys
 import numpy as np
 import pandas as pd
 import netCDF4
 import time
+import threading
 from .downloader import get_local_file_path
+from .cache import memoize_frame, memoize_mask
+from .grid import cell_ids, mask_cell_ids, _day_keys
+from .storage import read_partitioned
+from .instrumentation import stage
+
+# Globals
+# HDF5 reads of concurrent threads are serialized since PyTables is not thread-safe
+_hdf5_lock = threading.Lock()
+# Dtype policies of the loaders (see apply_dtype_policy)
+DTYPE_POLICIES = (None, "compact")
+# Columns stored as categoricals by the compact dtype policy
+COORDINATE_COLS = ['lat', 'lon']
+# Lead time column of long-format forecasts
+LEAD_COL = 'lead'
+# Lead time suffix, in days, of wide-format forecast columns, e.g., 'subx_cfsv2_tmp2m-14.5d'
+LEAD_SUFFIX = re.compile(r"-(\d+(?:\.\d+)?)d$")
 
 
 def printf(str):
@@ -15,9 +34,14 @@ def printf(str):
     print(str, flush=True)
 
 
-def load_measurement(file_name, mask_df=None, shift=None):
+def load_measurement(file_name, mask_df=None, shift=None, first_year=None, columns=None,
+                     start_date=None, end_date=None, dtype_policy=None):
     """Load measurement data from a given file name.
 
+    If file_name has a current start_date-partitioned layout
+    (see :func:`~subseasonal_data.storage.convert_to_partitioned`), only the
+    years and columns needed are read from that layout.
+
     Parameters
     ----------
     file_name: string
@@ -31,26 +55,183 @@ def load_measurement(file_name, mask_df=None, shift=None):
         Number of days by which ground truth measurements should be shifted forward.
         The date index will be extended upon shifting.
 
+    first_year: int, optional (default=None)
+        Only return rows with (shifted) start_date year >= first_year; if None,
+        do not prune rows by year.
+
+    columns: list of string, optional (default=None)
+        Measurement columns to load in addition to start_date, lat and lon, or None to load all.
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only return rows with (shifted) start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes applied right after reading (see :func:`apply_dtype_policy`).
+
     Returns
     -------
     measurement_df: pd.DataFrame
         Measurement data as a dataframe.
     """
-    # Load ground-truth data
-    df = pd.read_hdf(file_name, 'data')
-
-    # Convert to dataframe if necessary
-    if not isinstance(df, pd.DataFrame):
-        df = df.to_frame()
-    # Replace multiindex with start_date, lat, lon columns if necessary
-    if isinstance(df.index, pd.MultiIndex):
-        df.reset_index(inplace=True)
+    start_date, end_date = _to_timestamp(start_date), _to_timestamp(end_date)
+    params = dict(first_year=first_year, columns=None if columns is None else tuple(columns),
+                  start_date=start_date, end_date=end_date, dtype_policy=dtype_policy)
+    if shift is not None and shift != 0:
+        # Shift the (possibly cached) unshifted measurements, reading enough
+        # earlier dates to fill the first shifted dates
+        return memoize_frame(
+            file_name, lambda: date_slice(year_slice(shift_df(
+                load_measurement(file_name, mask_df, first_year=_lookback_year(first_year, shift),
+                                 columns=columns, start_date=_lookback_date(start_date, shift),
+                                 end_date=_lookback_date(end_date, shift), dtype_policy=dtype_policy),
+                shift=shift, date_col='start_date', groupby_cols=['lat', 'lon']),
+                first_year=first_year), start_date, end_date).reset_index(drop=True),
+            mask_df=mask_df, shift=shift, persist=True, reader="measurement", **params)
+    return memoize_frame(
+        file_name, lambda: apply_dtype_policy(
+            _read_measurement(file_name, mask_df, first_year, columns, start_date, end_date),
+            dtype_policy),
+        mask_df=mask_df, persist=mask_df is not None, reader="measurement", **params)
+
+
+def _read_measurement(file_name, mask_df=None, first_year=None, columns=None,
+                      start_date=None, end_date=None):
+    """Read measurement data from file_name, preferring its partitioned layout,
+    and restrict to first_year, columns, dates and mask_df if not None.
+    """
+    first_date = _first_date(first_year, start_date)
+    with stage("read", file=file_name) as info:
+        df = read_partitioned(file_name, columns=columns, first_date=first_date, mask_df=mask_df,
+                              last_date=end_date)
+        if df is None:
+            # Load ground-truth data
+            with _hdf5_lock:
+                df = pd.read_hdf(file_name, 'data')
+
+            # Convert to dataframe if necessary
+            if not isinstance(df, pd.DataFrame):
+                df = df.to_frame()
+            # Replace multiindex with start_date, lat, lon columns if necessary
+            if isinstance(df.index, pd.MultiIndex):
+                df.reset_index(inplace=True)
+            df = _select_rows_and_columns(df, first_date, columns, end_date)
+        info["rows_out"] = len(df)
     if mask_df is not None:
         # Restrict output to requested lat, lon pairs
+        df = _mask_rows(df, mask_df, file_name)
+    return df
+
+
+def _read_hdf_dates(file_name, date_col='start_date'):
+    """Return the distinct date_col values of the dataframe in HDF5 file file_name.
+
+    Reads only the block or index holding date_col from fixed-format files
+    and falls back to reading the whole dataframe otherwise.
+    """
+    with stage("read", file=file_name) as info, _hdf5_lock, pd.HDFStore(file_name, mode='r') as store:
+        key = '/data' if '/data' in store.keys() else store.keys()[0]
+        storer = store.get_storer(key)
+        dates = None
+        if getattr(storer, "pandas_kind", None) == "frame" and not storer.is_table:
+            index = storer.read_index("axis1")
+            if date_col in index.names:
+                dates = index.get_level_values(date_col)
+            for ii in range(storer.nblocks if dates is None else 0):
+                items = storer.read_index(f"block{ii}_items")
+                if date_col in items:
+                    dates = storer.read_array(f"block{ii}_values")[items.get_loc(date_col)]
+                    break
+        if dates is None:
+            df = store.select(key)
+            dates = (df.reset_index() if date_col not in df.columns else df)[date_col]
+        dates = pd.Series(pd.to_datetime(pd.unique(np.asarray(dates))))
+        info["rows_out"] = len(dates)
+    return dates
+
+
+def _mask_rows(df, mask_df, file_name):
+    """Return subsetmask(df, mask_df) of data read from file_name as an instrumented stage."""
+    with stage("mask", file=file_name) as info:
+        info["rows_in"] = len(df)
         df = subsetmask(df, mask_df)
+        info["rows_out"] = len(df)
+    return df
+
+
+def _select_rows_and_columns(df, first_date=None, columns=None, last_date=None, leads=None):
+    """Restrict df read from an HDF5 file to rows with first_date <= start_date <= last_date,
+    to the given forecast leads and to the given columns in addition to start_date, lat and lon.
+    """
+    if (first_date is not None or last_date is not None) and 'start_date' in df.columns:
+        df = date_slice(df, first_date, last_date).reset_index(drop=True)
+    if leads is not None:
+        if LEAD_COL in df.columns:
+            df = df[df[LEAD_COL].isin(leads)].reset_index(drop=True)
+        else:
+            columns = select_lead_columns(df.columns if columns is None else columns, leads)
+    if columns is not None:
+        df = df[[col for col in df.columns
+                 if col in ['lat', 'lon', 'start_date'] or col in columns]]
+    return df
+
+
+def select_lead_columns(columns, leads):
+    """Return the columns of a wide-format forecast holding the given lead times.
+
+    Forecast columns are named after their lead time in days with the suffix
+    "-{lead}d", e.g., 'subx_cfsv2_tmp2m-14.5d'; columns without such a suffix
+    are kept.
+
+    Parameters
+    ----------
+    columns: list of string
+        Forecast column names.
+
+    leads: list of float
+        Lead times in days.
+
+    Returns
+    -------
+    lead_columns: list of string
+        Selected columns in the order of columns.
+    """
+    leads = {float(lead) for lead in leads}
+    lead_columns = []
+    for col in columns:
+        match = LEAD_SUFFIX.search(col)
+        if match is None or float(match.group(1)) in leads:
+            lead_columns.append(col)
+    return lead_columns
+
+
+def _lookback_year(first_year, shift):
+    """Return first year of unshifted data needed to produce shifted data from first_year on."""
+    if first_year is None or shift is None:
+        return first_year
+    return (pd.Timestamp(f"{first_year}-01-01") - pd.Timedelta(days=int(shift))).year
+
+
+def _lookback_date(date, shift):
+    """Return unshifted date needed to produce shifted data on date."""
+    if date is None or shift is None:
+        return date
+    return date - pd.Timedelta(days=int(shift))
 
-    # Return dataframe with desired shift
-    return shift_df(df, shift=shift, date_col='start_date', groupby_cols=['lat', 'lon'])
+
+def _first_date(first_year=None, start_date=None):
+    """Return the later of January 1 of first_year and start_date, or None if both are None."""
+    dates = [] if first_year is None else [pd.Timestamp(f"{first_year}-01-01")]
+    if start_date is not None:
+        dates.append(pd.Timestamp(start_date))
+    return max(dates) if dates else None
+
+
+def _to_timestamp(date):
+    """Return date as a pd.Timestamp or None if date is None."""
+    return None if date is None else pd.Timestamp(date)
 
 
 def print_missing_cols_func(df, target_date_obj, print_missing_cols):
@@ -83,7 +264,23 @@ def subsetmask(df, mask_df):
     masked_df: pd.DataFrame
         Subsetted dataframe.
     """
-    return pd.merge(df, mask_df, on=['lat', 'lon'], how='inner')
+    if set(mask_df.columns) != {'lat', 'lon'} or len(df) == 0 or len(mask_df) == 0 \
+            or mask_df[['lat', 'lon']].isna().any().any():
+        # Mask contributes columns to the merge
+        return pd.merge(df, mask_df, on=['lat', 'lon'], how='inner')
+    mask_ids, mask_positions = mask_cell_ids(mask_df)
+    if (mask_ids[1:] == mask_ids[:-1]).any():
+        # Mask has duplicate rows or several points within one grid cell
+        return pd.merge(df, mask_df, on=['lat', 'lon'], how='inner')
+    # Look up the mask row of each data row by integer cell id
+    lat, lon = df['lat'].to_numpy(), df['lon'].to_numpy()
+    ids = cell_ids(lat, lon)
+    idx = np.minimum(np.searchsorted(mask_ids, ids), len(mask_ids)-1)
+    positions = mask_positions[idx]
+    # Require exact coordinate equality like the merge does
+    keep = (mask_ids[idx] == ids) & (lat == mask_df['lat'].values[positions]) \
+        & (lon == mask_df['lon'].values[positions])
+    return df.loc[keep].reset_index(drop=True)
 
 
 def df_merge(left, right, on=["lat", "lon", "start_date"], how="outer"):
@@ -97,8 +294,190 @@ def df_merge(left, right, on=["lat", "lon", "start_date"], how="outer"):
         return pd.merge(left, right, on=on, how=how)
 
 
+def align_frames(frames, on=["lat", "lon", "start_date"], duplicate_warning=None):
+    """Return outer merger of all dataframes in frames on 'on', built in a single pass.
+
+    Produces the same result as successively outer merging the frames with
+    :func:`df_merge`, but builds the union of the key values once and places
+    the columns of each frame directly into the output instead of copying the
+    growing merged frame at every step. Categorical keys stay categorical, with
+    the union of the categories of all frames. Falls back to successive merging when
+    a frame has duplicated or missing keys, frames share non-key columns, or
+    key dtypes differ across frames; keys that are categorical in every frame
+    also stay categorical in that case.
+
+    Parameters
+    ----------
+    frames: list of pd.DataFrame
+        Dataframes to merge, each containing the columns in on.
+
+    on: list of string, optional (default=["lat", "lon", "start_date"])
+        Key columns.
+
+    duplicate_warning: string, optional (default=None)
+        If not None, message printed to stderr for each frame with duplicated keys.
+
+    Returns
+    -------
+    merged_df: pd.DataFrame or None
+        Merged dataframe or None if frames is empty.
+    """
+    if len(frames) <= 1:
+        return frames[0] if frames else None
+    # Check each input once for duplicated or missing keys
+    with stage("duplicate_check") as info:
+        info["rows_in"] = sum(len(frame) for frame in frames)
+        codes, uniques = _key_codes(frames, on)
+        has_duplicates = False
+        for frame, frame_codes in zip(frames, codes):
+            if frame_codes is not None and len(np.unique(frame_codes)) != len(frame_codes):
+                has_duplicates = True
+                if duplicate_warning is not None:
+                    print(duplicate_warning, file=sys.stderr)
+    value_cols = [col for frame in frames for col in frame.columns if col not in on]
+    if any(frame_codes is None for frame_codes in codes) \
+            or has_duplicates or len(set(value_cols)) != len(value_cols):
+        df = None
+        for frame in _unify_categories(frames, on):
+            df = df_merge(df, frame, on=on)
+        return df
+    # Outer merges order rows lexicographically by key
+    union = np.unique(np.concatenate(codes))
+    key_idx = np.unravel_index(union, [len(values) for values in uniques])
+    columns = {col: values[idx] for col, values, idx in zip(on, uniques, key_idx)}
+    for frame, frame_codes in zip(frames, codes):
+        indexer = np.full(len(union), -1, dtype=np.intp)
+        indexer[np.searchsorted(union, frame_codes)] = np.arange(len(frame_codes))
+        allow_fill = len(frame_codes) != len(union)
+        for col in frame.columns:
+            if col not in on:
+                columns[col] = pd.api.extensions.take(
+                    frame[col].array, indexer, allow_fill=allow_fill)
+    col_order = list(frames[0].columns) + [col for col in value_cols if col not in frames[0].columns]
+    return pd.DataFrame({col: columns[col] for col in col_order})
+
+
+def pivot_to_wide(df, date_col='start_date'):
+    """Pivot a (lat, lon, date_col) dataframe to wide format with one column per variable and grid point.
+
+    Equivalent to ``pd.DataFrame(df.set_index(['lat', 'lon', date_col]).unstack(['lat', 'lon']).to_records())``,
+    including its column labels, e.g., "('tmp2m', 27.0, 261.0)", but
+    scatters the values of each variable directly into a (date x grid point)
+    matrix using integer date and grid point codes. Falls back to unstacking
+    when df has missing or duplicated keys or non-numeric variables.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Dataframe with columns lat, lon, date_col and one or more variables.
+
+    date_col: string, optional (default='start_date')
+        Name of date column.
+
+    Returns
+    -------
+    wide_df: pd.DataFrame
+        Dataframe with column date_col, one row per date and one column per
+        (variable, lat, lon) combination.
+    """
+    keys = ['lat', 'lon', date_col]
+    value_cols = [col for col in df.columns if col not in keys]
+    if df[keys].isna().any().any() or not all(
+            isinstance(df[col].values, np.ndarray) and df[col].values.dtype.kind in 'biuf'
+            for col in value_cols):
+        return pd.DataFrame(df.set_index(keys).unstack(['lat', 'lon']).to_records())
+    # Grid points are ordered by first appearance, dates in increasing order
+    lat_codes, _ = pd.factorize(df['lat'])
+    lon_codes, lon_uniques = pd.factorize(df['lon'])
+    cell_codes, _ = pd.factorize(lat_codes.astype(np.int64) * len(lon_uniques) + lon_codes)
+    date_codes, dates = pd.factorize(df[date_col], sort=True)
+    n_cells = cell_codes.max() + 1 if len(cell_codes) else 0
+    flat_idx = date_codes.astype(np.int64) * n_cells + cell_codes
+    indexer = np.full(len(dates) * n_cells, -1, dtype=np.intp)
+    indexer[flat_idx] = np.arange(len(df))
+    if (indexer >= 0).sum() != len(df):
+        # Duplicated keys; let unstack raise its error
+        return pd.DataFrame(df.set_index(keys).unstack(['lat', 'lon']).to_records())
+    _, first_rows = np.unique(cell_codes, return_index=True)
+    cell_lats = df['lat'].values[first_rows]
+    cell_lons = df['lon'].values[first_rows]
+    allow_fill = len(indexer) != len(df)
+    wide = [pd.DataFrame({date_col: np.asarray(dates)})]
+    for col in value_cols:
+        values = pd.api.extensions.take(df[col].values, indexer, allow_fill=allow_fill)
+        labels = pd.MultiIndex.from_arrays([[col]*n_cells, cell_lats, cell_lons])
+        wide.append(pd.DataFrame(values.reshape(len(dates), n_cells),
+                                 columns=[str(label) for label in labels]))
+    return pd.concat(wide, axis=1)
+
+
+def _unify_categories(frames, on):
+    """Return frames with each key column that is categorical in all frames
+    converted to the union of their sorted categories, so merges keep it categorical.
+    """
+    frames = list(frames)
+    for col in on:
+        dtypes = [frame[col].dtype for frame in frames]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) \
+                or all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        try:
+            categories = pd.api.types.union_categoricals(
+                [frame[col].array for frame in frames], sort_categories=True).categories
+        except TypeError:
+            continue
+        dtype = pd.CategoricalDtype(categories)
+        frames = [frame.astype({col: dtype}) for frame in frames]
+    return frames
+
+
+def _key_codes(frames, on):
+    """Return integer codes of the key values of each frame, ordered like the keys,
+    and the sorted unique values of each key column.
+
+    Codes are None for frames with missing keys or keys of a different dtype than
+    in the first frame, or for all frames if the key space is too large to encode.
+    Unique values of categorical keys are returned as categoricals.
+    """
+    uniques = []
+    col_codes = []
+    for col in on:
+        dtypes = {frame[col].dtype for frame in frames}
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            # Categorical keys (see apply_dtype_policy) may have different categories
+            # in each frame; encode them by the union of their sorted categories
+            try:
+                values = pd.api.types.union_categoricals(
+                    [frame[col].array for frame in frames], sort_categories=True)
+            except TypeError:
+                return [None] * len(frames), None
+            categories = pd.CategoricalDtype(values.categories)
+            uniques.append(pd.Categorical.from_codes(np.arange(len(values.categories)),
+                                                     dtype=categories))
+            col_codes.append(np.asarray(values.codes, dtype=np.intp))
+            continue
+        if len(dtypes) != 1:
+            return [None] * len(frames), None
+        codes, values = pd.factorize(
+            pd.concat([frame[col] for frame in frames], ignore_index=True), sort=True)
+        uniques.append(np.asarray(values))
+        col_codes.append(codes)
+    if np.prod([float(max(len(values), 1)) for values in uniques]) >= 2**62:
+        return [None] * len(frames), uniques
+    shape = [max(len(values), 1) for values in uniques]
+    bounds = np.cumsum([0] + [len(frame) for frame in frames])
+    codes = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        frame_col_codes = [col_code[start:stop] for col_code in col_codes]
+        if any((col_code < 0).any() for col_code in frame_col_codes):
+            codes.append(None)
+        else:
+            codes.append(np.ravel_multi_index(frame_col_codes, shape).astype(np.int64))
+    return codes, uniques
+
+
 def shift_df(df, shift=None, date_col='start_date', groupby_cols=['lat', 'lon'],
-             rename_cols=True):
+             rename_cols=True, vectorized=True):
     """Shift dataframe features by a given amount.
 
     Return dataframe with all columns save for the date_col and groupby_cols
@@ -124,34 +503,63 @@ def shift_df(df, shift=None, date_col='start_date', groupby_cols=['lat', 'lon'],
     rename_cols: bool, optional (default=True)
         Rename columns to reflect shift.
 
+    vectorized: bool, optional (default=True)
+        If True, shift the whole date column at once and order rows by group;
+        if False, shift each group separately with groupby.apply.
+        Both modes return the same dataframe.
+
     Returns
     -------
     shifted_df: pd.DataFrame
         Shifted data as a dataframe.
     """
     if shift is not None and shift != 0:
-        # Get column names of all variables to be shifted
-        # If any of groupby_cols+[date_col] do not exist, ignore error
-        cols_to_shift = df.columns.drop(
-            groupby_cols+[date_col], errors='ignore')
-        # Function to shift data frame by shift and extend index
-
-        def shift_grp_df(grp_df): return grp_df[cols_to_shift].set_index(
-            grp_df[date_col]).shift(int(shift), freq="D")
-        if set(groupby_cols).issubset(df.columns):
-            # Shift ground truth measurements for each group
-            df = df.groupby(groupby_cols).apply(shift_grp_df).reset_index()
-        else:
-            # Shift ground truth measurements
-            df = shift_grp_df(df).reset_index()
-        if rename_cols:
-            # Rename variables to reflect shift
-            df.rename(columns=dict(
-                list(zip(cols_to_shift, [col+"_shift"+str(shift) for col in cols_to_shift]))),
-                inplace=True)
+        with stage("shift", shift=shift) as info:
+            info["rows_in"] = len(df)
+            # Get column names of all variables to be shifted
+            # If any of groupby_cols+[date_col] do not exist, ignore error
+            cols_to_shift = df.columns.drop(
+                groupby_cols+[date_col], errors='ignore')
+            if vectorized:
+                df = _shift_df_vectorized(df, shift, date_col, groupby_cols, cols_to_shift)
+            else:
+                # Function to shift data frame by shift and extend index
+                def shift_grp_df(grp_df): return grp_df[cols_to_shift].set_index(
+                    grp_df[date_col]).shift(int(shift), freq="D")
+                if set(groupby_cols).issubset(df.columns):
+                    # Shift ground truth measurements for each group
+                    df = df.groupby(groupby_cols).apply(shift_grp_df).reset_index()
+                else:
+                    # Shift ground truth measurements
+                    df = shift_grp_df(df).reset_index()
+            if rename_cols:
+                # Rename variables to reflect shift
+                df.rename(columns=dict(
+                    list(zip(cols_to_shift, [col+"_shift"+str(shift) for col in cols_to_shift]))),
+                    inplace=True)
+            info["rows_out"] = len(df)
     return df
 
 
+def _shift_df_vectorized(df, shift, date_col, groupby_cols, cols_to_shift):
+    """Shift date_col of df forward by shift days without splitting df into groups.
+
+    Reproduces the output of shifting each group with groupby.apply: rows with
+    missing group keys are dropped and the remaining rows are stably ordered by
+    groupby_cols, followed by date_col and the shifted columns.
+    """
+    if set(groupby_cols).issubset(df.columns):
+        # Mimic groupby, which drops missing keys and sorts groups
+        df = df.loc[df[groupby_cols].notna().all(axis=1),
+                    groupby_cols+[date_col]+list(cols_to_shift)]
+        df = df.sort_values(groupby_cols, kind='mergesort')
+    else:
+        df = df[[date_col]+list(cols_to_shift)]
+    # Shifting every row forward in time is equivalent to shifting each group
+    df = df.assign(**{date_col: df[date_col] + pd.Timedelta(days=int(shift))})
+    return df.reset_index(drop=True)
+
+
 def createmaskdf(mask_file):
     """Create mask dataframe from file.
 
@@ -168,18 +576,21 @@ def createmaskdf(mask_file):
     mask_df: pd.DataFrame
        Dataframe with one row for each (lat,lon) pair with mask value == 1.
     """
-    fh = netCDF4.Dataset(mask_file, 'r')
-    lat = fh.variables['lat'][:]
-    lon = fh.variables['lon'][:] + 360
-    mask = fh.variables['mask'][:]
-    lon, lat = np.meshgrid(lon, lat)
-    mask_df = pd.DataFrame({'lat': lat.flatten(),
-                            'lon': lon.flatten(),
-                            'mask': mask.data.flatten()})
-    # Retain only those entries with a mask value of 1
-    mask_df = mask_df.loc[mask_df['mask'] == 1]
-    # Drop unnecessary 'mask' column
-    return mask_df.drop('mask', axis=1)
+    return memoize_mask(mask_file, lambda: _read_mask(mask_file))
+
+
+def _read_mask(mask_file):
+    """Read netCDF4 mask file into a dataframe of (lat,lon) pairs with mask value == 1."""
+    with netCDF4.Dataset(mask_file, 'r') as fh:
+        lat = fh.variables['lat'][:]
+        lon = fh.variables['lon'][:] + 360
+        mask = fh.variables['mask'][:]
+    # Gather the (lat,lon) pairs with a mask value of 1 in row-major grid order
+    flat_positions = np.flatnonzero(mask.data == 1)
+    lat_idx, lon_idx = np.unravel_index(flat_positions, mask.data.shape)
+    return pd.DataFrame({'lat': np.ma.getdata(lat)[lat_idx],
+                         'lon': np.ma.getdata(lon)[lon_idx]},
+                        index=flat_positions)
 
 
 def year_slice(df, first_year=None, date_col='start_date'):
@@ -195,9 +606,84 @@ def year_slice(df, first_year=None, date_col='start_date'):
     return df[df[date_col] >= f"{first_year}-01-01"]
 
 
-def load_forecast_from_file(file_name, mask_df=None):
+def date_slice(df, start_date=None, end_date=None, date_col='start_date'):
+    """Return slice of df containing all rows with start_date <= df[date_col] <= end_date.
+
+    Returns df if start_date and end_date are None; either bound may be None.
+    """
+    if start_date is None and end_date is None:
+        return df
+    keep = np.ones(len(df), dtype=bool)
+    if start_date is not None:
+        keep &= (df[date_col] >= pd.Timestamp(start_date)).values
+    if end_date is not None:
+        keep &= (df[date_col] <= pd.Timestamp(end_date)).values
+    if keep.all():
+        # No need to slice
+        return df
+    return df[keep]
+
+
+def day_of_year_slice(df, start_date=None, end_date=None, date_col='start_date'):
+    """Return slice of df containing all rows whose (month, day) of df[date_col]
+    is the (month, day) of a date in [start_date, end_date].
+
+    Used to restrict climatologies, whose dates lie in a reference year, to the
+    days of year of a date window. Returns df if start_date or end_date is None
+    or if the window spans a full year.
+    """
+    if start_date is None or end_date is None:
+        return df
+    days = pd.Series(pd.date_range(start_date, end_date))
+    keep = np.isin(_day_keys(df[date_col]), _day_keys(days))
+    if keep.all():
+        # No need to slice
+        return df
+    return df[keep]
+
+
+def apply_dtype_policy(df, dtype_policy=None):
+    """Return df with the column dtypes of dtype_policy.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Dataframe to convert.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        If None, return df unchanged. If 'compact', store lat and lon as
+        categoricals, whose integer codes take one or two bytes per row for any
+        grid, and float64 columns as float32; date columns are unchanged.
+        Category values are the original float coordinates, and
+        :func:`align_frames` and :func:`shift_df` keep both compact dtypes.
+        Compact frames are returned unchanged.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        Converted dataframe.
+    """
+    if dtype_policy not in DTYPE_POLICIES:
+        raise ValueError(f"Unrecognized dtype_policy {dtype_policy}")
+    if dtype_policy is None:
+        return df
+    dtypes = {}
+    for col, dtype in df.dtypes.items():
+        if col in COORDINATE_COLS and not isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "category"
+        elif dtype == np.float64:
+            dtypes[col] = np.float32
+    return df.astype(dtypes) if dtypes else df
+
+
+def load_forecast_from_file(file_name, mask_df=None, first_year=None, columns=None,
+                            start_date=None, end_date=None, dtype_policy=None, leads=None):
     """Load forecast data from file and returns as a dataframe.
 
+    If file_name has a current start_date-partitioned layout
+    (see :func:`~subseasonal_data.storage.convert_to_partitioned`), only the
+    years, leads and columns needed are read from that layout.
+
     Parameters
     ----------
     file_name: string
@@ -208,23 +694,66 @@ def load_forecast_from_file(file_name, mask_df=None):
         where mask is a {0,1} variable indicating whether the grid point should be included (1) or excluded (0).
         Masks can be created using :func:`subseasonal_data.utils.subsetmask`.
 
+    first_year: int, optional (default=None)
+        Only return rows with start_date year >= first_year; if None, do not prune rows by year.
+
+    columns: list of string, optional (default=None)
+        Forecast columns to load in addition to start_date, lat and lon, or None to load all.
+
+    start_date: datetime-like, optional (default=None)
+        If not None, only return rows with start_date >= start_date.
+
+    end_date: datetime-like, optional (default=None)
+        If not None, only return rows with start_date <= end_date.
+
+    dtype_policy: {None, 'compact'}, optional (default=None)
+        Column dtypes applied right after reading (see :func:`apply_dtype_policy`).
+
+    leads: list of float, optional (default=None)
+        If not None, only return forecasts with these lead times in days: rows
+        with these values of the LEAD_COL column if present and otherwise the
+        columns with these lead suffixes (see :func:`select_lead_columns`).
+
     Returns
     -------
     forecast_df: pd.DataFrame
         Dataframe with forecast data.
     """
-    # Load forecast dataframe
-    forecast = pd.read_hdf(file_name)
-
-    # PY37
-    if 'start_date' in forecast.columns:
-        forecast.start_date = pd.to_datetime(forecast.start_date)
-    if 'target_date' in forecast.columns:
-        forecast.target_date = pd.to_datetime(forecast.target_date)
+    start_date, end_date = _to_timestamp(start_date), _to_timestamp(end_date)
+    return memoize_frame(
+        file_name, lambda: apply_dtype_policy(
+            _read_forecast(file_name, mask_df, first_year, columns, start_date, end_date, leads),
+            dtype_policy),
+        mask_df=mask_df, reader="forecast", first_year=first_year,
+        columns=None if columns is None else tuple(columns), start_date=start_date, end_date=end_date,
+        dtype_policy=dtype_policy, leads=None if leads is None else tuple(leads))
+
+
+def _read_forecast(file_name, mask_df=None, first_year=None, columns=None,
+                   start_date=None, end_date=None, leads=None):
+    """Read forecast data from file_name, preferring its partitioned layout,
+    and restrict to first_year, columns, dates, leads and mask_df if not None.
+    """
+    first_date = _first_date(first_year, start_date)
+    with stage("read", file=file_name) as info:
+        forecast = read_partitioned(file_name, columns=columns, first_date=first_date,
+                                    mask_df=mask_df, last_date=end_date, leads=leads)
+        if forecast is None:
+            # Load forecast dataframe
+            with _hdf5_lock:
+                forecast = pd.read_hdf(file_name)
+
+            # PY37
+            if 'start_date' in forecast.columns:
+                forecast.start_date = pd.to_datetime(forecast.start_date)
+            if 'target_date' in forecast.columns:
+                forecast.target_date = pd.to_datetime(forecast.target_date)
+            forecast = _select_rows_and_columns(forecast, first_date, columns, end_date, leads)
+        info["rows_out"] = len(forecast)
 
     if mask_df is not None:
         # Restrict output to requested lat, lon pairs
-        forecast = subsetmask(forecast, mask_df)
+        forecast = _mask_rows(forecast, mask_df, file_name)
     return forecast
 
 